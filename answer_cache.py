@@ -0,0 +1,158 @@
+# answer_cache.py
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+
+from config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_PATH,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    language    TEXT    NOT NULL,
+    version     TEXT    NOT NULL,
+    chunk_key   TEXT    NOT NULL,
+    query       TEXT    NOT NULL,
+    embedding   BLOB    NOT NULL,
+    answer      TEXT    NOT NULL,
+    created_at  REAL    NOT NULL,
+    last_used   REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_answers_lookup ON answers (language, version, chunk_key);
+CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers (last_used);
+"""
+
+
+def _chunk_key(chunk_ids: list[str]) -> str:
+    """Order-insensitive key for the set of retrieved chunk IDs."""
+    return json.dumps(sorted(chunk_ids), ensure_ascii=False)
+
+
+class AnswerCache:
+    """
+    Semantic cache of LLM answers persisted in SQLite.
+
+    An entry matches a new question when language, index version and the
+    set of retrieved chunk IDs are identical and the query embeddings have
+    cosine similarity >= `threshold`. Entries expire after `ttl_seconds`
+    and the least recently used ones are evicted above `max_entries`.
+    """
+
+    def __init__(
+        self,
+        db_path: str = ANSWER_CACHE_PATH,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+    ):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per operation: safe across Streamlit threads
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lookup(
+        self,
+        query_embedding: np.ndarray,
+        language: str,
+        version: str,
+        chunk_ids: list[str],
+    ) -> str | None:
+        """Return a cached answer for a semantically equivalent question, or None."""
+        q = np.asarray(query_embedding, dtype="float32").reshape(-1)
+        now = time.time()
+
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, embedding, answer FROM answers "
+                "WHERE language = ? AND version = ? AND chunk_key = ? AND created_at >= ?",
+                (language, version, _chunk_key(chunk_ids), now - self.ttl_seconds),
+            ).fetchall()
+
+            if rows:
+                matrix = np.vstack([np.frombuffer(r[1], dtype="float32") for r in rows])
+                sims = matrix @ q
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    conn.execute(
+                        "UPDATE answers SET last_used = ? WHERE id = ?", (now, rows[best][0])
+                    )
+                    self.hits += 1
+                    return rows[best][2]
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        language: str,
+        version: str,
+        chunk_ids: list[str],
+        answer: str,
+    ) -> None:
+        """Insert an answer, then drop expired and least recently used entries."""
+        emb = np.asarray(query_embedding, dtype="float32").reshape(-1)
+        now = time.time()
+
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO answers "
+                "(language, version, chunk_key, query, embedding, answer, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (language, version, _chunk_key(chunk_ids), query, emb.tobytes(), answer, now, now),
+            )
+            conn.execute(
+                "DELETE FROM answers WHERE created_at < ? OR version != ?",
+                (now - self.ttl_seconds, version),
+            )
+            conn.execute(
+                "DELETE FROM answers WHERE id NOT IN "
+                "(SELECT id FROM answers ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self) -> dict:
+        with self._lock, self._connect() as conn:
+            size = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size}
+
+
+_answer_cache: AnswerCache | None = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache | None:
+    """Process-wide answer cache, or None if disabled."""
+    global _answer_cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache()
+        return _answer_cache
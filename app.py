@@ -3,9 +3,8 @@ from typing import List, Dict, Optional
 
 import streamlit as st
 
-from data_loader import load_resources
-from rag_core import answer_question, is_urdu_text
-from utils import set_seeds
+from data_loader import get_resource_loader
+from rag_core import answer_question_stream, is_urdu_text
 
 # We still keep BASE_DIR here only for UI assets (e.g., bot avatar image).
 BASE_DIR = Path(__file__).resolve().parent
@@ -16,11 +15,37 @@ def render_urdu(text: str) -> None:
     st.markdown(f"<div class='urdu-text'>{text}</div>", unsafe_allow_html=True)
 
 
+def render_sources(retrieved: Optional[List[Dict]]) -> None:
+    """Render retrieval results (title, link, score, preview) in the sidebar."""
+    if not retrieved:
+        st.caption("Sources will appear here after you ask a question.")
+        return
+
+    for i, r in enumerate(retrieved, start=1):
+        # Use new keys from Chroma-backed retrieval
+        title = r.get("title") or r.get("article_title", "Unknown")
+        url = r.get("source_url") or r.get("url", "")
+        score = r.get("score", None)
+
+        st.markdown(f"**{i}. {title}**")  # use index as rank instead of r['rank']
+        if url:
+            st.caption(f"[Source link]({url})")
+        # Same passage also appears in these articles (collapsed at ingest)
+        also_in = [s for s in r.get("sources", []) if s.get("source_url") and s["source_url"] != url]
+        if also_in:
+            links = ", ".join(f"[{s.get('title') or 'article'}]({s['source_url']})" for s in also_in)
+            st.caption(f"Also in: {links}")
+        if score is not None:
+            st.caption(f"Similarity score: `{score:.4f}`")
+
+        # Use content as a preview fallback
+        preview = r.get("text_preview") or r.get("content", "")[:200]
+        st.markdown(preview)
+        st.markdown("<hr>", unsafe_allow_html=True)
+
+
 def main() -> None:
 
-    # Set the random seed for reproducibility
-    set_seeds(42)
-    
     # ---------- PAGE CONFIG & GLOBAL STYLING ----------
     st.set_page_config(page_title="AskKSA Chatbot", page_icon="🇸🇦")
 
@@ -49,13 +74,9 @@ def main() -> None:
     )
 
     # ---------- LOAD RAG RESOURCES ----------
-    # All heavy lifting (embedding model, FAISS index, chunks, metadata)
-    # is now handled in data_loader.load_resources().
-    try:
-        embed_model, collection = load_resources()
-    except Exception as e:
-        st.error(f"❌ Failed to load resources: {str(e)}")
-        st.stop()
+    # The embedding model and vector backend load (and warm up) in a
+    # background thread started here; the page renders without waiting.
+    loader = get_resource_loader()
 
     # ---------- SESSION STATE INITIALIZATION ----------
     if "chat_history" not in st.session_state:
@@ -98,28 +119,13 @@ def main() -> None:
             if st.button(q, key=f"sample_q_{i}"):
                 sample_clicked = q
 
-        # Sources for the last answer
+        # Sources for the last answer (placeholder so a new answer's sources
+        # can replace them as soon as retrieval finishes)
         st.markdown("---")
         st.markdown("### 📚 Sources used (last answer)")
-        if st.session_state.last_retrieved:
-            for i, r in enumerate(st.session_state.last_retrieved, start=1):
-                # Use new keys from Chroma-backed retrieval
-                title = r.get("title") or r.get("article_title", "Unknown")
-                url = r.get("source_url") or r.get("url", "")
-                score = r.get("score", None)
-
-                st.markdown(f"**{i}. {title}**")  # use index as rank instead of r['rank']
-                if url:
-                    st.caption(f"[Source link]({url})")
-                if score is not None:
-                    st.caption(f"Similarity score: `{score:.4f}`")
-
-                # Use content as a preview fallback
-                preview = r.get("text_preview") or r.get("content", "")[:200]
-                st.markdown(preview)
-                st.markdown("<hr>", unsafe_allow_html=True)
-        else:
-            st.caption("Sources will appear here after you ask a question.")
+        sources_box = st.empty()
+        with sources_box.container():
+            render_sources(st.session_state.last_retrieved)
 
     # ---------- MAIN AREA HEADER ----------
     st.title("🇸🇦 AskKSA – Smart Helper for Absher, Iqama & Visas")
@@ -166,8 +172,19 @@ def main() -> None:
 
         # Generate and display the assistant's answer
         with st.chat_message("assistant", avatar=str(BASE_DIR / "askksa_bot1.png")):
-            with st.spinner("Thinking..."):
-                answer, retrieved = answer_question(
+            try:
+                if not loader.ready():
+                    with st.spinner("Loading the knowledge base..."):
+                        loader.wait()
+                embed_model, collection = loader.wait()
+            except Exception as e:
+                # Drop the failed loader so the next run retries
+                get_resource_loader.clear()
+                st.error(f"❌ Failed to load resources: {str(e)}")
+                st.stop()
+
+            with st.spinner("Searching..."):
+                answer_chunks, retrieved = answer_question_stream(
                     user_input,
                     embed_model=embed_model,
                     collection=collection,
@@ -175,10 +192,20 @@ def main() -> None:
                     k=5,
                 )
 
-                if user_is_urdu:
-                    render_urdu(answer)
-                else:
-                    st.markdown(answer)
+            # Sources are known before the LLM starts answering
+            with sources_box.container():
+                render_sources(retrieved)
+
+            # Render the answer incrementally as chunks arrive
+            answer_box = st.empty()
+            answer = ""
+            for piece in answer_chunks:
+                answer += piece
+                with answer_box.container():
+                    if user_is_urdu:
+                        render_urdu(answer)
+                    else:
+                        st.markdown(answer)
 
         # Save assistant message + retrieval metadata to session
         st.session_state.chat_history.append(
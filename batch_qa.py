@@ -0,0 +1,71 @@
+# batch_qa.py
+"""
+Answer a file of questions offline (regression sets, FAQ precomputation).
+
+Usage:
+    python batch_qa.py questions.txt --output answers.jsonl
+
+The input is either plain text (one question per line) or JSONL with a
+"query" field per line.
+"""
+import argparse
+import json
+import time
+
+from context_packer import context_stats
+from data_loader import load_resources
+from rag_core import answer_questions
+
+
+def read_queries(path: str) -> list[str]:
+    """Read questions from a .jsonl file ({"query": ...}) or a plain text file."""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                queries.append(json.loads(line)["query"])
+            else:
+                queries.append(line)
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch question answering over the vector DB.")
+    parser.add_argument("input", help="Questions file (.txt, one per line, or .jsonl with 'query')")
+    parser.add_argument("--output", default="answers.jsonl", help="Output JSONL path")
+    parser.add_argument("--k", type=int, default=5, help="Chunks retrieved per question")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel LLM calls")
+    args = parser.parse_args()
+
+    queries = read_queries(args.input)
+    embed_model, collection = load_resources()
+
+    started = time.perf_counter()
+    records = answer_questions(
+        queries,
+        embed_model,
+        collection,
+        k=args.k,
+        max_concurrency=args.concurrency,
+        output_path=args.output,
+    )
+    elapsed = time.perf_counter() - started
+
+    failed = sum(1 for r in records if r["error"])
+    print(
+        f"Answered {len(records) - failed}/{len(records)} questions in {elapsed:.1f}s "
+        f"({failed} failed). Results: {args.output}"
+    )
+    ctx = context_stats()
+    if ctx["requests"]:
+        print(
+            f"Prompt context: {ctx['tokens_after']} tokens packed from {ctx['tokens_before']} "
+            f"({ctx['tokens_saved']} saved, {ctx['saved_ratio']:.1%})"
+        )
+
+
+if __name__ == "__main__":
+    main()
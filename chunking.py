@@ -0,0 +1,358 @@
+# chunking.py
+"""
+Markdown chunking measured in encoder tokens.
+
+The legacy splitter (CHUNKER=chars) cuts every publication at 1000
+characters with 200 overlap, so chunk sizes in BGE-M3 tokens vary with the
+script: Urdu chunks can be several times longer than English ones and get
+truncated by the encoder, while short English chunks waste context.
+
+TokenChunker (CHUNKER=tokens) instead:
+  - splits text into blocks: headings, paragraphs and whole lists
+  - counts tokens for all blocks of a batch of texts in one call to the
+    encoder's fast tokenizer
+  - packs blocks greedily up to `chunk_tokens`; a heading starts a new
+    chunk once the current one holds `min_chunk_tokens`, and a heading is
+    never left dangling at the end of a chunk
+  - overlaps consecutive chunks by whole trailing blocks (<= `overlap_tokens`)
+  - splits blocks larger than a chunk at list items, then sentences, then
+    token boundaries
+
+iter_chunked() runs the chunker over a stream of texts in a process pool.
+
+    python chunking.py --benchmark     # compare with the character splitter
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, TypeVar
+
+from config import (
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_TOKENS,
+    CHUNK_WORKERS,
+    CHUNKER,
+    DATA_DIR,
+    EMBED_MAX_SEQ_LENGTH,
+    EMBED_MODEL_NAME,
+)
+
+T = TypeVar("T")
+
+_HEADING = re.compile(r"^#{1,6}\s")
+_LIST_ITEM = re.compile(r"^\s*(?:[*+-]|\d+[.)])\s")
+# Sentence ends, including the Arabic question mark and Urdu full stop
+_SENTENCE_END = re.compile(r"(?<=[.!?؟۔])\s+")
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model_name: str = EMBED_MODEL_NAME):
+    """The encoder's fast (Rust) tokenizer; no model weights are loaded."""
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+
+
+@lru_cache(maxsize=None)
+def get_char_splitter(chunk_size: int = 1000, chunk_overlap: int = 200):
+    """Legacy character splitter, built once per (size, overlap)."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def split_blocks(text: str) -> list[tuple[str, str]]:
+    """
+    Split markdown into (kind, text) blocks with kind "heading", "list" or
+    "para". Blank lines end paragraphs and lists; a list continues over
+    indented continuation lines.
+    """
+    blocks: list[tuple[str, str]] = []
+    lines: list[str] = []
+    kind = None
+
+    def close():
+        nonlocal lines, kind
+        if lines:
+            blocks.append((kind, "\n".join(lines).strip()))
+        lines, kind = [], None
+
+    for line in text.splitlines():
+        if not line.strip():
+            close()
+            continue
+        if _HEADING.match(line):
+            close()
+            blocks.append(("heading", line.strip()))
+            continue
+        is_item = bool(_LIST_ITEM.match(line))
+        if kind == "para" and is_item:
+            close()
+        elif kind == "list" and not is_item and not line[:1].isspace():
+            close()
+        if kind is None:
+            kind = "list" if is_item else "para"
+        lines.append(line)
+    close()
+    return blocks
+
+
+class TokenChunker:
+    """Markdown-aware chunker with sizes measured in `tokenizer` tokens."""
+
+    def __init__(
+        self,
+        tokenizer,
+        chunk_tokens: int = CHUNK_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        min_chunk_tokens: int | None = None,
+    ):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.tokenizer = tokenizer
+        # Leave room for the encoder's special tokens
+        self.chunk_tokens = min(chunk_tokens, EMBED_MAX_SEQ_LENGTH - 2)
+        self.overlap_tokens = overlap_tokens
+        self.min_chunk_tokens = (
+            min_chunk_tokens if min_chunk_tokens is not None else self.chunk_tokens // 4
+        )
+        a, b, joined = self.count_tokens(["a", "b", "a\n\nb"])
+        self._sep_tokens = max(0, joined - a - b)
+
+    def count_tokens(self, texts: list[str]) -> list[int]:
+        """Token counts (without special tokens) for a batch of texts."""
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def chunk(self, text: str) -> list[str]:
+        return self.chunk_many([text])[0]
+
+    def chunk_many(self, texts: list[str]) -> list[list[str]]:
+        """Chunk several texts with a single tokenizer call for all their blocks."""
+        per_text = [split_blocks(text) for text in texts]
+        counts = iter(self.count_tokens([b for blocks in per_text for _, b in blocks]))
+        units_per_text = []
+        for blocks in per_text:
+            units = []
+            for kind, block in blocks:
+                n = next(counts)
+                if n > self.chunk_tokens:
+                    units.extend(self._split_oversized(kind, block))
+                else:
+                    units.append((kind, block, n))
+            units_per_text.append(units)
+        return [self._pack(units) for units in units_per_text]
+
+    def _split_oversized(self, kind: str, block: str) -> list[tuple[str, str, int]]:
+        """Break a block larger than a chunk into list items or sentences, else token windows."""
+        if kind == "list":
+            pieces = re.split(r"\n(?=\s*(?:[*+-]|\d+[.)])\s)", block)
+        else:
+            pieces = _SENTENCE_END.split(block)
+        pieces = [p.strip() for p in pieces if p.strip()]
+
+        if len(pieces) == 1:
+            return [(kind, w, n) for w, n in self._token_windows(pieces[0])]
+
+        units = []
+        for piece, n in zip(pieces, self.count_tokens(pieces)):
+            if n > self.chunk_tokens:
+                units.extend((kind, w, wn) for w, wn in self._token_windows(piece))
+            else:
+                units.append((kind, piece, n))
+        return units
+
+    def _token_windows(self, text: str) -> list[tuple[str, int]]:
+        """Cut text into windows of chunk_tokens tokens at token boundaries."""
+        offsets = self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True
+        )["offset_mapping"]
+        windows = []
+        for start in range(0, len(offsets), self.chunk_tokens):
+            window = offsets[start:start + self.chunk_tokens]
+            windows.append((text[window[0][0]:window[-1][1]].strip(), len(window)))
+        return [(w, n) for w, n in windows if w]
+
+    def _pack(self, units: list[tuple[str, str, int]]) -> list[str]:
+        chunks: list[str] = []
+        current: list[tuple[str, str, int]] = []
+        size = 0
+
+        def cost(n: int) -> int:
+            return n + (self._sep_tokens if current else 0)
+
+        for unit in units:
+            kind, _, n = unit
+            new_section = kind == "heading" and size >= self.min_chunk_tokens
+            if current and (size + cost(n) > self.chunk_tokens or new_section):
+                carried = []
+                last = current[-1]
+                if (
+                    last[0] == "heading"
+                    and len(current) > 1
+                    and last[2] + self._sep_tokens + n <= self.chunk_tokens
+                ):
+                    # Keep a trailing heading with the content that follows it
+                    carried = [current.pop()]
+                chunks.append("\n\n".join(u[1] for u in current))
+
+                if not carried and not new_section:
+                    # Overlap: whole trailing blocks up to overlap_tokens
+                    overlap = 0
+                    for prev in reversed(current):
+                        if overlap + prev[2] > self.overlap_tokens:
+                            break
+                        carried.insert(0, prev)
+                        overlap += prev[2]
+                current = carried
+                size = sum(u[2] for u in current) + self._sep_tokens * max(0, len(current) - 1)
+                while current and size + cost(n) > self.chunk_tokens:
+                    size -= current.pop(0)[2] + (self._sep_tokens if current else 0)
+
+            size += cost(n)
+            current.append(unit)
+
+        if current:
+            chunks.append("\n\n".join(u[1] for u in current))
+        return chunks
+
+
+_chunker: TokenChunker | None = None
+_chunker_lock = threading.Lock()
+
+
+def get_chunker() -> TokenChunker:
+    """Process-wide TokenChunker on the encoder's tokenizer."""
+    global _chunker
+    with _chunker_lock:
+        if _chunker is None:
+            _chunker = TokenChunker(get_tokenizer())
+        return _chunker
+
+
+def chunker_signature() -> str:
+    """Identifies the chunking settings; part of the ingest manifest hash."""
+    if CHUNKER == "chars":
+        return "chars|1000|200"
+    return f"tokens|{EMBED_MODEL_NAME}|{CHUNK_TOKENS}|{CHUNK_OVERLAP_TOKENS}"
+
+
+def chunk_texts(texts: list[str]) -> list[list[str]]:
+    """Chunk texts with the configured CHUNKER ("tokens" or "chars")."""
+    if CHUNKER == "chars":
+        splitter = get_char_splitter()
+        return [splitter.split_text(text) for text in texts]
+    if CHUNKER == "tokens":
+        return get_chunker().chunk_many(texts)
+    raise ValueError(f"Unknown chunker: {CHUNKER}")
+
+
+def iter_chunked(
+    items: Iterable[T],
+    get_text: Callable[[T], str],
+    max_workers: int = CHUNK_WORKERS,
+    batch_size: int = 16,
+) -> Iterator[tuple[T, list[str]]]:
+    """
+    Yield (item, chunks) for a stream of items, in input order.
+
+    Batches of `batch_size` texts are chunked in a process pool (one
+    tokenizer per worker), with a few batches per worker in flight so
+    memory stays bounded. max_workers=0 uses the CPU count, 1 chunks in
+    the current process.
+    """
+    def batches() -> Iterator[list[T]]:
+        batch: list[T] = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    if max_workers == 1:
+        for batch in batches():
+            yield from zip(batch, chunk_texts([get_text(i) for i in batch]))
+        return
+
+    max_workers = max_workers or os.cpu_count() or 1
+    # The pool supplies the parallelism: one tokenizer thread per worker
+    # (inherited by the spawned children through the environment)
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # spawn, not fork: the parent may already have loaded the encoder or
+    # tokenizer, whose thread pools deadlock in forked children
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as pool:
+        in_flight: deque = deque()
+        for batch in batches():
+            in_flight.append((batch, pool.submit(chunk_texts, [get_text(i) for i in batch])))
+            if len(in_flight) >= max_workers * 2:
+                done_batch, future = in_flight.popleft()
+                yield from zip(done_batch, future.result())
+        while in_flight:
+            done_batch, future = in_flight.popleft()
+            yield from zip(done_batch, future.result())
+
+
+def _size_summary(sizes: list[int], limit: int) -> str:
+    sizes = sorted(sizes)
+    p95 = sizes[int(0.95 * (len(sizes) - 1))]
+    over = sum(s > limit for s in sizes)
+    return (
+        f"chunks={len(sizes)} tokens p50={statistics.median(sizes):.0f} p95={p95} "
+        f"max={sizes[-1]} stdev={statistics.pstdev(sizes):.1f} over_{limit}={over}"
+    )
+
+
+def benchmark(publication_dir: str = DATA_DIR, max_workers: int = CHUNK_WORKERS) -> None:
+    """Chunks/sec and token-size distribution: character splitter vs TokenChunker."""
+    from utils import load_all_publications
+
+    texts = [pub["content"] for pub in load_all_publications(publication_dir)]
+    chunker = get_chunker()
+    print(f"{len(texts)} publications, token limit {chunker.chunk_tokens}")
+
+    t0 = time.perf_counter()
+    splitter = get_char_splitter()
+    char_chunks = [c for text in texts for c in splitter.split_text(text)]
+    elapsed = time.perf_counter() - t0
+    print(f"chars  : {len(char_chunks) / elapsed:8.0f} chunks/sec  "
+          f"{_size_summary(chunker.count_tokens(char_chunks), chunker.chunk_tokens)}")
+
+    t0 = time.perf_counter()
+    token_chunks = [c for chunks in chunker.chunk_many(texts) for c in chunks]
+    elapsed = time.perf_counter() - t0
+    print(f"tokens : {len(token_chunks) / elapsed:8.0f} chunks/sec  "
+          f"{_size_summary(chunker.count_tokens(token_chunks), chunker.chunk_tokens)}")
+
+    t0 = time.perf_counter()
+    n_pooled = sum(len(chunks) for _, chunks in iter_chunked(texts, str, max_workers))
+    elapsed = time.perf_counter() - t0
+    print(f"{CHUNKER} (pool of {max_workers or os.cpu_count()}): {n_pooled / elapsed:8.0f} chunks/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token-aware chunking tools.")
+    parser.add_argument("--benchmark", action="store_true", help="Compare with the character splitter")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--workers", type=int, default=CHUNK_WORKERS)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.data_dir, args.workers)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,103 @@ BASE_DIR = Path(__file__).resolve().parent
 
 EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", "BAAI/bge-m3")
 
-# Old FAISS config (you can keep it for now, but it won’t be used)
+# Query encoder backend: "torch", "torch-int8" or "onnx" (see encoders.py)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_NUM_THREADS = int(os.getenv("EMBED_NUM_THREADS", "0"))  # 0 = library default
+EMBED_DEVICE = os.getenv("EMBED_DEVICE", "")  # "" = auto (cuda / mps / cpu)
+EMBED_MAX_SEQ_LENGTH = int(os.getenv("EMBED_MAX_SEQ_LENGTH", "8192"))
+EMBED_POOLING = os.getenv("EMBED_POOLING", "cls")  # BGE-M3 uses CLS pooling
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", str(BASE_DIR / "onnx_models"))
+
+# Query encoding service: "" (direct), "inprocess" (micro-batching across
+# sessions) or "unix" (shared sidecar, see embedding_service.py)
+EMBED_SERVICE = os.getenv("EMBED_SERVICE", "")
+EMBED_SOCKET_PATH = os.getenv("EMBED_SOCKET_PATH", "/tmp/askksa-embed.sock")
+EMBED_MICROBATCH_SIZE = int(os.getenv("EMBED_MICROBATCH_SIZE", "32"))
+EMBED_MICROBATCH_WAIT_MS = float(os.getenv("EMBED_MICROBATCH_WAIT_MS", "5"))
+
+# FAISS index files (VECTOR_BACKEND="faiss", built by vector_db_ingest --export faiss)
 INDEX_PATH = os.getenv("INDEX_PATH", str(BASE_DIR / "faiss_index_ip.bin"))
 CHUNKS_PATH = os.getenv("CHUNKS_PATH", str(BASE_DIR / "chunks.json"))
 META_PATH  = os.getenv("META_PATH",  str(BASE_DIR / "chunks_metadata.json"))
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "hnsw")  # flat | ivf | hnsw
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "256"))  # IVF lists (ingest time)
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))  # IVF lists probed (query time)
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))  # HNSW graph degree (ingest time)
+FAISS_EF_CONSTRUCTION = int(os.getenv("FAISS_EF_CONSTRUCTION", "200"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))  # HNSW candidates (query time)
 
 # New Chroma config
 VECTOR_DB_DIR = os.getenv("VECTOR_DB_DIR", str(BASE_DIR / "vector_db"))
 CHROMA_COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "publications")
 OUTPUTS_DIR = os.getenv("OUTPUTS_DIR", str(BASE_DIR / "outputs"))
-DATA_DIR = os.getenv("DATA_DIR", str(BASE_DIR / "data"))
\ No newline at end of file
+DATA_DIR = os.getenv("DATA_DIR", str(BASE_DIR / "data"))
+
+# Incremental ingestion manifest (per-publication content hashes + chunk IDs)
+INGEST_MANIFEST_PATH = os.getenv(
+    "INGEST_MANIFEST_PATH", str(Path(VECTOR_DB_DIR) / "ingest_manifest.json")
+)
+
+# Chunking: "tokens" (encoder-token budget, markdown-aware; see chunking.py)
+# or "chars" (legacy 1000/200 character splitter)
+CHUNKER = os.getenv("CHUNKER", "tokens")
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "0"))  # 0 = CPU count, 1 = in-process
+
+# Near-duplicate chunk collapsing at ingest (MinHash + LSH, see dedup.py)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))  # estimated Jaccard
+DEDUP_INDEX_PATH = os.getenv(
+    "DEDUP_INDEX_PATH", str(Path(VECTOR_DB_DIR) / "dedup_index.json")
+)
+
+# Prompt context: retrieved chunks are merged per article and packed into
+# this many tokens (encoder tokenizer; see context_packer.py)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2048"))
+
+# Ingestion batching
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+CHROMA_WRITE_BATCH_SIZE = int(os.getenv("CHROMA_WRITE_BATCH_SIZE", "2048"))
+
+# Persistent embedding cache shared by ingestion and querying
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "1") == "1"
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", str(BASE_DIR / "embed_cache"))
+EMBED_CACHE_DTYPE = os.getenv("EMBED_CACHE_DTYPE", "float16")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+
+# In-process LRU of query embeddings (per Streamlit process)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+
+# Semantic answer cache (SQLite)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", str(BASE_DIR / "answer_cache.sqlite3"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+# Written by ingestion whenever the collection changes; invalidates cached answers
+INDEX_VERSION_PATH = os.getenv(
+    "INDEX_VERSION_PATH", str(Path(VECTOR_DB_DIR) / "index_version")
+)
+
+# Retrieval selection: over-fetch k * RETRIEVAL_CANDIDATES hits, drop those
+# below RETRIEVAL_MIN_SIMILARITY (cosine) or after a similarity drop larger
+# than RETRIEVAL_SCORE_GAP, then pick up to k by MMR (1.0 = relevance only)
+RETRIEVAL_MMR_ENABLED = os.getenv("RETRIEVAL_MMR_ENABLED", "1") == "1"
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "4"))  # x k
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+RETRIEVAL_MIN_SIMILARITY = float(os.getenv("RETRIEVAL_MIN_SIMILARITY", "0.4"))
+RETRIEVAL_SCORE_GAP = float(os.getenv("RETRIEVAL_SCORE_GAP", "0.1"))
+RETRIEVAL_MIN_K = int(os.getenv("RETRIEVAL_MIN_K", "1"))
+
+# Vector search backend used at query time: "chroma", "numpy" or "faiss"
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+NUMPY_INDEX_DIR = os.getenv("NUMPY_INDEX_DIR", str(BASE_DIR / "vector_db" / "numpy_index"))
+NUMPY_INDEX_DTYPE = os.getenv("NUMPY_INDEX_DTYPE", "float16")  # float32 | float16 | int8
+NUMPY_INDEX_PCA_DIM = int(os.getenv("NUMPY_INDEX_PCA_DIM", "0"))  # 0 = keep full dim
+# Keep float32 copies on disk and rescore the top candidates exactly
+NUMPY_INDEX_RESCORE = os.getenv("NUMPY_INDEX_RESCORE", "0") == "1"
+NUMPY_RESCORE_CANDIDATES = int(os.getenv("NUMPY_RESCORE_CANDIDATES", "4"))  # x k
+# Exports whose recall@5 against exact float32 search falls below this are flagged
+NUMPY_MIN_RECALL = float(os.getenv("NUMPY_MIN_RECALL", "0.9"))
@@ -0,0 +1,202 @@
+# context_packer.py
+"""
+Token-budgeted context assembly for the LLM prompt.
+
+Retrieved chunks are grouped by source article (in rank order of each
+article's best hit). Within an article, chunks are ordered by their chunk
+index and consecutive chunks are merged, dropping the text they share
+through chunk overlap. Paragraphs already present earlier in the context
+(boilerplate repeated across articles) are dropped. Articles are then
+packed into `budget_tokens`; the article that does not fit is cut at a
+paragraph boundary and packing stops.
+
+Token counts use the encoder's tokenizer (chunking.get_chunker), which
+tracks but does not exactly match the LLM's own tokenizer.
+"""
+import re
+import threading
+from typing import Dict, List, Tuple
+
+from chunking import get_chunker
+from config import CONTEXT_TOKEN_BUDGET
+from embedding_cache import normalize_text
+
+_CHUNK_INDEX = re.compile(r"_(\d+)$")
+_SEPARATOR = "\n\n---\n\n"
+_GAP = "\n\n[…]\n\n"
+NO_CONTEXT = "No relevant context retrieved."
+
+
+def _chunk_index(chunk_id: str) -> int | None:
+    match = _CHUNK_INDEX.search(chunk_id or "")
+    return int(match.group(1)) if match else None
+
+
+def merge_overlapping(a: str, b: str, min_overlap: int = 20) -> str | None:
+    """
+    Join two consecutive chunks, dropping the longest suffix of `a` that
+    is also a prefix of `b`. Returns None if they do not overlap by at
+    least `min_overlap` characters.
+    """
+    probe = b[:min_overlap]
+    if len(probe) < min_overlap:
+        return None
+    start = max(0, len(a) - len(b))
+    while True:
+        pos = a.find(probe, start)
+        if pos < 0:
+            return None
+        if b.startswith(a[pos:]):
+            return a + b[len(a) - pos:]
+        start = pos + 1
+
+
+def _truncate_tokens(tokenizer, text: str, max_tokens: int) -> str:
+    """Longest prefix of `text` of at most `max_tokens` tokens, cut at a token boundary."""
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+    if len(offsets) <= max_tokens:
+        return text
+    return text[:offsets[max_tokens][0]].rstrip()
+
+
+def _header(hit: Dict) -> str:
+    header = f"### {hit.get('title') or 'Source'}"
+    if hit.get("source_url"):
+        header += f" ({hit['source_url']})"
+    return header
+
+
+def naive_context(retrieved: List[Dict]) -> str:
+    """Every chunk in full, one block per hit (the pre-packer prompt format)."""
+    parts = [f"{_header(hit)}\n\n{hit['content']}" for hit in retrieved]
+    return _SEPARATOR.join(parts) if parts else NO_CONTEXT
+
+
+def _article_text(hits: List[Dict]) -> str:
+    """Merge an article's hits in chunk order; non-adjacent chunks are marked as a gap."""
+    indexed = sorted(hits, key=lambda h: (_chunk_index(h["chunk_id"]) is None, _chunk_index(h["chunk_id"]) or 0))
+    text = indexed[0]["content"]
+    prev_idx = _chunk_index(indexed[0]["chunk_id"])
+    for hit in indexed[1:]:
+        idx = _chunk_index(hit["chunk_id"])
+        merged = None
+        if prev_idx is not None and idx == prev_idx + 1:
+            merged = merge_overlapping(text, hit["content"])
+            if merged is None:
+                # Adjacent but without character overlap (e.g. token chunker)
+                merged = f"{text}\n\n{hit['content']}"
+        text = merged if merged is not None else f"{text}{_GAP}{hit['content']}"
+        prev_idx = idx
+    return text
+
+
+class ContextStats:
+    """Process-wide totals of prompt tokens saved by the packer."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def record(self, before: int, after: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.tokens_before += before
+            self.tokens_after += after
+
+    def stats(self) -> Dict:
+        with self._lock:
+            saved = self.tokens_before - self.tokens_after
+            return {
+                "requests": self.requests,
+                "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after,
+                "tokens_saved": saved,
+                "saved_ratio": saved / self.tokens_before if self.tokens_before else 0.0,
+            }
+
+
+_context_stats = ContextStats()
+
+
+def context_stats() -> Dict:
+    return _context_stats.stats()
+
+
+def pack_context(
+    retrieved: List[Dict],
+    budget_tokens: int = CONTEXT_TOKEN_BUDGET,
+) -> Tuple[str, Dict]:
+    """
+    Build the prompt context from retrieval hits within `budget_tokens`.
+
+    Returns:
+        (context_text, report) where report has tokens_before (all chunks
+        concatenated as before), tokens_after, tokens_saved, articles and
+        truncated (True if an article was cut or dropped for the budget).
+    """
+    if not retrieved:
+        return NO_CONTEXT, {
+            "tokens_before": 0, "tokens_after": 0, "tokens_saved": 0,
+            "articles": 0, "truncated": False,
+        }
+
+    # Group by article, keeping the rank order of each article's best hit
+    groups: Dict[str, List[Dict]] = {}
+    for hit in retrieved:
+        key = hit.get("source_url") or hit.get("title") or hit["chunk_id"]
+        groups.setdefault(key, []).append(hit)
+
+    # Drop paragraphs that already appeared in a higher-ranked article
+    seen_paragraphs = set()
+    blocks = []
+    for hits in groups.values():
+        paragraphs = []
+        for para in _article_text(hits).split("\n\n"):
+            norm = normalize_text(para)
+            if norm and norm != "[…]" and norm in seen_paragraphs:
+                continue
+            seen_paragraphs.add(norm)
+            paragraphs.append(para)
+        body = "\n\n".join(paragraphs).strip()
+        if body and body != "[…]":
+            blocks.append((_header(hits[0]), paragraphs))
+
+    counter = get_chunker()
+    sep_tokens = counter.count_tokens([_SEPARATOR])[0]
+    block_texts = [f"{header}\n\n" + "\n\n".join(paras) for header, paras in blocks]
+    block_tokens = counter.count_tokens(block_texts)
+
+    packed, used, truncated = [], 0, False
+    for (header, paragraphs), text, n in zip(blocks, block_texts, block_tokens):
+        cost = n + (sep_tokens if packed else 0)
+        if used + cost <= budget_tokens:
+            packed.append(text)
+            used += cost
+            continue
+
+        # Cut this article at a paragraph boundary to fill the remaining budget
+        truncated = True
+        remaining = budget_tokens - used - (sep_tokens if packed else 0)
+        prefixes = [
+            f"{header}\n\n" + "\n\n".join(paragraphs[:i]) for i in range(1, len(paragraphs) + 1)
+        ]
+        fits = [p for p, pn in zip(prefixes, counter.count_tokens(prefixes)) if pn <= remaining]
+        if fits:
+            packed.append(fits[-1])
+        elif not packed:
+            # Even the top article's first paragraph is over budget: cut it mid-paragraph
+            packed.append(_truncate_tokens(counter.tokenizer, prefixes[0], remaining))
+        break
+
+    context_text = _SEPARATOR.join(packed) if packed else NO_CONTEXT
+    tokens_before, tokens_after = counter.count_tokens([naive_context(retrieved), context_text])
+    _context_stats.record(tokens_before, tokens_after)
+    return context_text, {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "articles": len(packed),
+        "truncated": truncated,
+    }
@@ -1,14 +1,13 @@
 # data_loader.py
-import json
-import os
+import threading
+import time
 from pathlib import Path
 
-import chromadb
-import faiss
+import numpy as np
 import streamlit as st
-from sentence_transformers import SentenceTransformer
 
-from config import EMBED_MODEL_NAME, VECTOR_DB_DIR, CHROMA_COLLECTION_NAME
+from config import EMBED_BACKEND, EMBED_SERVICE, VECTOR_BACKEND
+
 
 def _check_files_exist(paths):
     """Raise a clear error if any of the needed files is missing."""
@@ -17,19 +16,110 @@ def _check_files_exist(paths):
         raise FileNotFoundError("Missing files: " + ", ".join(missing))
 
 
-@st.cache_resource(show_spinner=False)
-def load_resources():
+def _load_query_encoder(get_shared_encoder):
+    """Direct encoder, in-process micro-batcher or sidecar client (EMBED_SERVICE)."""
+    if EMBED_SERVICE == "unix":
+        from embedding_service import RemoteEncoder
+
+        return RemoteEncoder()
+    if EMBED_SERVICE == "inprocess":
+        from embedding_service import MicroBatchEncoder
+
+        return MicroBatchEncoder(get_shared_encoder())
+    return get_shared_encoder()
+
+
+class ResourceLoader:
     """
-    Load the embedding model and Chroma collection used for RAG.
-    Called once per Streamlit session and cached.
+    Loads the embedding model and vector backend in a background thread so
+    the UI can render immediately, then warms up the hot paths with a dummy
+    encode + query. Per-phase timings are kept in `timings` and printed.
     """
 
-    # Load embedding model (for query encoding only)
-    embed_model = SentenceTransformer(EMBED_MODEL_NAME)
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+        self._result = None
+        self._error: Exception | None = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="resource-loader", daemon=True)
+        self._thread.start()
+
+    def _phase(self, name: str, started: float) -> float:
+        now = time.perf_counter()
+        self.timings[name] = now - started
+        return now
+
+    def _run(self) -> None:
+        try:
+            t0 = t = time.perf_counter()
+
+            # Heavy imports happen here, off the UI thread
+            from encoders import check_fingerprint, get_shared_encoder
+            from utils import set_seeds
+            from vector_backends import load_backend
+            t = self._phase("imports", t)
+
+            # Set the random seed for reproducibility; torch only when a torch
+            # encoder runs in this process (not for ONNX or the sidecar)
+            set_seeds(42, seed_torch=EMBED_BACKEND.startswith("torch") and EMBED_SERVICE != "unix")
+
+            # Load embedding model (the same process-wide encoder ingestion
+            # uses), with the configured backend (torch, torch-int8 or ONNX),
+            # optionally behind the micro-batching service
+            embed_model = _load_query_encoder(get_shared_encoder)
+            t = self._phase("load_model", t)
+
+            # Open the configured vector backend (Chroma, NumPy flat index or FAISS),
+            # which exposes a Chroma-compatible query()
+            collection = load_backend(VECTOR_BACKEND)
+            # Refuse to query an index built with a different encoder
+            check_fingerprint(collection.fingerprint(), embed_model)
+            t = self._phase("open_backend", t)
 
-    # 2) Connect to the persistent Chroma DB
-    client = chromadb.PersistentClient(path=VECTOR_DB_DIR)
-    collection = client.get_collection(name=CHROMA_COLLECTION_NAME)
+            # Warm-up: first forward pass and first query pay lazy-init costs
+            warm_emb = embed_model.encode(["warm up"], normalize_embeddings=True)
+            t = self._phase("warmup_encode", t)
+            if collection.count() > 0:
+                collection.query(
+                    query_embeddings=np.asarray(warm_emb, dtype="float32"), n_results=1
+                )
+            t = self._phase("warmup_query", t)
 
-    # return embed_model, index, all_chunks, all_chunks_metadata
-    return embed_model, collection
\ No newline at end of file
+            self.timings["total"] = t - t0
+            self._result = (embed_model, collection)
+            print(
+                "Startup timings: "
+                + ", ".join(f"{name}={secs:.2f}s" for name, secs in self.timings.items())
+            )
+        except Exception as e:
+            self._error = e
+            print(f"Failed to load RAG resources: {e!r}")
+        finally:
+            self._done.set()
+
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float | None = None):
+        """Block until loading finished; return (embed_model, collection) or raise."""
+        if not self._done.wait(timeout):
+            raise TimeoutError("RAG resources are still loading")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+@st.cache_resource(show_spinner=False)
+def get_resource_loader() -> ResourceLoader:
+    """
+    Process-wide loader, started on first call and cached by Streamlit.
+    """
+    return ResourceLoader()
+
+
+def load_resources():
+    """
+    Load the embedding model and the vector search backend used for RAG
+    (blocking). Returns (embed_model, collection).
+    """
+    return get_resource_loader().wait()
@@ -0,0 +1,308 @@
+# dedup.py
+"""
+Near-duplicate chunk collapsing at ingest time.
+
+Scraped articles repeat the same boilerplate paragraphs, fee tables and
+how-to sections across dozens of posts. Every chunk is fingerprinted with
+a MinHash signature over word shingles (after normalize_query, so Arabic /
+Urdu spelling variants and diacritics do not matter) and looked up in an
+LSH index of the stored chunks. A chunk whose estimated Jaccard similarity
+with a stored chunk is >= `threshold` is not embedded or stored; the stored
+chunk's metadata lists every source article instead:
+
+    "sources":   JSON list of {"chunk_id", "title", "source_url"}
+    "n_sources": number of source chunks collapsed into this one
+
+State (signatures, chunk -> canonical mapping, source metadata) is kept in
+DEDUP_INDEX_PATH so incremental syncs keep collapsing against what is
+already stored. When the stored copy of a group is removed, the next
+member is promoted: the record is moved to its ID. Deletes and moves go
+through the ingest ChunkWriter, so they are applied in bulk on its next
+flush instead of one Chroma round trip per chunk.
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from config import DEDUP_INDEX_PATH, DEDUP_THRESHOLD
+from embedding_cache import normalize_query
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_SOURCE_FIELDS = ("title", "source_url", "path", "scraped_at")
+
+
+def shingles(text: str, k: int = 5) -> set[str]:
+    """Word k-shingles of the normalized text (the whole text if shorter than k words)."""
+    words = normalize_query(text).split()
+    if len(words) <= k:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+class MinHasher:
+    """MinHash signatures with `num_perm` universal hash permutations (deterministic seed)."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a, b < 2**31 and shingle hashes < 2**32: a * x + b fits in uint64
+        self.a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                for s in shingles(text)
+            ),
+            dtype=np.uint64,
+        )
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % _MERSENNE_PRIME
+        return (permuted.min(axis=1) & 0xFFFFFFFF).astype(np.uint32)
+
+
+def estimated_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    return float(np.mean(sig_a == sig_b))
+
+
+class ChunkDeduplicator:
+    """
+    Collapses near-duplicate chunks before they are embedded and written.
+
+    Used by vector_db_ingest: filter() on new chunk records, remove() on
+    chunk IDs that are going away, then finalize() after `writer` flushed
+    so the stored chunks' source lists are updated and the state is saved.
+    """
+
+    def __init__(
+        self,
+        collection,
+        writer,
+        index_path: str = DEDUP_INDEX_PATH,
+        threshold: float = DEDUP_THRESHOLD,
+        num_perm: int = 128,
+        bands: int = 16,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.collection = collection
+        self.writer = writer
+        self.index_path = index_path
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._lock = threading.RLock()
+
+        # chunk_id -> {"canonical": id, "sig": np.ndarray, "source": {...}}
+        self._chunks: dict[str, dict] = {}
+        # canonical id -> member chunk ids (including itself), in insertion order
+        self._members: dict[str, list[str]] = {}
+        self._buckets: dict[tuple, set[str]] = {}
+        self._dirty: set[str] = set()
+        self.collapsed = 0
+
+        self._load()
+
+    # ---------- persistence ----------
+
+    def _load(self) -> None:
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding="utf-8") as f:
+            state = json.load(f)
+        params = {"num_perm": self.hasher.num_perm, "bands": self.bands}
+        if state.get("params") != params:
+            # Signatures are not comparable; collapse only new chunks from here on
+            print(f"Dedup index {self.index_path} has different parameters; starting over.")
+            return
+        for chunk_id, entry in state["chunks"].items():
+            sig = np.frombuffer(base64.b64decode(entry["sig"]), dtype=np.uint32)
+            self._chunks[chunk_id] = {
+                "canonical": entry["canonical"],
+                "sig": sig,
+                "source": entry["source"],
+            }
+            self._members.setdefault(entry["canonical"], []).append(chunk_id)
+        for canonical in self._members:
+            self._index(canonical, self._chunks[canonical]["sig"])
+
+    def save(self) -> None:
+        with self._lock:
+            state = {
+                "params": {"num_perm": self.hasher.num_perm, "bands": self.bands},
+                "chunks": {
+                    chunk_id: {
+                        "canonical": entry["canonical"],
+                        "sig": base64.b64encode(entry["sig"].tobytes()).decode("ascii"),
+                        "source": entry["source"],
+                    }
+                    for chunk_id, entry in self._chunks.items()
+                },
+            }
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+
+    # ---------- LSH ----------
+
+    def _band_keys(self, sig: np.ndarray) -> list[tuple]:
+        return [
+            (band, sig[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _index(self, canonical: str, sig: np.ndarray) -> None:
+        for key in self._band_keys(sig):
+            self._buckets.setdefault(key, set()).add(canonical)
+
+    def _unindex(self, canonical: str, sig: np.ndarray) -> None:
+        for key in self._band_keys(sig):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(canonical)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _find_duplicate(self, sig: np.ndarray) -> str | None:
+        candidates = set()
+        for key in self._band_keys(sig):
+            candidates |= self._buckets.get(key, set())
+        best, best_sim = None, self.threshold
+        for canonical in candidates:
+            sim = estimated_jaccard(sig, self._chunks[canonical]["sig"])
+            if sim >= best_sim:
+                best, best_sim = canonical, sim
+        return best
+
+    # ---------- ingest hooks ----------
+
+    def metadata_for(self, canonical: str, base: dict | None = None) -> dict:
+        """Metadata of a stored chunk: its own fields plus the list of all sources."""
+        with self._lock:
+            members = self._members[canonical]
+            meta = dict(base) if base is not None else {
+                k: v for k, v in self._chunks[canonical]["source"].items() if k != "chunk_id"
+            }
+            meta["sources"] = json.dumps(
+                [
+                    {
+                        "chunk_id": m,
+                        "title": self._chunks[m]["source"].get("title"),
+                        "source_url": self._chunks[m]["source"].get("source_url"),
+                    }
+                    for m in members
+                ],
+                ensure_ascii=False,
+            )
+            meta["n_sources"] = len(members)
+            return meta
+
+    def filter(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict],
+    ) -> tuple[list[str], list[str], list[dict]]:
+        """
+        Register new chunks; return only those that must be embedded and
+        stored (near-duplicates of stored chunks are collapsed into them).
+        """
+        keep_ids, keep_docs, keep_metas = [], [], []
+        with self._lock:
+            stale = [chunk_id for chunk_id in ids if chunk_id in self._chunks]
+            if stale:
+                self.remove(stale)
+            for chunk_id, doc, meta in zip(ids, documents, metadatas):
+                sig = self.hasher.signature(doc)
+                source = {k: meta.get(k) for k in _SOURCE_FIELDS}
+                canonical = self._find_duplicate(sig)
+                if canonical is not None and canonical != chunk_id:
+                    self._chunks[chunk_id] = {"canonical": canonical, "sig": sig, "source": source}
+                    self._members[canonical].append(chunk_id)
+                    self._dirty.add(canonical)
+                    self.collapsed += 1
+                    continue
+
+                self._chunks[chunk_id] = {"canonical": chunk_id, "sig": sig, "source": source}
+                self._members[chunk_id] = [chunk_id]
+                self._index(chunk_id, sig)
+                keep_ids.append(chunk_id)
+                keep_docs.append(doc)
+                keep_metas.append(self.metadata_for(chunk_id, meta))
+        return keep_ids, keep_docs, keep_metas
+
+    def remove(self, chunk_ids: list[str]) -> None:
+        """
+        Forget chunks. Stored chunks with no remaining members are deleted;
+        otherwise the next member takes over the stored record (both queued
+        on the writer).
+        """
+        to_delete = []
+        with self._lock:
+            for chunk_id in chunk_ids:
+                entry = self._chunks.pop(chunk_id, None)
+                if entry is None:
+                    # Not tracked (ingested before dedup was enabled)
+                    to_delete.append(chunk_id)
+                    continue
+                canonical = entry["canonical"]
+                members = self._members[canonical]
+                members.remove(chunk_id)
+                if chunk_id != canonical:
+                    self._dirty.add(canonical)
+                    continue
+
+                self._unindex(chunk_id, entry["sig"])
+                del self._members[canonical]
+                self._dirty.discard(canonical)
+                if members:
+                    self._promote(canonical, members)
+                else:
+                    to_delete.append(chunk_id)
+        if to_delete:
+            self.writer.delete(to_delete)
+
+    def _promote(self, old_id: str, members: list[str]) -> None:
+        """Move the stored record of `old_id` to the first remaining member."""
+        new_id = members[0]
+        for member in members:
+            self._chunks[member]["canonical"] = new_id
+        self._members[new_id] = members
+        self._index(new_id, self._chunks[new_id]["sig"])
+        self.writer.move(old_id, new_id, self.metadata_for(new_id))
+
+    def finalize(self) -> None:
+        """Refresh source lists of stored chunks whose members changed, then save."""
+        with self._lock:
+            dirty = sorted(c for c in self._dirty if c in self._members)
+            if dirty:
+                existing = set(self.collection.get(ids=dirty, include=[])["ids"])
+                # Canonicals still waiting to be written stay dirty until then
+                ready = [c for c in dirty if c in existing]
+                if ready:
+                    self.collection.update(
+                        ids=ready, metadatas=[self.metadata_for(c) for c in ready]
+                    )
+                self._dirty = set(dirty) - existing
+            else:
+                self._dirty = set()
+        self.save()
+
+    def stats(self) -> dict:
+        """Chunks produced vs stored; dedup_ratio is the fraction not stored."""
+        with self._lock:
+            n_chunks = len(self._chunks)
+            n_stored = len(self._members)
+        return {
+            "chunks": n_chunks,
+            "stored": n_stored,
+            "dedup_ratio": 1 - n_stored / n_chunks if n_chunks else 0.0,
+            "collapsed": self.collapsed,
+        }
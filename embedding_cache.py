@@ -0,0 +1,282 @@
+# embedding_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+import numpy as np
+
+from config import (
+    EMBED_CACHE_DIR,
+    EMBED_CACHE_DTYPE,
+    EMBED_CACHE_ENABLED,
+    EMBED_CACHE_MAX_ENTRIES,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key         TEXT PRIMARY KEY,
+    vector      BLOB NOT NULL,
+    last_used   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used);
+"""
+# Keys per "IN (...)" query (SQLite's default host-parameter limit is 999)
+_SQL_BATCH = 900
+# A cache hit re-stamps last_used at most this often
+_TOUCH_SECONDS = 3600.0
+
+# Arabic-script variants unified for query keys (Arabic vs Urdu/Persian forms)
+_ARABIC_VARIANTS = str.maketrans({
+    "\u064a": "\u06cc",  # ي Arabic yeh      -> ی Farsi yeh
+    "\u0649": "\u06cc",  # ى alef maksura    -> ی
+    "\u0643": "\u06a9",  # ك Arabic kaf      -> ک keheh
+    "\u0647": "\u06c1",  # ه heh             -> ہ heh goal
+    "\u0629": "\u06c1",  # ة teh marbuta     -> ہ
+    "\u0623": "\u0627",  # أ                 -> ا
+    "\u0625": "\u0627",  # إ                 -> ا
+    "\u0622": "\u0627",  # آ                 -> ا
+    "\u0640": None,       # tatweel
+})
+# Harakat / superscript alef (optional diacritics)
+_ARABIC_DIACRITICS = re.compile(r"[\u064b-\u0652\u0670]")
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize (NFC) and collapse whitespace before hashing."""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+
+def text_key(namespace: str, text: str) -> str:
+    """Content address of an embedding: hash of (cache namespace, normalized text)."""
+    h = hashlib.sha256()
+    h.update(namespace.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(normalize_text(text).encode("utf-8"))
+    return h.hexdigest()
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a user query for cache lookups: NFC, Arabic/Urdu character
+    variants unified, diacritics dropped, case folded, whitespace collapsed.
+    """
+    text = unicodedata.normalize("NFC", text)
+    text = _ARABIC_DIACRITICS.sub("", text.translate(_ARABIC_VARIANTS))
+    return " ".join(text.casefold().split())
+
+
+class QueryEmbeddingLRU:
+    """
+    Thread-safe, bounded in-process LRU of query embeddings keyed by
+    normalize_query(text). Sits in front of the persistent EmbeddingCache.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str) -> np.ndarray | None:
+        key = normalize_query(text)
+        with self._lock:
+            vec = self._entries.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return vec
+
+    def put(self, text: str, vec: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        key = normalize_query(text)
+        with self._lock:
+            self._entries[key] = vec
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+            }
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of L2-normalized embeddings in
+    SQLite, shared by every process that encodes with the same encoder
+    (ingestion, the Streamlit app, the streaming indexer, batch Q&A).
+
+    Entries are keyed by (namespace, normalized text); the namespace is the
+    encoder fingerprint plus backend and storage dtype (see
+    cache_namespace), so vectors from one encoder are never served for
+    another. SQLite's locking makes concurrent readers and writers across
+    processes safe; each put writes only the new rows. Above `max_entries`
+    the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        namespace: str,
+        dtype: str = EMBED_CACHE_DTYPE,
+        max_entries: int = EMBED_CACHE_MAX_ENTRIES,
+    ):
+        self.namespace = namespace
+        self.dtype = np.dtype(dtype)
+        self.max_entries = max_entries
+        self.db_path = os.path.join(cache_dir, "embeddings.sqlite3")
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as conn:
+            # WAL: readers in other processes are not blocked by a writer
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per operation: safe across threads and processes
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _key(self, text: str) -> str:
+        return text_key(self.namespace, text)
+
+    # ---------- lookups ----------
+
+    def get_many(self, texts: list[str]) -> list[np.ndarray | None]:
+        """Return cached float32 vectors (or None on a miss) for each text."""
+        keys = [self._key(t) for t in texts]
+        found: dict[str, tuple[bytes, float]] = {}
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), _SQL_BATCH):
+                batch = unique[start:start + _SQL_BATCH]
+                rows = conn.execute(
+                    f"SELECT key, vector, last_used FROM embeddings "
+                    f"WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                found.update((key, (vector, last_used)) for key, vector, last_used in rows)
+
+            # Refresh LRU positions coarsely, so reads rarely write
+            stale = [(now, key) for key, (_, used) in found.items() if now - used > _TOUCH_SECONDS]
+            if stale:
+                conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", stale)
+
+            out: list[np.ndarray | None] = []
+            for key in keys:
+                entry = found.get(key)
+                if entry is None:
+                    self.misses += 1
+                    out.append(None)
+                    continue
+                self.hits += 1
+                out.append(np.frombuffer(entry[0], dtype=self.dtype).astype("float32"))
+        return out
+
+    def put_many(self, texts: list[str], vectors) -> None:
+        """Store vectors for texts, evicting least recently used entries if full."""
+        vectors = np.asarray(vectors, dtype="float32")
+        if len(texts) == 0:
+            return
+        now = time.time()
+        rows = [
+            (self._key(text), vec.astype(self.dtype).tobytes(), now)
+            for text, vec in zip(texts, vectors)
+        ]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._puts_since_evict += len(rows)
+            # Counting is a full scan: only check the size every few hundred inserts
+            if self._puts_since_evict >= max(256, self.max_entries // 100):
+                self._puts_since_evict = 0
+                conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def stats(self) -> dict:
+        with self._lock, self._connect() as conn:
+            size = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size}
+
+
+def cache_namespace(encoder, dtype: str = EMBED_CACHE_DTYPE) -> str:
+    """
+    Cache namespace of an encoder: its fingerprint (model, pooling, dim),
+    backend (torch / torch-int8 / onnx vectors differ slightly) and the
+    storage dtype.
+    """
+    from encoders import encoder_fingerprint
+
+    return f"{encoder_fingerprint(encoder)}|backend={encoder.backend}|dtype={np.dtype(dtype).name}"
+
+
+def cached_encode(
+    texts: list[str],
+    encode_fn: Callable[[list[str]], np.ndarray],
+    cache: "EmbeddingCache | None",
+) -> np.ndarray:
+    """
+    Encode texts through the cache: only misses are passed to `encode_fn`
+    (which must return L2-normalized vectors). Returns a float32 matrix in
+    the order of `texts`.
+    """
+    if cache is None:
+        return np.asarray(encode_fn(texts), dtype="float32")
+
+    cached = cache.get_many(texts)
+    miss_idx = [i for i, vec in enumerate(cached) if vec is None]
+    if miss_idx:
+        miss_texts = [texts[i] for i in miss_idx]
+        fresh = np.asarray(encode_fn(miss_texts), dtype="float32")
+        cache.put_many(miss_texts, fresh)
+        for i, vec in zip(miss_idx, fresh):
+            cached[i] = vec
+    return np.vstack(cached).astype("float32", copy=False)
+
+
+_caches: dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(encoder) -> EmbeddingCache | None:
+    """Process-wide cache for an encoder's vectors, or None if caching is disabled."""
+    if not EMBED_CACHE_ENABLED:
+        return None
+    namespace = cache_namespace(encoder)
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = EmbeddingCache(EMBED_CACHE_DIR, namespace)
+        return _caches[namespace]
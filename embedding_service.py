@@ -0,0 +1,272 @@
+# embedding_service.py
+"""
+Cross-session micro-batching for query encoding.
+
+Concurrent encode() calls (one per Streamlit session thread) are collected
+for up to `max_wait_ms` or `max_batch_size` texts and run as one forward
+pass. Use it in-process (MicroBatchEncoder) or as a local sidecar over a
+Unix socket so several app worker processes share one model copy:
+
+    python embedding_service.py --socket /tmp/askksa-embed.sock
+    EMBED_SERVICE=unix streamlit run app.py
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+from config import EMBED_MICROBATCH_SIZE, EMBED_MICROBATCH_WAIT_MS, EMBED_SOCKET_PATH
+
+
+class MicroBatchEncoder:
+    """
+    Drop-in wrapper around an encoder: encode() calls from many threads are
+    merged into batched forward passes by a single worker thread.
+    """
+
+    def __init__(
+        self,
+        encoder,
+        max_batch_size: int = EMBED_MICROBATCH_SIZE,
+        max_wait_ms: float = EMBED_MICROBATCH_WAIT_MS,
+    ):
+        self.encoder = encoder
+        self.model_name = encoder.model_name
+        self.pooling = encoder.pooling
+        self.backend = encoder.backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: queue.Queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._max_queue_depth = 0
+        self._n_requests = 0
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+        self._worker = threading.Thread(target=self._run, name="embed-microbatch", daemon=True)
+        self._worker.start()
+
+    def dimension(self) -> int:
+        return self.encoder.dimension()
+
+    def encode(self, texts, normalize_embeddings: bool = True, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        future: Future = Future()
+        self._queue.put((list(texts), normalize_embeddings, time.perf_counter(), future))
+        with self._stats_lock:
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return future.result()
+
+    def _collect(self) -> list:
+        """Block for one request, then gather more until the batch is full or the window closes."""
+        pending = [self._queue.get()]
+        n_texts = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_texts < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(request)
+            n_texts += len(request[0])
+        return pending
+
+    def _run(self) -> None:
+        while True:
+            pending = self._collect()
+            started = time.perf_counter()
+
+            # Requests with different normalization cannot share a pass
+            for normalize in {req[1] for req in pending}:
+                group = [req for req in pending if req[1] == normalize]
+                texts = [t for req in group for t in req[0]]
+                try:
+                    vectors = np.asarray(
+                        self.encoder.encode(
+                            texts, normalize_embeddings=normalize, batch_size=len(texts)
+                        ),
+                        dtype="float32",
+                    )
+                except Exception as e:
+                    for req in group:
+                        req[3].set_exception(e)
+                    continue
+                offset = 0
+                for req in group:
+                    n = len(req[0])
+                    req[3].set_result(vectors[offset:offset + n])
+                    offset += n
+
+            with self._stats_lock:
+                self._batch_sizes[sum(len(req[0]) for req in pending)] += 1
+                for req in pending:
+                    waited = started - req[2]
+                    self._n_requests += 1
+                    self._total_wait += waited
+                    self._max_wait_seen = max(self._max_wait_seen, waited)
+
+    def stats(self) -> dict:
+        """Queue depth, batch size histogram and per-request wait times (ms)."""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "requests": self._n_requests,
+                "mean_wait_ms": 1000 * self._total_wait / self._n_requests if self._n_requests else 0.0,
+                "max_wait_ms": 1000 * self._max_wait_seen,
+            }
+
+
+# ---------- Unix socket sidecar ----------
+# Framing: 4-byte big-endian length + JSON header, optionally followed by
+# raw float32 bytes (responses to "encode").
+
+def _send(sock: socket.socket, header: dict, payload: bytes = b"") -> None:
+    data = json.dumps(header).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(data)) + data + payload)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("Embedding service closed the connection")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _recv_header(sock: socket.socket) -> dict:
+    (length,) = struct.unpack(">I", _recv_exact(sock, 4))
+    return json.loads(_recv_exact(sock, length))
+
+
+class _EmbedRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        service: MicroBatchEncoder = self.server.service  # type: ignore[attr-defined]
+        while True:
+            try:
+                request = _recv_header(self.request)
+            except ConnectionError:
+                return
+            try:
+                op = request.get("op")
+                if op == "encode":
+                    vectors = service.encode(request["texts"], request.get("normalize", True))
+                    vectors = np.ascontiguousarray(vectors, dtype="float32")
+                    _send(self.request, {"shape": list(vectors.shape)}, vectors.tobytes())
+                elif op == "info":
+                    _send(
+                        self.request,
+                        {
+                            "model_name": service.model_name,
+                            "pooling": service.pooling,
+                            "backend": service.backend,
+                            "dimension": service.dimension(),
+                        },
+                    )
+                elif op == "stats":
+                    _send(self.request, service.stats())
+                else:
+                    _send(self.request, {"error": f"Unknown op: {op}"})
+            except Exception as e:
+                _send(self.request, {"error": str(e)})
+
+
+class _EmbedServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(service: MicroBatchEncoder, socket_path: str = EMBED_SOCKET_PATH) -> None:
+    """Serve `service` on a Unix socket until interrupted."""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    with _EmbedServer(socket_path, _EmbedRequestHandler) as server:
+        server.service = service  # type: ignore[attr-defined]
+        print(f"Embedding service listening on {socket_path}")
+        server.serve_forever()
+
+
+class RemoteEncoder:
+    """
+    Client for the sidecar; same encode() interface as the local encoders.
+    One connection per thread, created on first use.
+    """
+
+    def __init__(self, socket_path: str = EMBED_SOCKET_PATH):
+        self.socket_path = socket_path
+        self._local = threading.local()
+        info = self._call({"op": "info"})
+        self.model_name = info["model_name"]
+        self.pooling = info["pooling"]
+        self.backend = info["backend"]
+        self._dimension = info["dimension"]
+
+    def _socket(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _call(self, request: dict) -> dict:
+        sock = self._socket()
+        try:
+            _send(sock, request)
+            header = _recv_header(sock)
+        except (ConnectionError, OSError):
+            self._local.sock = None
+            raise
+        if "error" in header:
+            raise RuntimeError(f"Embedding service error: {header['error']}")
+        return header
+
+    def dimension(self) -> int:
+        return self._dimension
+
+    def encode(self, texts, normalize_embeddings: bool = True, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        header = self._call({"op": "encode", "texts": list(texts), "normalize": normalize_embeddings})
+        rows, dim = header["shape"]
+        payload = _recv_exact(self._socket(), rows * dim * 4)
+        return np.frombuffer(payload, dtype="float32").reshape(rows, dim)
+
+    def stats(self) -> dict:
+        return self._call({"op": "stats"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shared embedding sidecar.")
+    parser.add_argument("--socket", default=EMBED_SOCKET_PATH, help="Unix socket path")
+    parser.add_argument("--max-batch-size", type=int, default=EMBED_MICROBATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=EMBED_MICROBATCH_WAIT_MS)
+    args = parser.parse_args()
+
+    from encoders import get_shared_encoder
+
+    service = MicroBatchEncoder(
+        get_shared_encoder(),
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+    )
+    serve(service, args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+# encoders.py
+"""
+Query/document encoders behind one interface:
+
+    encoder.encode(texts, normalize_embeddings=True, batch_size=32) -> np.ndarray
+
+which is the subset of SentenceTransformer.encode that the rest of the code
+uses. Backends (EMBED_BACKEND):
+    "torch"       plain SentenceTransformer (reference)
+    "torch-int8"  SentenceTransformer with torch dynamic int8 quantization
+                  of all Linear layers (CPU only)
+    "onnx"        the transformer exported once to ONNX and run with
+                  ONNX Runtime; pooling + normalization done in NumPy
+
+EMBED_MODEL_NAME may be a local model directory, so everything (including
+validate_encoder) runs without downloads.
+
+Ingestion and querying share one process-wide encoder (get_shared_encoder)
+with the same normalization, batch size, device and precision, and the
+collection records encoder_fingerprint() so a mismatched encoder is refused.
+"""
+import argparse
+import os
+import re
+import threading
+
+import numpy as np
+
+from config import (
+    EMBED_BACKEND,
+    EMBED_DEVICE,
+    EMBED_MAX_SEQ_LENGTH,
+    EMBED_MODEL_NAME,
+    EMBED_NUM_THREADS,
+    EMBED_POOLING,
+    ONNX_MODEL_DIR,
+)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+
+def _set_torch_threads(num_threads: int) -> None:
+    if num_threads > 0:
+        import torch
+
+        torch.set_num_threads(num_threads)
+
+
+def _sentence_transformer_pooling(model) -> str:
+    """Pooling mode of a loaded SentenceTransformer ("cls", "mean", ...)."""
+    for module in model:
+        get_mode = getattr(module, "get_pooling_mode_str", None)
+        if get_mode is not None:
+            return get_mode()
+    return "none"
+
+
+class SentenceTransformerEncoder:
+    """Reference encoder: a SentenceTransformer on CPU (or the given device)."""
+
+    backend = "torch"
+
+    def __init__(
+        self,
+        model_name: str = EMBED_MODEL_NAME,
+        device: str | None = EMBED_DEVICE or None,
+        num_threads: int = EMBED_NUM_THREADS,
+    ):
+        from sentence_transformers import SentenceTransformer
+
+        _set_torch_threads(num_threads)
+        self.model_name = model_name
+        # device=None lets sentence-transformers pick cuda / mps / cpu
+        self.model = SentenceTransformer(model_name, device=device)
+        self.model.max_seq_length = min(self.model.max_seq_length, EMBED_MAX_SEQ_LENGTH)
+        self.pooling = _sentence_transformer_pooling(self.model)
+
+    def dimension(self) -> int:
+        return int(self.model.get_sentence_embedding_dimension())
+
+    def encode(self, texts, normalize_embeddings: bool = True, batch_size: int = 32, **kwargs):
+        return np.asarray(
+            self.model.encode(
+                texts,
+                normalize_embeddings=normalize_embeddings,
+                batch_size=batch_size,
+                **kwargs,
+            ),
+            dtype="float32",
+        )
+
+
+class QuantizedTorchEncoder(SentenceTransformerEncoder):
+    """SentenceTransformer with dynamic int8 quantization of nn.Linear layers."""
+
+    backend = "torch-int8"
+
+    def __init__(
+        self,
+        model_name: str = EMBED_MODEL_NAME,
+        num_threads: int = EMBED_NUM_THREADS,
+    ):
+        import torch
+
+        super().__init__(model_name, device="cpu", num_threads=num_threads)
+        self.model = torch.quantization.quantize_dynamic(
+            self.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+
+class OnnxEncoder:
+    """
+    Transformer exported to ONNX (once, cached under ONNX_MODEL_DIR) and run
+    with ONNX Runtime. `pooling` must match the model's SentenceTransformer
+    pooling ("cls" for BGE-M3, "mean" for most MiniLM-style models).
+    """
+
+    backend = "onnx"
+
+    def __init__(
+        self,
+        model_name: str = EMBED_MODEL_NAME,
+        num_threads: int = EMBED_NUM_THREADS,
+        pooling: str = EMBED_POOLING,
+        onnx_dir: str = ONNX_MODEL_DIR,
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.pooling = pooling
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        model_path = os.path.join(onnx_dir, re.sub(r"[^\w.-]+", "_", model_name), "model.onnx")
+        if not os.path.exists(model_path):
+            export_onnx(model_name, model_path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._dimension: int | None = None
+
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = int(self.encode(["dimension"]).shape[1])
+        return self._dimension
+
+    def encode(self, texts, normalize_embeddings: bool = True, batch_size: int = 32, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        # Length-sorted batches: less padding per batch
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            batch_idx = order[start:start + batch_size]
+            enc = self.tokenizer(
+                [texts[i] for i in batch_idx],
+                padding=True,
+                truncation=True,
+                max_length=EMBED_MAX_SEQ_LENGTH,
+                return_tensors="np",
+            )
+            feeds = {k: v.astype("int64") for k, v in enc.items() if k in self._input_names}
+            hidden = self.session.run(None, feeds)[0]  # (batch, seq, dim)
+            if self.pooling == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = enc["attention_mask"][..., None].astype("float32")
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            for i, vec in zip(batch_idx, pooled):
+                out[i] = vec
+        matrix = np.vstack(out).astype("float32") if out else np.zeros((0, 0), dtype="float32")
+        return _normalize(matrix) if normalize_embeddings else matrix
+
+
+def export_onnx(model_name: str, model_path: str) -> None:
+    """Export the transformer's last_hidden_state graph to ONNX with dynamic axes."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    dummy = tokenizer(["export"], return_tensors="pt")
+
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            model_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "seq"},
+                "attention_mask": {0: "batch", 1: "seq"},
+                "last_hidden_state": {0: "batch", 1: "seq"},
+            },
+            opset_version=17,
+        )
+
+
+def load_encoder(
+    backend: str = EMBED_BACKEND,
+    model_name: str = EMBED_MODEL_NAME,
+    num_threads: int = EMBED_NUM_THREADS,
+):
+    """Instantiate the configured encoder backend ("torch", "torch-int8" or "onnx")."""
+    if backend == "torch":
+        return SentenceTransformerEncoder(model_name, num_threads=num_threads)
+    if backend == "torch-int8":
+        return QuantizedTorchEncoder(model_name, num_threads=num_threads)
+    if backend == "onnx":
+        return OnnxEncoder(model_name, num_threads=num_threads)
+    raise ValueError(f"Unknown encoder backend: {backend}")
+
+
+_shared_encoder = None
+_shared_encoder_lock = threading.Lock()
+
+
+def get_shared_encoder():
+    """
+    Process-wide encoder used by both ingestion and querying, so a process
+    that does both holds a single copy of the model.
+    """
+    global _shared_encoder
+    with _shared_encoder_lock:
+        if _shared_encoder is None:
+            _shared_encoder = load_encoder(EMBED_BACKEND)
+        return _shared_encoder
+
+
+def encoder_fingerprint(encoder) -> str:
+    """
+    Identity of the embedding space an encoder produces: model, pooling,
+    dimension and normalization. Backends that only change precision or
+    runtime (torch, torch-int8, onnx) share a fingerprint. Pooling is read
+    from the encoder itself, so e.g. an ONNX encoder configured with the
+    wrong EMBED_POOLING does not match a torch-built index.
+    """
+    return f"{encoder.model_name}|pooling={encoder.pooling}|dim={encoder.dimension()}|l2norm"
+
+
+def check_fingerprint(stored: str | None, encoder) -> None:
+    """
+    Raise if the index was built with a different encoder. Indexes built
+    before fingerprints were recorded (stored is None) are accepted.
+    """
+    current = encoder_fingerprint(encoder)
+    if stored is not None and stored != current:
+        raise RuntimeError(
+            f"Vector index was built with encoder '{stored}' but the current "
+            f"encoder is '{current}'. Re-run vector_db_ingest.py --full or "
+            f"switch EMBED_MODEL_NAME back."
+        )
+
+
+VALIDATION_TEXTS = [
+    "اقامہ کی تجدید کا طریقہ کار کیا ہے؟",
+    "What are the services available on Absher?",
+    "اسپانسر شپ (نقل کفالہ) کو آن لائن کیسے منتقل کیا جائے؟",
+    "What are the requirements for premium residency?",
+    "How to determine Iqama expiry?",
+    "exit re-entry visa fee",
+]
+
+
+def validate_encoder(candidate, reference, texts: list[str] = VALIDATION_TEXTS) -> dict:
+    """
+    Cosine agreement between a candidate encoder and the reference on `texts`.
+
+    Returns:
+        dict with "mean_cosine" and "min_cosine" over the texts.
+    """
+    a = candidate.encode(texts, normalize_embeddings=True)
+    b = reference.encode(texts, normalize_embeddings=True)
+    cos = np.sum(_normalize(np.asarray(a)) * _normalize(np.asarray(b)), axis=1)
+    return {"mean_cosine": float(cos.mean()), "min_cosine": float(cos.min())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate an encoder backend against torch.")
+    parser.add_argument("--backend", choices=["torch-int8", "onnx"], required=True)
+    parser.add_argument("--model", default=EMBED_MODEL_NAME, help="Model name or local path")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    reference = load_encoder("torch", args.model)
+    candidate = load_encoder(args.backend, args.model)
+    report = validate_encoder(candidate, reference)
+    print(f"{args.backend}: mean cosine {report['mean_cosine']:.4f}, min {report['min_cosine']:.4f}")
+    if report["min_cosine"] < args.min_cosine:
+        raise SystemExit(f"Cosine agreement below {args.min_cosine}")
+
+
+if __name__ == "__main__":
+    main()
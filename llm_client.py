@@ -1,20 +1,55 @@
 # llm_client.py
+import asyncio
 import os
-from typing import List, Dict
+import random
+import threading
+import time
+import weakref
+from typing import Callable, List, Dict, Iterator
 
+import httpx
 import streamlit as st
-from google import genai
 
 
 DEFAULT_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.5-flash")
 
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
 
-def get_gemini_client():
+# HTTP status codes worth retrying (timeouts, rate limits, server errors)
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+_client = None
+_injected_client = None
+_client_lock = threading.Lock()
+# Async clients hold a connection pool bound to one event loop: one per loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = (
+    weakref.WeakKeyDictionary()
+)
+_concurrency = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+# asyncio semaphores are bound to one event loop, so keep one per loop
+_async_concurrency: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "failures": 0, "retries": 0, "total_latency": 0.0}
+
+
+def _new_gemini_client():
     """
-    Get a configured Gemini client.
+    Create a Gemini client.
     Tries Streamlit secrets first, then environment variable.
     """
-    api_key = st.secrets.get("GOOGLE_API_KEY", None) or os.getenv("GOOGLE_API_KEY")
+    try:
+        api_key = st.secrets.get("GOOGLE_API_KEY", None)
+    except Exception:
+        # No secrets.toml (e.g. running a CLI outside Streamlit)
+        api_key = None
+    api_key = api_key or os.getenv("GOOGLE_API_KEY")
 
     if not api_key:
         st.error(
@@ -25,22 +60,163 @@ def get_gemini_client():
         )
         st.stop()
 
-    return genai.Client(api_key=api_key)
+    # Imported lazily: the SDK is slow to import and only needed here
+    from google import genai
+    from google.genai import types
+
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(
+            timeout=int(LLM_TIMEOUT_SECONDS * 1000),  # milliseconds
+            retry_options=types.HttpRetryOptions(attempts=1),  # we retry ourselves
+        ),
+    )
 
 
-def chat(messages: List[Dict[str, str]], model_name: str = DEFAULT_MODEL_NAME) -> str:
+def get_gemini_client():
+    """Get the process-wide Gemini client (created once, connections reused)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = _new_gemini_client()
+        return _client
+
+
+def get_async_gemini_client():
     """
-    Generic chat wrapper for Gemini.
+    Gemini client for `aio` calls on the running event loop. The SDK's async
+    connection pool is bound to the loop it was first used on, so each loop
+    (e.g. one asyncio.run per batch) gets its own client, dropped with the
+    loop. A client injected with set_gemini_client is used on every loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        if _injected_client is not None:
+            return _injected_client
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = _new_gemini_client()
+        return client
 
-    messages: list of {role: system|user|assistant, content: str}
 
-    We convert them to Gemini roles:
+def set_gemini_client(client) -> None:
+    """
+    Replace the process-wide client, e.g. with a fake exposing
+    `models.generate_content` / `models.generate_content_stream` (and
+    `aio.models.generate_content`) for tests. Pass None to go back to the
+    real client.
+    """
+    global _client, _injected_client
+    with _client_lock:
+        _client = client
+        _injected_client = client
+
+
+def get_llm_stats() -> Dict:
+    """
+    Call, failure and retry counts plus mean request latency of LLM calls in
+    this process (time in the API calls only, excluding queueing and backoff).
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["mean_latency"] = stats["total_latency"] / stats["calls"] if stats["calls"] else 0.0
+    return stats
+
+
+def _record(latency: float, retries: int, failed: bool) -> None:
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["retries"] += retries
+        _stats["total_latency"] += latency
+        if failed:
+            _stats["failures"] += 1
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """Transient network errors and 408/429/5xx API errors are retryable."""
+    if isinstance(exc, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return code in RETRYABLE_STATUS_CODES
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _retry_loop(call: Callable):
+    """
+    Call `call()`, retrying retryable errors with jittered exponential
+    backoff. Returns (result, request time, retries); a final failure is
+    recorded and re-raised. The request time excludes the backoff sleeps.
+    """
+    request_time = 0.0
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:
+            request_time += time.perf_counter() - started
+            if attempt < LLM_MAX_RETRIES and _is_retryable(e):
+                time.sleep(_backoff_delay(attempt))
+                attempt += 1
+                continue
+            _record(request_time, attempt, failed=True)
+            raise
+        return result, request_time + time.perf_counter() - started, attempt
+
+
+def _with_retries(call: Callable):
+    """
+    Run `call()` under the concurrency limit with retries (see _retry_loop).
+    Records retry counts and the latency of the requests themselves (not
+    the wait for a slot or the backoff sleeps).
+    """
+    with _concurrency:
+        result, request_time, retries = _retry_loop(call)
+    _record(request_time, retries, failed=False)
+    return result
+
+
+async def _with_retries_async(call: Callable):
+    """
+    Async counterpart of _with_retries: `call()` returns an awaitable.
+    The concurrency limit applies per event loop.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _async_concurrency.get(loop)
+    if semaphore is None:
+        semaphore = _async_concurrency[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+    request_time = 0.0
+    attempt = 0
+    async with semaphore:
+        while True:
+            started = time.perf_counter()
+            try:
+                result = await call()
+            except Exception as e:
+                request_time += time.perf_counter() - started
+                if attempt < LLM_MAX_RETRIES and _is_retryable(e):
+                    await asyncio.sleep(_backoff_delay(attempt))
+                    attempt += 1
+                    continue
+                _record(request_time, attempt, failed=True)
+                raise
+            request_time += time.perf_counter() - started
+            _record(request_time, attempt, failed=False)
+            return result
+
+
+def _to_gemini_messages(messages: List[Dict[str, str]]) -> List[Dict]:
+    """
+    Convert {role: system|user|assistant, content: str} messages to Gemini roles:
     - system → user  (Gemini has no system role, but we pass instructions as a 'user' turn)
     - user   → user
     - assistant → model
     """
-    client = get_gemini_client()
-
     gemini_messages = []
     for m in messages:
         role = m["role"]
@@ -56,12 +232,109 @@ def chat(messages: List[Dict[str, str]], model_name: str = DEFAULT_MODEL_NAME) -
             raise ValueError(f"Unknown role: {role}")
 
         gemini_messages.append({"role": gemini_role, "parts": [{"text": content}]})
+    return gemini_messages
+
+
+def chat(
+    messages: List[Dict[str, str]],
+    model_name: str = DEFAULT_MODEL_NAME,
+    client=None,
+) -> str:
+    """
+    Generic chat wrapper for Gemini.
+
+    messages: list of {role: system|user|assistant, content: str}
+    client: optional client override (defaults to the shared Gemini client)
+    """
+    client = client or get_gemini_client()
+    gemini_messages = _to_gemini_messages(messages)
+
+    try:
+        response = _with_retries(
+            lambda: client.models.generate_content(
+                model=model_name,
+                contents=gemini_messages,
+            )
+        )
+        return response.text
+    except Exception as e:
+        raise RuntimeError(f"Gemini API request failed: {str(e)}")
+
+
+async def chat_async(
+    messages: List[Dict[str, str]],
+    model_name: str = DEFAULT_MODEL_NAME,
+    client=None,
+) -> str:
+    """
+    Async variant of chat() using the client's `aio` interface, so many
+    questions can await the LLM on one event loop.
+    """
+    client = client or get_async_gemini_client()
+    gemini_messages = _to_gemini_messages(messages)
 
     try:
-        response = client.models.generate_content(
-            model=model_name,
-            contents=gemini_messages,
+        response = await _with_retries_async(
+            lambda: client.aio.models.generate_content(
+                model=model_name,
+                contents=gemini_messages,
+            )
         )
         return response.text
     except Exception as e:
         raise RuntimeError(f"Gemini API request failed: {str(e)}")
+
+
+def chat_stream(
+    messages: List[Dict[str, str]],
+    model_name: str = DEFAULT_MODEL_NAME,
+    client=None,
+) -> Iterator[str]:
+    """
+    Streaming variant of chat(): yields answer text chunks as Gemini emits them.
+
+    client: anything with `models.generate_content_stream(model=..., contents=...)`
+    returning an iterable of objects with a `.text` attribute. Defaults to the
+    real Gemini client; pass a fake one to run without network access.
+    """
+    client = client or get_gemini_client()
+    gemini_messages = _to_gemini_messages(messages)
+
+    def _open_stream():
+        # Retries only cover opening the stream and receiving the first
+        # chunk; once text has been yielded a failure is surfaced as-is.
+        stream = iter(
+            client.models.generate_content_stream(
+                model=model_name,
+                contents=gemini_messages,
+            )
+        )
+        return stream, next(stream, None)
+
+    # The slot is held until the stream is exhausted or closed, so
+    # LLM_MAX_CONCURRENCY bounds streamed answers too
+    with _concurrency:
+        try:
+            (stream, chunk), request_time, retries = _retry_loop(_open_stream)
+        except Exception as e:
+            raise RuntimeError(f"Gemini API request failed: {str(e)}")
+
+        failed = False
+        try:
+            while chunk is not None:
+                if chunk.text:
+                    yield chunk.text
+                # Latency covers the whole stream, but not the caller's time between chunks
+                started = time.perf_counter()
+                try:
+                    chunk = next(stream, None)
+                except Exception as e:
+                    failed = True
+                    raise RuntimeError(f"Gemini API request failed: {str(e)}")
+                finally:
+                    request_time += time.perf_counter() - started
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            _record(request_time, retries, failed)
@@ -1,13 +1,68 @@
+import asyncio
+import json
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import numpy as np
-from typing import List, Dict, Tuple
-from llm_client import chat as llm_chat
+from typing import List, Dict, Iterator, Tuple
+from answer_cache import get_answer_cache
+from config import (
+    MMR_LAMBDA,
+    QUERY_CACHE_SIZE,
+    RETRIEVAL_CANDIDATES,
+    RETRIEVAL_MIN_K,
+    RETRIEVAL_MIN_SIMILARITY,
+    RETRIEVAL_MMR_ENABLED,
+    RETRIEVAL_SCORE_GAP,
+)
+from context_packer import pack_context
+from embedding_cache import QueryEmbeddingLRU, cached_encode, get_embedding_cache
+from llm_client import chat as llm_chat, chat_async as llm_chat_async, chat_stream as llm_chat_stream
 from prompts import (
     BASE_SYSTEM_INSTRUCTION,
     USER_PROMPT_TEMPLATE,
     LANG_RULE_EN,
     LANG_RULE_URDU,
 )
+from utils import read_index_version
+from vector_backends import VectorBackend
+
+# Process-wide query embedding cache (shared by all Streamlit sessions)
+_query_cache = QueryEmbeddingLRU(QUERY_CACHE_SIZE)
+
+
+def query_cache_stats() -> Dict:
+    """Hit/miss counters of the in-process query embedding cache."""
+    return _query_cache.stats()
+
+
+def embed_queries(queries: List[str], embed_model) -> np.ndarray:
+    """
+    Embed queries as an (n, dim) float32 array. The in-process LRU is
+    consulted first, then the persistent embedding cache; remaining misses
+    go through the model in a single batched encode call.
+    """
+    vectors = [_query_cache.get(q) for q in queries]
+    miss_idx = [i for i, vec in enumerate(vectors) if vec is None]
+    if miss_idx:
+        miss_queries = [queries[i] for i in miss_idx]
+        fresh = cached_encode(
+            miss_queries,
+            lambda texts: embed_model.encode(texts, normalize_embeddings=True),
+            get_embedding_cache(embed_model),
+        )  # float32, as Chroma expects
+        for i, q, vec in zip(miss_idx, miss_queries, fresh):
+            vec = vec.reshape(1, -1)
+            _query_cache.put(q, vec)
+            vectors[i] = vec
+    return np.vstack(vectors)
+
+
+def embed_query(query: str, embed_model) -> np.ndarray:
+    """
+    Embed a single query as a (1, dim) float32 array (see embed_queries).
+    """
+    return embed_queries([query], embed_model)
 
 
 def is_urdu_text(text: str) -> bool:
@@ -30,6 +85,133 @@ def strip_markdown_for_preview(text: str) -> str:
     text = " ".join(text.split())
     return text
 
+def adaptive_cutoff(
+    similarities: np.ndarray,
+    min_similarity: float = RETRIEVAL_MIN_SIMILARITY,
+    max_gap: float = RETRIEVAL_SCORE_GAP,
+    min_k: int = RETRIEVAL_MIN_K,
+) -> int:
+    """
+    How many of the best-first `similarities` to keep: stop at the first
+    one below `min_similarity` or right before the first drop larger than
+    `max_gap` between neighbours, but keep at least `min_k`.
+    """
+    sims = np.asarray(similarities, dtype="float32")
+    n = int(np.count_nonzero(sims >= min_similarity))
+    gaps = np.flatnonzero(sims[:-1] - sims[1:] > max_gap)
+    if len(gaps):
+        n = min(n, int(gaps[0]) + 1)
+    return max(n, min(min_k, len(sims)))
+
+
+def mmr_select(
+    query_similarities: np.ndarray,
+    doc_embeddings: np.ndarray,
+    k: int,
+    lambda_mult: float = MMR_LAMBDA,
+) -> List[int]:
+    """
+    Maximal Marginal Relevance: greedily pick up to k candidates maximizing
+    lambda * sim(query, d) - (1 - lambda) * max sim(d, already picked).
+    Returns candidate indices in pick order.
+    """
+    rel = np.asarray(query_similarities, dtype="float32")
+    n = len(rel)
+    if n == 0 or k <= 0:
+        return []
+    emb = np.asarray(doc_embeddings, dtype="float32")
+    emb = emb / np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+    pairwise = emb @ emb.T
+
+    first = int(np.argmax(rel))
+    selected = [first]
+    available = np.ones(n, dtype=bool)
+    available[first] = False
+    redundancy = pairwise[:, first].copy()
+    while len(selected) < min(k, n):
+        scores = lambda_mult * rel - (1.0 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        j = int(np.argmax(scores))
+        selected.append(j)
+        available[j] = False
+        np.maximum(redundancy, pairwise[:, j], out=redundancy)
+    return selected
+
+
+_warned_inexact_scores = False
+
+
+def _select_results(
+    results: Dict,
+    i: int,
+    k: int,
+    q_emb: np.ndarray,
+    exact_scores: bool = True,
+) -> List[Dict]:
+    """
+    Pick the i-th query's hits from an over-fetched result: adaptive cutoff
+    on similarity, then MMR over the survivors.
+
+    Similarities are recomputed as cosine against the returned embeddings
+    when there are any, so the thresholds mean the same on every backend.
+    Without embeddings, backend scores are used if they are exact cosine;
+    otherwise (PCA / int8 NumPy index without rescoring) the cutoff is
+    skipped and the plain top-k is returned.
+    """
+    global _warned_inexact_scores
+
+    candidates = _format_results(results, i)
+    if not candidates:
+        return []
+    embeddings = results.get("embeddings")
+    embeddings = embeddings[i] if embeddings is not None and len(embeddings) > i else None
+    if embeddings is not None:
+        embeddings = np.asarray(embeddings, dtype="float32")
+        embeddings = embeddings / np.clip(
+            np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None
+        )
+        sims = embeddings @ np.asarray(q_emb, dtype="float32").reshape(-1)
+        # Candidates stay best first in the exact order
+        order = np.argsort(-sims, kind="stable")
+        candidates = [candidates[j] for j in order]
+        sims, embeddings = sims[order], embeddings[order]
+        for candidate, sim in zip(candidates, sims):
+            candidate["score"] = float(1.0 - sim)
+    elif exact_scores:
+        # Backends report cosine distance; candidates are best first
+        sims = 1.0 - np.array([c["score"] for c in candidates], dtype="float32")
+    else:
+        if not _warned_inexact_scores:
+            print(
+                "Adaptive retrieval cutoff disabled: the vector backend's scores are not "
+                "cosine similarities (re-export the NumPy index with --rescore)."
+            )
+            _warned_inexact_scores = True
+        return candidates[:k]
+
+    n = adaptive_cutoff(sims)
+    if embeddings is None or n <= 1:
+        return candidates[:min(n, k)]
+    picked = mmr_select(sims[:n], embeddings[:n], k)
+    return [candidates[j] for j in picked]
+
+
+def _query_collection(collection, q_embs, k: int) -> Dict:
+    if not RETRIEVAL_MMR_ENABLED:
+        return collection.query(query_embeddings=q_embs, n_results=k)
+    n_results = k * max(1, RETRIEVAL_CANDIDATES)
+    if isinstance(collection, VectorBackend):
+        return collection.query(
+            query_embeddings=q_embs, n_results=n_results, include_embeddings=True
+        )
+    # A plain Chroma collection
+    return collection.query(
+        query_embeddings=q_embs,
+        n_results=n_results,
+        include=["documents", "metadatas", "distances", "embeddings"],
+    )
+
+
 def retrieve(
     query: str,
     embed_model,
@@ -37,24 +219,59 @@ def retrieve(
     k: int = 5,
 ) -> List[Dict]:
     """
-    Retrieve top-k chunks from Chroma for a given query.
+    Retrieve up to k chunks for a given query.
+
+    With RETRIEVAL_MMR_ENABLED, k * RETRIEVAL_CANDIDATES candidates are
+    fetched with their embeddings, weak ones are cut off (see
+    adaptive_cutoff) and up to k diverse chunks are picked by MMR, so the
+    number of chunks varies per question. Otherwise the plain top-k.
     """
-    # 1) Embed query using the same model as ingestion (BGE-M3)
-    q_emb = embed_model.encode([query], normalize_embeddings=True)
-    q_emb = np.array(q_emb, dtype="float32")  # Chroma expects float32
+    # 1) Embed query using the same model as ingestion (BGE-M3),
+    #    skipping the forward pass if this text was embedded before
+    q_emb = embed_query(query, embed_model)
 
-    # 2) Query Chroma using query_embeddings (NOT query_texts, because we pre-embedded docs)
-    results = collection.query(
-        query_embeddings=q_emb,
-        n_results=k,
-    )
+    # 2) Query the backend using query_embeddings (NOT query_texts, because we pre-embedded docs)
+    results = _query_collection(collection, q_emb, k)
+
+    if not RETRIEVAL_MMR_ENABLED:
+        return _format_results(results, 0)
+    return _select_results(results, 0, k, q_emb[0], getattr(collection, "exact_scores", True))
 
-    docs = results.get("documents", [[]])[0]    # list[str]
-    metas = results.get("metadatas", [[]])[0]   # list[dict]
-    dists = results.get("distances", [[]])[0]   # list[float] (similarity metric)
+
+def retrieve_many(
+    queries: List[str],
+    embed_model,
+    collection,
+    k: int = 5,
+) -> List[List[Dict]]:
+    """
+    Retrieve chunks for many queries with one batched encode and a single
+    multi-embedding query (same selection as retrieve). Output order
+    follows `queries`.
+    """
+    if not queries:
+        return []
+    q_embs = embed_queries(queries, embed_model)
+    results = _query_collection(collection, q_embs, k)
+    if not RETRIEVAL_MMR_ENABLED:
+        return [_format_results(results, i) for i in range(len(queries))]
+    exact_scores = getattr(collection, "exact_scores", True)
+    return [
+        _select_results(results, i, k, q_embs[i], exact_scores) for i in range(len(queries))
+    ]
+
+
+def _format_results(results: Dict, i: int) -> List[Dict]:
+    """
+    Turn the i-th query's hits from a Chroma query result into retrieval dicts.
+    """
+    ids = results.get("ids", [[]])[i]            # list[str]
+    docs = results.get("documents", [[]])[i]    # list[str]
+    metas = results.get("metadatas", [[]])[i]   # list[dict]
+    dists = results.get("distances", [[]])[i]   # list[float] (similarity metric)
 
     retrieved = []
-    for doc, meta, dist in zip(docs, metas, dists):
+    for chunk_id, doc, meta, dist in zip(ids, docs, metas, dists):
 
         # Build a clean preview only (do not modify the stored content)
         clean = strip_markdown_for_preview(doc)
@@ -64,6 +281,7 @@ def retrieve(
         
         retrieved.append(
             {
+                "chunk_id": chunk_id,
                 "content": doc,
                 "title": meta.get("title", ""),
                 "source_url": meta.get("source_url"),
@@ -71,6 +289,8 @@ def retrieve(
                 "scraped_at": meta.get("scraped_at"),
                 "score": float(dist),
                 "text_preview": preview,
+                # Articles whose near-duplicate chunks were collapsed into this one
+                "sources": json.loads(meta["sources"]) if meta.get("sources") else [],
             }
         )
     return retrieved
@@ -94,33 +314,50 @@ def build_context_for_prompt(
     return "\n\n".join(blocks)
 
 
-def answer_question(
+def _prepare_answer(
     query: str,
     embed_model,
     collection,
-    chat_history: List[Dict] | None = None,
     k: int = 5,
-) -> Tuple[str, List[Dict]]:
+    retrieved: List[Dict] | None = None,
+) -> Dict:
     """
-    End-to-end RAG answer: retrieve from Chroma and call the LLM.
+    Everything before the LLM call: retrieval, answer-cache lookup and
+    prompt construction. Shared by the blocking and streaming paths.
+    Pass `retrieved` to skip retrieval (batch mode retrieves up front).
+
+    Returns a dict with keys: retrieved, messages, cached_reply,
+    cache_key (the arguments for AnswerCache.store, or None) and
+    context_stats (pack_context's token report, None on a cache hit).
     """
     # 1) Retrieve relevant chunks
-    retrieved = retrieve(query, embed_model, collection, k=k)
+    if retrieved is None:
+        retrieved = retrieve(query, embed_model, collection, k=k)
 
-    # 2) Build context text from retrieved chunks
-    context_parts = []
-    for item in retrieved:
-        title = item.get("title") or "Source"
-        source_url = item.get("source_url")
-        header = f"### {title}"
-        if source_url:
-            header += f" ({source_url})"
-        context_parts.append(f"{header}\n\n{item['content']}")
+    # 1b) Semantic answer cache: same language + index version + chunks,
+    #     near-identical question embedding -> reuse the previous answer
+    answer_cache = get_answer_cache()
+    language = "ur" if is_urdu_text(query) else "en"
+    chunk_ids = [item["chunk_id"] for item in retrieved]
+    cache_key = None
+    if answer_cache is not None:
+        q_emb = embed_query(query, embed_model)  # in-process LRU hit
+        cache_key = (query, q_emb, language, read_index_version(), chunk_ids)
+        cached_reply = answer_cache.lookup(*cache_key[1:])
+        if cached_reply is not None:
+            return {
+                "retrieved": retrieved,
+                "messages": None,
+                "cached_reply": cached_reply,
+                "cache_key": None,
+                "context_stats": None,
+            }
 
-    context_text = "\n\n---\n\n".join(context_parts) if context_parts else "No relevant context retrieved."
+    # 2) Build context text: merge chunks per article, drop repeats, fit the budget
+    context_text, context_report = pack_context(retrieved)
 
     # 3) Language rule: detect Urdu vs English
-    lang_rule = LANG_RULE_URDU if is_urdu_text(query) else LANG_RULE_EN
+    lang_rule = LANG_RULE_URDU if language == "ur" else LANG_RULE_EN
 
     system_msg = {
         "role": "system",
@@ -140,10 +377,158 @@ def answer_question(
     }
     messages.append(user_message)
 
+    return {
+        "retrieved": retrieved,
+        "messages": messages,
+        "cached_reply": None,
+        "cache_key": cache_key,
+        "context_stats": context_report,
+    }
+
+
+def _store_answer(cache_key, reply: str) -> None:
+    answer_cache = get_answer_cache()
+    if answer_cache is not None and cache_key is not None and reply:
+        query, q_emb, language, index_version, chunk_ids = cache_key
+        answer_cache.store(query, q_emb, language, index_version, chunk_ids, reply)
+
+
+def answer_question(
+    query: str,
+    embed_model,
+    collection,
+    chat_history: List[Dict] | None = None,
+    k: int = 5,
+) -> Tuple[str, List[Dict]]:
+    """
+    End-to-end RAG answer: retrieve from Chroma and call the LLM.
+    """
+    prepared = _prepare_answer(query, embed_model, collection, k=k)
+    if prepared["cached_reply"] is not None:
+        return prepared["cached_reply"], prepared["retrieved"]
+
     # 4) Call LLM with error handling
     try:
-        reply = llm_chat(messages)
+        reply = llm_chat(prepared["messages"])
+    except Exception as e:
+        raise RuntimeError(f"LLM API call failed: {str(e)}")
+
+    _store_answer(prepared["cache_key"], reply)
+    return reply, prepared["retrieved"]
+
+
+def answer_questions(
+    queries: List[str],
+    embed_model,
+    collection,
+    k: int = 5,
+    max_concurrency: int = 8,
+    output_path: str | None = None,
+) -> List[Dict]:
+    """
+    Answer many questions at once: one batched encode, one multi-embedding
+    Chroma query, then LLM calls fanned out over `max_concurrency` threads.
+
+    A failing question does not abort the batch; its record carries an
+    "error" instead of an "answer". If `output_path` is given, records are
+    also written there as JSONL (in input order).
+
+    Returns:
+        list of {"query", "answer", "sources", "context_stats", "error"}
+        dicts in input order.
+    """
+    all_retrieved = retrieve_many(queries, embed_model, collection, k=k)
+
+    def _answer_one(query: str, retrieved: List[Dict]) -> Dict:
+        record = {
+            "query": query, "answer": None, "sources": retrieved,
+            "context_stats": None, "error": None,
+        }
+        try:
+            prepared = _prepare_answer(
+                query, embed_model, collection, k=k, retrieved=retrieved
+            )
+            reply = prepared["cached_reply"]
+            record["context_stats"] = prepared["context_stats"]
+            if reply is None:
+                reply = llm_chat(prepared["messages"])
+                _store_answer(prepared["cache_key"], reply)
+            record["answer"] = reply
+        except Exception as e:
+            record["error"] = str(e)
+        return record
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        records = list(pool.map(_answer_one, queries, all_retrieved))
+
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    return records
+
+
+async def answer_question_async(
+    query: str,
+    embed_model,
+    collection,
+    chat_history: List[Dict] | None = None,
+    k: int = 5,
+    llm_client=None,
+) -> Tuple[str, List[Dict]]:
+    """
+    Asyncio-native RAG answer. Encoding, Chroma queries and the answer cache
+    run in the loop's default executor; the LLM call is awaited, so many
+    questions can be in flight on one event loop without a thread each.
+
+    answer_question() is the synchronous equivalent.
+    """
+    loop = asyncio.get_running_loop()
+    prepared = await loop.run_in_executor(
+        None, partial(_prepare_answer, query, embed_model, collection, k=k)
+    )
+    if prepared["cached_reply"] is not None:
+        return prepared["cached_reply"], prepared["retrieved"]
+
+    try:
+        reply = await llm_chat_async(prepared["messages"], client=llm_client)
     except Exception as e:
         raise RuntimeError(f"LLM API call failed: {str(e)}")
 
-    return reply, retrieved
+    await loop.run_in_executor(None, _store_answer, prepared["cache_key"], reply)
+    return reply, prepared["retrieved"]
+
+
+def answer_question_stream(
+    query: str,
+    embed_model,
+    collection,
+    chat_history: List[Dict] | None = None,
+    k: int = 5,
+    llm_client=None,
+) -> Tuple[Iterator[str], List[Dict]]:
+    """
+    Streaming RAG answer. Retrieval runs eagerly so the sources can be shown
+    right away; the returned iterator yields answer text chunks as the LLM
+    produces them.
+
+    llm_client: optional client passed through to llm_client.chat_stream
+    (e.g. a local fake that emits chunks).
+    """
+    prepared = _prepare_answer(query, embed_model, collection, k=k)
+
+    def _chunks() -> Iterator[str]:
+        if prepared["cached_reply"] is not None:
+            yield prepared["cached_reply"]
+            return
+
+        parts: List[str] = []
+        # llm_client already raises a descriptive RuntimeError; pass it on as is
+        for piece in llm_chat_stream(prepared["messages"], client=llm_client):
+            parts.append(piece)
+            yield piece
+
+        _store_answer(prepared["cache_key"], "".join(parts))
+
+    return _chunks(), prepared["retrieved"]
@@ -1,20 +1,31 @@
 import sys
+import argparse
 import asyncio
 import re
 import hashlib
+import time
 from pathlib import Path
-from datetime import datetime, timezone
-from typing import Optional, List, Dict
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Optional, List, Dict, Tuple
 
+import httpx
+import yaml
 from playwright.async_api import async_playwright
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 from markdownify import markdownify as md  # pip install markdownify
 
 
 LIST_LINK_SELECTOR = ".td-module-title a"
 CONTENT_SELECTOR = "div.td-post-content"
 TITLE_SELECTOR = "h1.td-post-title, h1.entry-title"
+# Listing controls that load more articles with JavaScript (infinite scroll)
+LOAD_MORE_SELECTOR = ".td-load-more-wrap, .td_ajax_load_more, .load-more"
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/131.0 Safari/537.36"
+)
 
 
 def slugify_filename(text: str, max_len: int = 80) -> str:
@@ -24,8 +35,10 @@ def slugify_filename(text: str, max_len: int = 80) -> str:
     return (text[:max_len] or "article")
 
 
-def build_full_article_markdown(title: str, url: str, body_md: str) -> str:
-    scraped_at = datetime.now(timezone.utc).isoformat()
+def build_full_article_markdown(
+    title: str, url: str, body_md: str, scraped_at: Optional[str] = None
+) -> str:
+    scraped_at = scraped_at or datetime.now(timezone.utc).isoformat()
     safe_title = (title or "Untitled").replace('"', '\\"')
 
     return "\n".join([
@@ -44,14 +57,119 @@ def build_full_article_markdown(title: str, url: str, body_md: str) -> str:
     ])
 
 
-async def scrape_article_as_markdown(page, url: str) -> Optional[Dict]:
+def _read_frontmatter(md_file: Path) -> Dict:
+    text = md_file.read_text(encoding="utf-8")
+    if not text.startswith("---"):
+        return {}
+    parts = text.split("---", 2)
+    if len(parts) < 3:
+        return {}
+    try:
+        return yaml.safe_load(parts[1]) or {}
+    except yaml.YAMLError:
+        return {}
+
+
+def build_url_index(out_dir: str) -> Dict[str, Dict]:
+    """
+    Map source_url -> {"path", "scraped_at"} for the markdown files already
+    in `out_dir`, read from their frontmatter.
+    """
+    index: Dict[str, Dict] = {}
+    for md_file in Path(out_dir).glob("*.md"):
+        fm = _read_frontmatter(md_file)
+        url = fm.get("source_url")
+        if not url:
+            continue
+        scraped_at = fm.get("scraped_at")
+        try:
+            scraped_at = datetime.fromisoformat(str(scraped_at)) if scraped_at else None
+        except ValueError:
+            scraped_at = None
+        index[url] = {"path": md_file, "scraped_at": scraped_at}
+    return index
+
+
+def is_fresh(entry: Optional[Dict], refresh_after: Optional[timedelta]) -> bool:
+    """True if a known article does not need re-scraping yet."""
+    if entry is None:
+        return False
+    if refresh_after is None:
+        return True
+    scraped_at = entry["scraped_at"]
+    return scraped_at is not None and datetime.now(timezone.utc) - scraped_at < refresh_after
+
+
+def touch_scraped_at(md_file: Path) -> None:
+    """Bump the frontmatter scraped_at of an article confirmed unchanged."""
+    text = md_file.read_text(encoding="utf-8")
+    scraped_at = datetime.now(timezone.utc).isoformat()
+    text = re.sub(r'^scraped_at: ".*"$', f'scraped_at: "{scraped_at}"', text, count=1, flags=re.M)
+    md_file.write_text(text, encoding="utf-8")
+
+
+async def is_unchanged_since(page, url: str, since: Optional[datetime]) -> bool:
+    """
+    Conditional GET (If-Modified-Since) through the page's request context;
+    True only on a 304. Servers that ignore the header return 200 and the
+    article is re-scraped.
+    """
+    if since is None:
+        return False
+    response = await page.request.get(
+        url,
+        headers={"If-Modified-Since": format_datetime(since.astimezone(timezone.utc), usegmt=True)},
+        max_redirects=0,
+    )
+    return response.status == 304
+
+
+class HostRateLimiter:
+    """
+    Per-host politeness: at most `rate_per_sec` navigations per host,
+    shared by every page in the pool.
+    """
+
+    def __init__(self, rate_per_sec: float = 2.0):
+        self.min_interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url: str) -> None:
+        if not self.min_interval:
+            return
+        host = urlparse(url).netloc
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def scrape_article_as_markdown(
+    page,
+    url: str,
+    rate_limiter: Optional[HostRateLimiter] = None,
+) -> Optional[Dict]:
     print(f"📝 Scraping article: {url}")
+    if rate_limiter:
+        await rate_limiter.wait(url)
     await page.goto(url, wait_until="networkidle", timeout=30000)
-    soup = BeautifulSoup(await page.content(), "html.parser")
+
+    result = parse_article_html(await page.content(), url)
+    if result is None:
+        print(f"⚠️ Skipping {url} — content div not found.")
+    return result
+
+
+def parse_article_html(html: str, url: str) -> Optional[Dict]:
+    """Extract title and markdown body from article HTML; None if CONTENT_SELECTOR is missing."""
+    soup = BeautifulSoup(html, "html.parser")
 
     content_div = soup.select_one(CONTENT_SELECTOR)
     if not content_div:
-        print(f"⚠️ Skipping {url} — content div not found.")
         return None
 
     title_el = soup.select_one(TITLE_SELECTOR)
@@ -74,93 +192,508 @@ async def scrape_article_as_markdown(page, url: str) -> Optional[Dict]:
     }
 
 
-async def collect_article_links_from_page(page, url: str, seen_links: set) -> List[str]:
+async def collect_article_links_from_page(
+    page,
+    url: str,
+    seen_links: set,
+    rate_limiter: Optional[HostRateLimiter] = None,
+) -> List[str]:
     print(f"\n📄 Fetching list page: {url}")
+    if rate_limiter:
+        await rate_limiter.wait(url)
     await page.goto(url, wait_until="networkidle", timeout=30000)
 
     for _ in range(6):
         await page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
         await page.wait_for_timeout(1000)
 
-    soup = BeautifulSoup(await page.content(), "html.parser")
+    new_links = _register_new_links(extract_article_links(await page.content(), url), seen_links)
+    print(f"🔗 Found {len(new_links)} new article links on this page.")
+    return new_links
 
-    new_links = []
+
+def extract_article_links(html: str, url: str) -> List[str]:
+    """Absolute article URLs matched by LIST_LINK_SELECTOR, in page order."""
+    soup = BeautifulSoup(html, "html.parser")
+    links = []
     for a in soup.select(LIST_LINK_SELECTOR):
         href = a.get("href")
-        if not href:
-            continue
-        full = urljoin(url, href)
+        if href:
+            links.append(urljoin(url, href))
+    return links
+
+
+def has_load_more(html: str) -> bool:
+    """True if the listing loads further articles client-side (see LOAD_MORE_SELECTOR)."""
+    return BeautifulSoup(html, "html.parser").select_one(LOAD_MORE_SELECTOR) is not None
+
+
+def _register_new_links(links: List[str], seen_links: set) -> List[str]:
+    new_links = []
+    for full in links:
         if full not in seen_links:
             seen_links.add(full)
             new_links.append(full)
+    return new_links
 
+
+# ---------- browserless fast path ----------
+
+def make_http_client(concurrency: int) -> httpx.AsyncClient:
+    """Pooled async HTTP client; at most `concurrency` connections open at once."""
+    return httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT},
+        follow_redirects=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    )
+
+
+async def fetch_html(
+    client: httpx.AsyncClient,
+    url: str,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    if_modified_since: Optional[datetime] = None,
+) -> Tuple[int, str]:
+    """GET `url` without a browser; returns (status, text). 304 has empty text."""
+    headers = {}
+    if if_modified_since is not None:
+        headers["If-Modified-Since"] = format_datetime(
+            if_modified_since.astimezone(timezone.utc), usegmt=True
+        )
+    if rate_limiter:
+        await rate_limiter.wait(url)
+    response = await client.get(url, headers=headers)
+    return response.status_code, response.text if response.status_code == 200 else ""
+
+
+class LazyBrowser:
+    """Chromium started on the first new_page(), so crawls served over HTTP never launch it."""
+
+    def __init__(self):
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._lock = asyncio.Lock()
+
+    async def new_page(self):
+        async with self._lock:
+            if self._context is None:
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(
+                    headless=True, args=["--no-sandbox"]
+                )
+                self._context = await self._browser.new_context()
+        return await self._context.new_page()
+
+    async def close(self) -> None:
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+
+def list_page_url(base_url: str, page_number: int) -> str:
+    if page_number == 1:
+        return base_url
+    base = base_url if base_url.endswith("/") else base_url + "/"
+    return urljoin(base, f"page/{page_number}/")
+
+
+def save_article_markdown(
+    result: Dict, out_path: Path, scraped_at: Optional[str] = None
+) -> Tuple[Path, str]:
+    """Write a scraped article as `{slug}-{md5(url)[:8]}.md`; returns (path, markdown)."""
+    article_url = result["url"]
+    slug = slugify_filename(result["title"])
+    url_hash = hashlib.md5(article_url.encode("utf-8")).hexdigest()[:8]
+    md_file = out_path / f"{slug}-{url_hash}.md"
+
+    full_md = build_full_article_markdown(
+        result["title"], article_url, result["body_md"], scraped_at
+    )
+
+    # Write UTF-8 text file :contentReference[oaicite:6]{index=6}
+    md_file.write_text(full_md, encoding="utf-8")
+    return md_file, full_md
+
+
+async def _collect_links_http(
+    client: httpx.AsyncClient,
+    url: str,
+    seen_links: set,
+    rate_limiter: HostRateLimiter,
+) -> Optional[List[str]]:
+    """
+    Listing links over plain HTTP. A 404 past the last page means the end
+    of the listing ([]); None means the page needs the browser: no links
+    in the raw HTML, or a "load more" / infinite-scroll control that only
+    the browser's scrolling triggers.
+    """
+    print(f"\n📄 Fetching list page (http): {url}")
+    try:
+        status, html = await fetch_html(client, url, rate_limiter)
+    except httpx.HTTPError as e:
+        print(f"⚠️ HTTP fetch failed for {url} ({e}); falling back to the browser.")
+        return None
+    if status == 404:
+        return []
+    links = extract_article_links(html, url) if status == 200 else []
+    if not links:
+        return None
+    if has_load_more(html):
+        print(f"ℹ️ {url} loads more articles on scroll; using the browser.")
+        return None
+    new_links = _register_new_links(links, seen_links)
     print(f"🔗 Found {len(new_links)} new article links on this page.")
     return new_links
 
 
-async def scrape_all_pages_to_markdown(base_url: str, out_dir: str = "data", max_pages: Optional[int] = None):
+async def _discover_listing_pages(
+    browser: LazyBrowser,
+    client: Optional[httpx.AsyncClient],
+    base_url: str,
+    max_pages: Optional[int],
+    article_queue: asyncio.Queue,
+    n_workers: int,
+    rate_limiter: HostRateLimiter,
+    stats: Dict[str, int],
+    url_index: Optional[Dict[str, Dict]] = None,
+    refresh_after: Optional[timedelta] = None,
+) -> None:
+    """
+    Producer: walk listing pages and feed new article URLs to the workers.
+
+    With a `url_index` (incremental crawl), articles already on disk and
+    still fresh are skipped, and pagination stops after the first listing
+    page whose links are all known.
+    """
     seen_links: set = set()
+    page = None
     page_number = 1
-
-    out_path = Path(out_dir)
-    out_path.mkdir(parents=True, exist_ok=True)  # create output folder :contentReference[oaicite:5]{index=5}
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True, args=["--no-sandbox"])
-        page = await browser.new_page()
-
-        while True:
-            if max_pages is not None and page_number > max_pages:
-                break
-
-            if page_number == 1:
-                list_url = base_url
-            else:
-                base = base_url if base_url.endswith("/") else base_url + "/"
-                list_url = urljoin(base, f"page/{page_number}/")
-
+    try:
+        while max_pages is None or page_number <= max_pages:
+            list_url = list_page_url(base_url, page_number)
             try:
-                page_links = await collect_article_links_from_page(page, list_url, seen_links)
+                page_links = None
+                if client is not None:
+                    page_links = await _collect_links_http(
+                        client, list_url, seen_links, rate_limiter
+                    )
+                if page_links is None:
+                    page = page or await browser.new_page()
+                    page_links = await collect_article_links_from_page(
+                        page, list_url, seen_links, rate_limiter
+                    )
+                    stats["list_pages_browser"] += 1
+                else:
+                    stats["list_pages_http"] += 1
             except Exception as e:
                 print(f"❌ Error loading {list_url}: {e}")
+                stats["list_page_failures"] += 1
                 break
 
+            stats["list_pages"] += 1
             if not page_links:
                 print("ℹ️ No new links on this page; assuming end of listing.")
                 break
 
             for article_url in page_links:
+                if url_index is not None and is_fresh(url_index.get(article_url), refresh_after):
+                    stats["articles_up_to_date"] += 1
+                    continue
+                # Bounded queue: blocks (backpressure) while workers catch up
+                await article_queue.put(article_url)
+
+            if url_index is not None and all(u in url_index for u in page_links):
+                print("ℹ️ Every link on this page is already on disk; stopping pagination.")
+                break
+
+            page_number += 1
+    finally:
+        for _ in range(n_workers):
+            await article_queue.put(None)
+
+
+async def _article_worker(
+    browser: LazyBrowser,
+    client: Optional[httpx.AsyncClient],
+    article_queue: asyncio.Queue,
+    out_path: Path,
+    rate_limiter: HostRateLimiter,
+    stats: Dict[str, int],
+    url_index: Optional[Dict[str, Dict]] = None,
+    ingest_queue: Optional[asyncio.Queue] = None,
+) -> None:
+    """
+    Consumer: scrape and save articles until the producer's sentinel arrives.
+
+    With an HTTP `client`, each article is fetched without a browser first;
+    the browser page (opened on first need) is used only when the content
+    div is missing or empty in the raw HTML. Saved articles are also put on
+    `ingest_queue`, if given, for the streaming indexer.
+    """
+    page = None
+    while True:
+        article_url = await article_queue.get()
+        if article_url is None:
+            if page is not None:
+                await page.close()
+            return
+        known = url_index.get(article_url) if url_index is not None else None
+        try:
+            result = None
+            if client is not None:
+                print(f"📝 Fetching article (http): {article_url}")
                 try:
-                    result = await scrape_article_as_markdown(page, article_url)
-                    if not result:
+                    status, html = await fetch_html(
+                        client, article_url, rate_limiter, known["scraped_at"] if known else None
+                    )
+                except httpx.HTTPError as e:
+                    print(f"⚠️ HTTP fetch failed for {article_url} ({e}); falling back to the browser.")
+                    status, html = None, ""
+                if status == 304:
+                    touch_scraped_at(known["path"])
+                    stats["articles_not_modified"] += 1
+                    print(f"♻️ Not modified: {article_url}")
+                    continue
+                if status in (404, 410):
+                    raise RuntimeError(f"HTTP {status}")
+                if status == 200:
+                    result = parse_article_html(html, article_url)
+                    if result and not result["body_md"]:
+                        result = None  # content rendered client-side
+                if result:
+                    stats["articles_http"] += 1
+
+            if result is None:
+                page = page or await browser.new_page()
+                if known is not None and client is None:
+                    await rate_limiter.wait(article_url)
+                    if await is_unchanged_since(page, article_url, known["scraped_at"]):
+                        touch_scraped_at(known["path"])
+                        stats["articles_not_modified"] += 1
+                        print(f"♻️ Not modified: {article_url}")
                         continue
 
-                    title = result["title"]
-                    body_md = result["body_md"]
-
-                    slug = slugify_filename(title)
-                    url_hash = hashlib.md5(article_url.encode("utf-8")).hexdigest()[:8]
-                    md_file = out_path / f"{slug}-{url_hash}.md"
-
-                    full_md = build_full_article_markdown(title, article_url, body_md)
-
-                    # Write UTF-8 text file :contentReference[oaicite:6]{index=6}
-                    md_file.write_text(full_md, encoding="utf-8")
-                    print(f"✅ Saved: {md_file}")
+                result = await scrape_article_as_markdown(page, article_url, rate_limiter)
+                if not result:
+                    stats["articles_skipped"] += 1
+                    continue
+                stats["articles_browser"] += 1
+
+            scraped_at = datetime.now(timezone.utc).isoformat()
+            md_file, full_md = save_article_markdown(result, out_path, scraped_at)
+            if known is not None and known["path"] != md_file:
+                # Title (and so the slug) changed; drop the stale copy
+                known["path"].unlink(missing_ok=True)
+            stats["articles_saved"] += 1
+            print(f"✅ Saved: {md_file}")
+
+            if ingest_queue is not None:
+                # Same fields utils._load_publication_file would read back from md_file.
+                # Blocks while the indexer is behind (backpressure on the crawl).
+                await ingest_queue.put({
+                    "title": result["title"] or "Untitled",
+                    "source_url": article_url,
+                    "scraped_at": scraped_at,
+                    "path": str(md_file),
+                    "body": full_md.split("---", 2)[2],
+                    "queued_at": time.perf_counter(),
+                })
+
+        except Exception as e:
+            stats["article_failures"] += 1
+            print(f"❌ Error scraping {article_url}: {e}")
+
+
+async def scrape_all_pages_to_markdown(
+    base_url: str,
+    out_dir: str = "data",
+    max_pages: Optional[int] = None,
+    concurrency: int = 4,
+    rate_per_sec: float = 2.0,
+    incremental: bool = False,
+    refresh_after_days: Optional[float] = None,
+    fetch_mode: str = "http",
+    ingest_queue: Optional[asyncio.Queue] = None,
+) -> Dict[str, int]:
+    """
+    Crawl a category listing and save every article as markdown.
+
+    Listing pages are walked by one producer while `concurrency` workers
+    extract articles from a bounded asyncio queue, so discovery and
+    extraction overlap. Navigations to each host are limited to
+    `rate_per_sec`.
+
+    With fetch_mode="http" (default) pages are fetched by a pooled HTTP
+    client and parsed directly; Chromium is only launched for pages whose
+    content is missing from the raw HTML and for listings that load more
+    articles on scroll. fetch_mode="browser" renders every page with
+    Playwright.
+
+    If `ingest_queue` is given, every saved article is also put on it (see
+    scrape_and_index).
+
+    With `incremental=True`, articles already in `out_dir` are skipped
+    unless their scraped_at is older than `refresh_after_days` (None: never
+    refresh). Stale articles are revalidated with a conditional request
+    before being re-scraped, and pagination stops at the first listing
+    page made only of known articles.
+
+    Returns:
+        counts: list_pages (list_pages_http / list_pages_browser),
+        list_page_failures, articles_saved (articles_http /
+        articles_browser), articles_skipped (no content div),
+        articles_up_to_date, articles_not_modified and article_failures.
+    """
+    if fetch_mode not in ("http", "browser"):
+        raise ValueError(f"Unknown fetch_mode: {fetch_mode}")
 
-                except Exception as e:
-                    print(f"❌ Error scraping {article_url}: {e}")
-
-            page_number += 1
+    out_path = Path(out_dir)
+    out_path.mkdir(parents=True, exist_ok=True)  # create output folder :contentReference[oaicite:5]{index=5}
 
+    url_index = build_url_index(out_dir) if incremental else None
+    refresh_after = timedelta(days=refresh_after_days) if refresh_after_days is not None else None
+    if url_index is not None:
+        print(f"ℹ️ Incremental crawl: {len(url_index)} articles already on disk.")
+
+    stats = {
+        "list_pages": 0,
+        "list_pages_http": 0,
+        "list_pages_browser": 0,
+        "list_page_failures": 0,
+        "articles_saved": 0,
+        "articles_http": 0,
+        "articles_browser": 0,
+        "articles_skipped": 0,
+        "articles_up_to_date": 0,
+        "articles_not_modified": 0,
+        "article_failures": 0,
+    }
+    rate_limiter = HostRateLimiter(rate_per_sec)
+    article_queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 4)
+
+    browser = LazyBrowser()
+    client = make_http_client(concurrency) if fetch_mode == "http" else None
+    try:
+        await asyncio.gather(
+            _discover_listing_pages(
+                browser, client, base_url, max_pages, article_queue, concurrency, rate_limiter,
+                stats, url_index, refresh_after,
+            ),
+            *[
+                _article_worker(
+                    browser, client, article_queue, out_path, rate_limiter, stats, url_index,
+                    ingest_queue,
+                )
+                for _ in range(concurrency)
+            ],
+        )
+    finally:
+        if client is not None:
+            await client.aclose()
         await browser.close()
 
-    print(f"\n✅ Done. Markdown files are in: {Path(out_dir).resolve()}")
+    print(
+        f"\n✅ Done. Markdown files are in: {Path(out_dir).resolve()}\n"
+        f"   List pages: {stats['list_pages']} ({stats['list_page_failures']} failed), "
+        f"articles saved: {stats['articles_saved']} "
+        f"(http: {stats['articles_http']}, browser: {stats['articles_browser']}), "
+        f"skipped: {stats['articles_skipped']}, "
+        f"up to date: {stats['articles_up_to_date']}, not modified: {stats['articles_not_modified']}, "
+        f"failed: {stats['article_failures']}"
+    )
+    return stats
+
+
+async def scrape_and_index(
+    base_url: str,
+    out_dir: str = "data",
+    queue_size: int = 32,
+    **crawl_kwargs,
+) -> Tuple[Dict[str, int], Dict]:
+    """
+    Crawl and index in one streaming pipeline: articles go from the crawler
+    through a bounded queue into vector_db_ingest.StreamingIndexer (clean,
+    chunk, embed, upsert into Chroma) while the crawl continues. Markdown
+    files are still written to `out_dir` as the archive.
+
+    Returns:
+        (crawl counts, indexer counts)
+    """
+    # Heavy imports (Chroma, encoder) only in pipeline mode
+    from config import VECTOR_DB_DIR
+    from vector_db_ingest import StreamingIndexer, initialize_db
+
+    # Loads the encoder; keep it off the event loop
+    collection = await asyncio.to_thread(
+        initialize_db, persist_directory=VECTOR_DB_DIR, collection_name="publications"
+    )
+    indexer = StreamingIndexer(collection)
+    ingest_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def crawl() -> Dict[str, int]:
+        try:
+            return await scrape_all_pages_to_markdown(
+                base_url, out_dir=out_dir, ingest_queue=ingest_queue, **crawl_kwargs
+            )
+        finally:
+            await ingest_queue.put(None)
+
+    crawl_stats, index_stats = await asyncio.gather(crawl(), indexer.run(ingest_queue))
+    print(
+        f"Indexed {index_stats['publications']} articles: chunks added {index_stats['added']}, "
+        f"updated {index_stats['updated']}, deleted {index_stats['deleted']} "
+        f"({index_stats['chunks_per_sec']:.1f} chunks/sec); scrape-to-searchable "
+        f"latency mean {index_stats['mean_latency_s']:.1f}s, max {index_stats['max_latency_s']:.1f}s"
+    )
+    return crawl_stats, index_stats
 
 
 async def main():
-    base_url = "https://lifeinsaudiarabia.net/category/jawazat-and-moi/iqama/"
-    await scrape_all_pages_to_markdown(base_url, out_dir="data", max_pages=None)
+    parser = argparse.ArgumentParser(description="Scrape a category listing to markdown.")
+    parser.add_argument(
+        "--base-url", default="https://lifeinsaudiarabia.net/category/jawazat-and-moi/iqama/"
+    )
+    parser.add_argument("--out-dir", default="data")
+    parser.add_argument("--max-pages", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=4, help="Article fetches in flight")
+    parser.add_argument("--rate", type=float, default=2.0, help="Max navigations per second per host")
+    parser.add_argument(
+        "--incremental", action="store_true", help="Skip articles already in --out-dir"
+    )
+    parser.add_argument(
+        "--refresh-days",
+        type=float,
+        default=None,
+        help="With --incremental, revalidate articles scraped more than this many days ago",
+    )
+    parser.add_argument(
+        "--fetch-mode",
+        choices=["http", "browser"],
+        default="http",
+        help="http: plain HTTP with Playwright fallback; browser: Playwright for every page",
+    )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="Also chunk, embed and upsert each article into Chroma as it is scraped",
+    )
+    args = parser.parse_args()
+
+    crawl_kwargs = dict(
+        max_pages=args.max_pages,
+        concurrency=args.concurrency,
+        rate_per_sec=args.rate,
+        incremental=args.incremental,
+        refresh_after_days=args.refresh_days,
+        fetch_mode=args.fetch_mode,
+    )
+    if args.index:
+        await scrape_and_index(args.base_url, out_dir=args.out_dir, **crawl_kwargs)
+    else:
+        await scrape_all_pages_to_markdown(args.base_url, out_dir=args.out_dir, **crawl_kwargs)
 
 
 if __name__ == "__main__":
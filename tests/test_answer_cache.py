@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache.time, "time", clock)
+    return clock
+
+
+def _emb(seed):
+    vec = np.random.default_rng(seed).normal(size=16).astype("float32")
+    return vec / np.linalg.norm(vec)
+
+
+def _cache(tmp_path, **kwargs):
+    return AnswerCache(str(tmp_path / "answers.sqlite3"), threshold=0.95, **kwargs)
+
+
+def test_near_identical_question_hits(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.store("q", _emb(1), "en", "v1", ["a_0", "b_1"], "answer")
+
+    assert cache.lookup(_emb(1), "en", "v1", ["b_1", "a_0"]) == "answer"
+    assert cache.lookup(_emb(2), "en", "v1", ["a_0", "b_1"]) is None
+    assert cache.lookup(_emb(1), "ur", "v1", ["a_0", "b_1"]) is None
+    assert cache.lookup(_emb(1), "en", "v1", ["a_0"]) is None
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = _cache(tmp_path, ttl_seconds=60)
+    cache.store("q", _emb(1), "en", "v1", ["a_0"], "answer")
+
+    clock.now += 59
+    assert cache.lookup(_emb(1), "en", "v1", ["a_0"]) == "answer"
+    clock.now += 2
+    assert cache.lookup(_emb(1), "en", "v1", ["a_0"]) is None
+
+    # Expired rows are deleted on the next store
+    cache.store("other", _emb(2), "en", "v1", ["b_0"], "other answer")
+    assert cache.stats()["size"] == 1
+
+
+def test_new_index_version_invalidates_old_answers(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.store("q", _emb(1), "en", "v1", ["a_0"], "old answer")
+
+    assert cache.lookup(_emb(1), "en", "v2", ["a_0"]) is None
+
+    cache.store("q2", _emb(2), "en", "v2", ["a_0"], "new answer")
+    assert cache.stats()["size"] == 1
+    assert cache.lookup(_emb(1), "en", "v1", ["a_0"]) is None
+
+
+def test_store_keeps_only_the_most_recently_used_entries(tmp_path, clock):
+    cache = _cache(tmp_path, max_entries=2)
+    for i in range(3):
+        clock.now += 1
+        cache.store(f"q{i}", _emb(i), "en", "v1", [f"c_{i}"], f"answer {i}")
+        if i == 1:
+            clock.now += 1
+            assert cache.lookup(_emb(0), "en", "v1", ["c_0"]) == "answer 0"  # refresh q0
+
+    assert cache.stats()["size"] == 2
+    assert cache.lookup(_emb(0), "en", "v1", ["c_0"]) == "answer 0"
+    assert cache.lookup(_emb(1), "en", "v1", ["c_1"]) is None
+    assert cache.lookup(_emb(2), "en", "v1", ["c_2"]) == "answer 2"
@@ -0,0 +1,62 @@
+import numpy as np
+
+import embedding_cache
+from embedding_cache import EmbeddingCache, cached_encode
+
+
+def _unit(seed, dim=8):
+    vec = np.random.default_rng(seed).normal(size=dim).astype("float32")
+    return vec / np.linalg.norm(vec)
+
+
+def test_two_instances_on_one_directory_do_not_clobber_each_other(tmp_path):
+    a = EmbeddingCache(str(tmp_path), "enc", dtype="float32")
+    b = EmbeddingCache(str(tmp_path), "enc", dtype="float32")
+
+    a.put_many(["q1"], [_unit(1)])
+    b.put_many(["q2"], [_unit(2)])
+    a.put_many(["q3"], [_unit(3)])
+
+    for cache in (a, b, EmbeddingCache(str(tmp_path), "enc", dtype="float32")):
+        got = cache.get_many(["q1", "q2", "q3"])
+        for vec, seed in zip(got, (1, 2, 3)):
+            np.testing.assert_allclose(vec, _unit(seed))
+
+
+def test_namespaces_are_isolated(tmp_path):
+    torch_cache = EmbeddingCache(str(tmp_path), "bge|backend=torch", dtype="float32")
+    onnx_cache = EmbeddingCache(str(tmp_path), "bge|backend=onnx", dtype="float32")
+    torch_cache.put_many(["hello"], [_unit(1)])
+
+    assert onnx_cache.get_many(["hello"]) == [None]
+    assert torch_cache.get_many(["  hello "])[0] is not None  # normalized text
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache = EmbeddingCache(str(tmp_path), "enc", dtype="float32", max_entries=3)
+    monkeypatch.setattr(embedding_cache, "_TOUCH_SECONDS", 0.0)
+    cache._puts_since_evict = -10**9  # no eviction while filling
+
+    cache.put_many(["a", "b", "c", "d"], [_unit(i) for i in range(4)])
+    cache.get_many(["a"])  # "a" becomes most recently used
+    cache._puts_since_evict = 10**9  # evict on the next put
+    cache.put_many(["e"], [_unit(5)])
+
+    got = dict(zip("abcde", cache.get_many(list("abcde"))))
+    assert got["a"] is not None and got["e"] is not None
+    assert cache.stats()["size"] == 3
+
+
+def test_cached_encode_only_encodes_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "enc")
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return np.vstack([_unit(len(t)) for t in texts])
+
+    first = cached_encode(["x", "yy"], encode, cache)
+    second = cached_encode(["yy", "zzz"], encode, cache)
+
+    assert calls == [["x", "yy"], ["zzz"]]
+    np.testing.assert_allclose(first[1], second[0], atol=1e-3)  # float16 storage
@@ -0,0 +1,114 @@
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import embedding_service
+from embedding_service import MicroBatchEncoder, RemoteEncoder
+
+
+class FakeEncoder:
+    """Deterministic encoder: the vector of a text is [len(text), i, ...]; records batch sizes."""
+
+    model_name = "fake-model"
+    pooling = "cls"
+    backend = "torch"
+
+    def __init__(self, dim=4):
+        self.dim = dim
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def dimension(self):
+        return self.dim
+
+    def encode(self, texts, normalize_embeddings=True, batch_size=32, **kwargs):
+        with self.lock:
+            self.batches.append(len(texts))
+        return np.array([[len(t)] + [float(normalize_embeddings)] * (self.dim - 1) for t in texts], dtype="float32")
+
+
+def test_concurrent_requests_are_merged_into_batches():
+    fake = FakeEncoder()
+    service = MicroBatchEncoder(fake, max_batch_size=64, max_wait_ms=200)
+    texts = [["a" * (i + 1)] for i in range(8)]
+    results = [None] * len(texts)
+    barrier = threading.Barrier(len(texts))
+
+    def call(i):
+        barrier.wait()
+        results[i] = service.encode(texts[i])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(texts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Every caller gets its own row back
+    assert [int(r[0, 0]) for r in results] == list(range(1, 9))
+    assert sum(fake.batches) == 8
+    assert len(fake.batches) < 8
+    stats = service.stats()
+    assert stats["requests"] == 8
+    assert sum(size * n for size, n in stats["batch_size_histogram"].items()) == 8
+
+
+def test_oversized_requests_run_whole_and_normalization_is_kept():
+    fake = FakeEncoder()
+    service = MicroBatchEncoder(fake, max_batch_size=2, max_wait_ms=50)
+    out = service.encode(["x", "yy", "zzz"])  # one request larger than the cap still runs whole
+    raw = service.encode(["w"], normalize_embeddings=False)
+
+    assert out[:, 0].tolist() == [1, 2, 3]
+    assert raw[0, 1] == 0.0
+
+
+def test_encoder_errors_reach_the_caller():
+    class Broken(FakeEncoder):
+        def encode(self, texts, **kwargs):
+            raise RuntimeError("boom")
+
+    service = MicroBatchEncoder(Broken(), max_wait_ms=1)
+    with pytest.raises(RuntimeError, match="boom"):
+        service.encode(["x"])
+
+
+@pytest.fixture
+def sidecar(tmp_path):
+    if not hasattr(socket, "AF_UNIX"):
+        pytest.skip("Unix sockets not available")
+    path = str(tmp_path / "embed.sock")
+    service = MicroBatchEncoder(FakeEncoder(dim=3), max_wait_ms=1)
+    threading.Thread(target=embedding_service.serve, args=(service, path), daemon=True).start()
+    deadline = time.time() + 5
+    while not os.path.exists(path):
+        if time.time() > deadline:
+            pytest.fail("sidecar did not start")
+        time.sleep(0.01)
+    return path
+
+
+def test_socket_round_trip(sidecar):
+    client = RemoteEncoder(sidecar)
+    assert (client.model_name, client.pooling, client.backend) == ("fake-model", "cls", "torch")
+    assert client.dimension() == 3
+
+    vectors = client.encode(["ab", "اقامہ"])
+    assert vectors.dtype == np.float32
+    assert vectors.shape == (2, 3)
+    assert vectors[:, 0].tolist() == [2, 5]
+
+    # The connection stays usable for further requests, including stats
+    assert client.encode("abc")[0, 0] == 3
+    assert client.stats()["requests"] == 2
+
+
+def test_socket_errors_are_reported(sidecar):
+    client = RemoteEncoder(sidecar)
+    with pytest.raises(RuntimeError, match="Unknown op"):
+        client._call({"op": "nope"})
+    assert client.encode(["ok"]).shape == (1, 3)
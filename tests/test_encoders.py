@@ -0,0 +1,126 @@
+import sys
+
+import numpy as np
+import pytest
+
+import encoders
+
+
+class FakeEncoder:
+    def __init__(self, model_name="BAAI/bge-m3", pooling="cls", dim=1024):
+        self.model_name = model_name
+        self.pooling = pooling
+        self._dim = dim
+
+    def dimension(self):
+        return self._dim
+
+
+def test_fingerprint_uses_the_encoders_own_pooling():
+    assert "pooling=cls" in encoders.encoder_fingerprint(FakeEncoder(pooling="cls"))
+    assert "pooling=mean" in encoders.encoder_fingerprint(FakeEncoder(pooling="mean"))
+
+
+def test_check_fingerprint_accepts_same_space_and_unstamped_indexes():
+    stored = encoders.encoder_fingerprint(FakeEncoder())
+    encoders.check_fingerprint(stored, FakeEncoder())
+    encoders.check_fingerprint(None, FakeEncoder(pooling="mean"))
+
+
+@pytest.mark.parametrize(
+    "other",
+    [FakeEncoder(pooling="mean"), FakeEncoder(dim=384), FakeEncoder(model_name="other-model")],
+)
+def test_check_fingerprint_rejects_a_different_space(other):
+    stored = encoders.encoder_fingerprint(FakeEncoder())
+    with pytest.raises(RuntimeError):
+        encoders.check_fingerprint(stored, other)
+
+
+def test_sentence_transformer_pooling_reads_the_pooling_module():
+    class Transformer:
+        pass
+
+    class Pooling:
+        def get_pooling_mode_str(self):
+            return "cls"
+
+    assert encoders._sentence_transformer_pooling([Transformer(), Pooling()]) == "cls"
+    assert encoders._sentence_transformer_pooling([Transformer()]) == "none"
+
+
+@pytest.mark.parametrize(
+    "backend, cls_name",
+    [
+        ("torch", "SentenceTransformerEncoder"),
+        ("torch-int8", "QuantizedTorchEncoder"),
+        ("onnx", "OnnxEncoder"),
+    ],
+)
+def test_load_encoder_dispatches_on_backend(monkeypatch, backend, cls_name):
+    created = []
+    monkeypatch.setattr(
+        encoders, cls_name, lambda model_name, num_threads=0: created.append(model_name) or cls_name
+    )
+    assert encoders.load_encoder(backend, "local-model") == cls_name
+    assert created == ["local-model"]
+
+
+def test_load_encoder_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        encoders.load_encoder("tensorrt")
+
+
+class VectorEncoder:
+    """Encodes each text to a fixed random direction, plus optional per-backend noise."""
+
+    def __init__(self, noise=0.0, seed=0):
+        self.noise = noise
+        self.seed = seed
+
+    def encode(self, texts, normalize_embeddings=True, **kwargs):
+        base = np.vstack([np.random.default_rng(len(t) * 7919 + sum(map(ord, t))).normal(size=64) for t in texts])
+        noise = np.random.default_rng(self.seed).normal(size=base.shape) * self.noise
+        vectors = base + noise
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors.astype("float32")
+
+
+def test_validate_encoder_measures_cosine_agreement():
+    reference = VectorEncoder()
+    close = encoders.validate_encoder(VectorEncoder(noise=0.01, seed=1), reference)
+    far = encoders.validate_encoder(VectorEncoder(noise=1.0, seed=2), reference)
+
+    assert close["min_cosine"] > 0.99
+    assert close["mean_cosine"] >= close["min_cosine"]
+    assert far["min_cosine"] < 0.9
+
+
+@pytest.mark.parametrize("noise, passes", [(0.01, True), (1.0, False)])
+def test_validation_cli_fails_below_min_cosine(monkeypatch, noise, passes):
+    encoders_by_backend = {"torch": VectorEncoder(), "onnx": VectorEncoder(noise=noise, seed=1)}
+    monkeypatch.setattr(encoders, "load_encoder", lambda backend, model: encoders_by_backend[backend])
+    monkeypatch.setattr(sys, "argv", ["encoders.py", "--backend", "onnx", "--min-cosine", "0.99"])
+
+    if passes:
+        encoders.main()
+    else:
+        with pytest.raises(SystemExit, match="below 0.99"):
+            encoders.main()
+
+
+def test_int8_backend_agrees_with_torch_on_a_local_model():
+    """Set ENCODER_TEST_MODEL to a small local SentenceTransformer (e.g. a MiniLM checkout) to run."""
+    import os
+
+    model = os.getenv("ENCODER_TEST_MODEL")
+    if not model:
+        pytest.skip("ENCODER_TEST_MODEL not set")
+    pytest.importorskip("torch")
+    pytest.importorskip("sentence_transformers")
+
+    report = encoders.validate_encoder(
+        encoders.load_encoder("torch-int8", model), encoders.load_encoder("torch", model)
+    )
+    assert report["mean_cosine"] > 0.95
@@ -0,0 +1,257 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import llm_client
+
+
+class APIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class Flaky:
+    """Fails with the given status codes, then returns `result`."""
+
+    def __init__(self, codes, result="ok"):
+        self.codes = list(codes)
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.codes:
+            raise APIError(self.codes.pop(0))
+        return self.result
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff sleeps instead of sleeping; jitter always picks the upper bound."""
+    recorded = []
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(llm_client.time, "sleep", recorded.append)
+    monkeypatch.setattr(llm_client, "LLM_RETRY_BASE_DELAY", 0.5)
+    monkeypatch.setattr(llm_client, "LLM_RETRY_MAX_DELAY", 8.0)
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 3)
+    return recorded
+
+
+def test_retries_429_and_5xx_with_exponential_backoff(sleeps):
+    before = llm_client.get_llm_stats()
+    call = Flaky([429, 503])
+
+    assert llm_client._with_retries(call) == "ok"
+
+    assert call.calls == 3
+    assert sleeps == [0.5, 1.0]
+    after = llm_client.get_llm_stats()
+    assert after["retries"] - before["retries"] == 2
+    assert after["failures"] == before["failures"]
+
+
+def test_non_retryable_errors_are_raised_immediately(sleeps):
+    call = Flaky([400])
+    with pytest.raises(APIError):
+        llm_client._with_retries(call)
+    assert call.calls == 1
+    assert sleeps == []
+
+
+def test_gives_up_after_max_retries(sleeps):
+    before = llm_client.get_llm_stats()
+    call = Flaky([500] * 10)
+    with pytest.raises(APIError):
+        llm_client._with_retries(call)
+    assert call.calls == llm_client.LLM_MAX_RETRIES + 1
+    assert sleeps == [0.5, 1.0, 2.0]
+    assert llm_client.get_llm_stats()["failures"] == before["failures"] + 1
+
+
+def test_backoff_delay_is_capped(monkeypatch):
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(llm_client, "LLM_RETRY_MAX_DELAY", 8.0)
+    assert llm_client._backoff_delay(10) == 8.0
+
+
+def test_latency_excludes_backoff_sleeps(monkeypatch):
+    monkeypatch.setattr(llm_client, "_backoff_delay", lambda attempt: 0.2)
+    before = llm_client.get_llm_stats()
+    llm_client._with_retries(Flaky([429]))
+    after = llm_client.get_llm_stats()
+    assert after["total_latency"] - before["total_latency"] < 0.1
+
+
+def test_chat_retries_through_the_shared_client(sleeps):
+    flaky = Flaky([502], result=SimpleNamespace(text="answer"))
+    client = SimpleNamespace(models=SimpleNamespace(generate_content=lambda **kwargs: flaky()))
+    llm_client.set_gemini_client(client)
+    try:
+        assert llm_client.chat([{"role": "user", "content": "hi"}]) == "answer"
+    finally:
+        llm_client.set_gemini_client(None)
+    assert flaky.calls == 2
+
+
+
+def test_async_retries(monkeypatch):
+    monkeypatch.setattr(llm_client, "_backoff_delay", lambda attempt: 0.0)
+    flaky = Flaky([429], result=SimpleNamespace(text="answer"))
+
+    async def generate_content(**kwargs):
+        return flaky()
+
+    client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+    for _ in range(2):  # a fresh event loop per call, as batch callers use asyncio.run
+        reply = asyncio.run(llm_client.chat_async([{"role": "user", "content": "hi"}], client=client))
+        assert reply == "answer"
+        flaky.codes = [429]
+
+
+def test_each_event_loop_gets_its_own_async_client(monkeypatch):
+    created = []
+    monkeypatch.setattr(llm_client, "_new_gemini_client", lambda: created.append(object()) or created[-1])
+
+    async def current_client():
+        return llm_client.get_async_gemini_client(), llm_client.get_async_gemini_client()
+
+    first, again = asyncio.run(current_client())
+    second, _ = asyncio.run(current_client())
+
+    assert first is again
+    assert first is not second
+    assert len(created) == 2
+
+
+def test_injected_client_is_shared_across_loops():
+    fake = object()
+    llm_client.set_gemini_client(fake)
+    try:
+        async def current_client():
+            return llm_client.get_async_gemini_client()
+
+        assert asyncio.run(current_client()) is fake
+        assert asyncio.run(current_client()) is fake
+    finally:
+        llm_client.set_gemini_client(None)
+
+
+class FakeStreamingClient:
+    """`models.generate_content_stream` yields the given texts, optionally failing after `fail_after`."""
+
+    def __init__(self, texts, fail_after=None, open_errors=()):
+        self.texts = texts
+        self.fail_after = fail_after
+        self.open_errors = list(open_errors)
+        self.models = SimpleNamespace(generate_content_stream=self._stream)
+        self.closed = False
+
+    def _stream(self, model, contents):
+        if self.open_errors:
+            raise APIError(self.open_errors.pop(0))
+        return self._chunks()
+
+    def _chunks(self):
+        try:
+            for i, text in enumerate(self.texts):
+                if i == self.fail_after:
+                    raise APIError(500)
+                yield SimpleNamespace(text=text)
+        finally:
+            self.closed = True
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def test_stream_yields_chunks_in_order(sleeps):
+    client = FakeStreamingClient(["Iqama ", "", "renewal ", "takes 3 days."], open_errors=[503])
+    assert list(llm_client.chat_stream(MESSAGES, client=client)) == ["Iqama ", "renewal ", "takes 3 days."]
+    assert sleeps == [0.5]  # opening the stream was retried
+
+
+def test_stream_failures_are_reported(sleeps):
+    client = FakeStreamingClient(["a", "b", "c"], fail_after=2)
+    stream = llm_client.chat_stream(MESSAGES, client=client)
+    assert [next(stream), next(stream)] == ["a", "b"]
+    with pytest.raises(RuntimeError, match="Gemini API request failed: HTTP 500"):
+        next(stream)
+
+    with pytest.raises(RuntimeError, match="HTTP 400"):
+        list(llm_client.chat_stream(MESSAGES, client=FakeStreamingClient(["a"], open_errors=[400])))
+
+
+def test_answer_question_stream_passes_client_errors_through(monkeypatch):
+    import rag_core
+
+    stored = []
+    monkeypatch.setattr(
+        rag_core,
+        "_prepare_answer",
+        lambda query, embed_model, collection, k: {
+            "messages": MESSAGES, "cached_reply": None, "cache_key": "key", "retrieved": [{"chunk_id": "c_0"}],
+        },
+    )
+    monkeypatch.setattr(rag_core, "_store_answer", lambda key, reply: stored.append(reply))
+
+    chunks, retrieved = rag_core.answer_question_stream("q", None, None, llm_client=FakeStreamingClient(["one ", "two"]))
+    assert retrieved == [{"chunk_id": "c_0"}]
+    assert list(chunks) == ["one ", "two"]
+    assert stored == ["one two"]
+
+    chunks, _ = rag_core.answer_question_stream(
+        "q", None, None, llm_client=FakeStreamingClient(["one ", "two"], fail_after=1)
+    )
+    with pytest.raises(RuntimeError) as excinfo:
+        list(chunks)
+    assert str(excinfo.value) == "Gemini API request failed: HTTP 500"
+    assert stored == ["one two"]  # failed answers are not cached
+
+
+def test_stream_holds_a_concurrency_slot_until_done(monkeypatch):
+    import threading
+
+    slot = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(llm_client, "_concurrency", slot)
+
+    def slot_free():
+        if slot.acquire(blocking=False):
+            slot.release()
+            return True
+        return False
+
+    stream = llm_client.chat_stream(MESSAGES, client=FakeStreamingClient(["a", "b"]))
+    assert next(stream) == "a"
+    assert not slot_free()
+    assert list(stream) == ["b"]
+    assert slot_free()
+
+    # Closing a stream early releases the slot and closes the underlying stream
+    client = FakeStreamingClient(["a", "b"])
+    stream = llm_client.chat_stream(MESSAGES, client=client)
+    next(stream)
+    stream.close()
+    assert slot_free()
+    assert client.closed
+
+
+def test_stream_latency_covers_the_whole_stream(monkeypatch):
+    class Slow(FakeStreamingClient):
+        def _chunks(self):
+            for text in self.texts:
+                time.sleep(0.05)
+                yield SimpleNamespace(text=text)
+
+    before = llm_client.get_llm_stats()
+    stream = llm_client.chat_stream(MESSAGES, client=Slow(["a", "b", "c"]))
+    assert next(stream) == "a"
+    time.sleep(0.2)  # the caller rendering: not LLM time
+    assert list(stream) == ["b", "c"]
+    after = llm_client.get_llm_stats()
+
+    assert after["calls"] == before["calls"] + 1
+    latency = after["total_latency"] - before["total_latency"]
+    assert 0.15 <= latency < 0.3
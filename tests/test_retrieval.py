@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+import rag_core
+from rag_core import adaptive_cutoff, mmr_select
+
+
+def test_cutoff_stops_below_min_similarity():
+    assert adaptive_cutoff([0.8, 0.7, 0.35, 0.3], min_similarity=0.4, max_gap=1.0, min_k=1) == 2
+
+
+def test_cutoff_stops_before_a_large_gap():
+    assert adaptive_cutoff([0.9, 0.85, 0.6, 0.55], min_similarity=0.0, max_gap=0.1, min_k=1) == 2
+
+
+def test_cutoff_keeps_min_k():
+    assert adaptive_cutoff([0.2, 0.1], min_similarity=0.4, max_gap=0.1, min_k=1) == 1
+    assert adaptive_cutoff([0.2], min_similarity=0.4, max_gap=0.1, min_k=3) == 1
+    assert adaptive_cutoff([], min_similarity=0.4, max_gap=0.1, min_k=1) == 0
+
+
+def test_mmr_skips_near_duplicates():
+    base = np.eye(3, dtype="float32")
+    # Candidate 1 repeats candidate 0; candidate 2 is different but a bit less relevant
+    embeddings = np.vstack([base[0], base[0] + 0.01 * base[1], base[1]])
+    picked = mmr_select(np.array([0.9, 0.89, 0.8]), embeddings, k=2, lambda_mult=0.5)
+    assert picked == [0, 2]
+
+
+def test_mmr_with_lambda_one_is_plain_ranking():
+    embeddings = np.random.default_rng(0).normal(size=(5, 8))
+    sims = np.array([0.3, 0.9, 0.5, 0.7, 0.1])
+    assert mmr_select(sims, embeddings, k=3, lambda_mult=1.0) == [1, 3, 2]
+    assert mmr_select(sims, embeddings, k=10, lambda_mult=1.0) == [1, 3, 2, 0, 4]
+    assert mmr_select(sims[:0], embeddings[:0], k=3) == []
+
+
+class RawCollection:
+    """A plain Chroma collection: only the `include=` query API."""
+
+    def __init__(self, embeddings, distances):
+        self.embeddings = np.asarray(embeddings, dtype="float32")
+        self.distances = distances
+        self.calls = []
+
+    def query(self, query_embeddings, n_results, include=None):
+        self.calls.append(include)
+        n = min(n_results, len(self.embeddings))
+        result = {
+            "ids": [[f"c_{i}" for i in range(n)]],
+            "documents": [[f"text {i}" for i in range(n)]],
+            "metadatas": [[{"title": f"T{i}"} for i in range(n)]],
+            "distances": [self.distances[:n]],
+        }
+        if include and "embeddings" in include:
+            result["embeddings"] = [self.embeddings[:n]]
+        return result
+
+
+@pytest.fixture
+def query_vector(monkeypatch):
+    q = np.array([[1.0, 0.0, 0.0]], dtype="float32")
+    monkeypatch.setattr(rag_core, "embed_query", lambda query, model: q)
+    monkeypatch.setattr(rag_core, "RETRIEVAL_MMR_ENABLED", True)
+    return q
+
+
+def test_raw_collection_is_asked_for_embeddings_and_rescored(query_vector):
+    # Distances say nothing useful; the returned embeddings give the true cosine
+    embeddings = [[0.0, 1.0, 0.0], [1.0, 0.0, 0.0], [0.9, 0.1, 0.0]]
+    collection = RawCollection(embeddings, distances=[0.0, 0.0, 0.0])
+
+    hits = rag_core.retrieve("q", None, collection, k=2)
+
+    assert "embeddings" in collection.calls[0]
+    assert [h["chunk_id"] for h in hits] == ["c_1", "c_2"]
+    assert hits[0]["score"] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_cutoff_is_skipped_for_inexact_scores(query_vector, capsys, monkeypatch):
+    monkeypatch.setattr(rag_core, "_warned_inexact_scores", False)
+
+    class Compressed(RawCollection):
+        exact_scores = False
+
+        def query(self, query_embeddings, n_results, include=None):
+            result = super().query(query_embeddings, n_results)
+            result["embeddings"] = [None]
+            return result
+
+    # Scores far below RETRIEVAL_MIN_SIMILARITY would otherwise cut to one hit
+    collection = Compressed(np.zeros((4, 3)), distances=[0.9, 0.95, 0.97, 0.99])
+    hits = rag_core.retrieve("q", None, collection, k=3)
+
+    assert [h["chunk_id"] for h in hits] == ["c_0", "c_1", "c_2"]
+    assert "cutoff disabled" in capsys.readouterr().out
@@ -0,0 +1,312 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+import scrapping
+
+LISTING = """<html><body>
+{links}
+</body></html>"""
+
+ARTICLE = """<html><body>
+<h1 class="entry-title">{title}</h1>
+<div class="td-post-content"><p>{body}</p><script>tracker()</script></div>
+</body></html>"""
+
+
+class RecordingHandler(SimpleHTTPRequestHandler):
+    """Static file handler that records requests and how many overlap."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((time.monotonic(), self.path, self.headers.get("If-Modified-Since")))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            super().do_GET()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class Site:
+    """Fixture site on disk: listing pages under /category/, articles under /posts/."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.server = None
+
+    def write(self, url_path: str, html: str, mtime: float | None = None) -> None:
+        path = self.root / url_path.strip("/") / "index.html"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(html, encoding="utf-8")
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def url(self, url_path: str = "/") -> str:
+        return f"http://127.0.0.1:{self.server.server_port}{url_path}"
+
+    def article(self, name: str, title: str | None = None, html: str | None = None) -> str:
+        # Old mtime, so If-Modified-Since revalidation gets a 304
+        self.write(f"/posts/{name}/", html or ARTICLE.format(title=title or name, body=f"Body of {name}."), mtime=1e9)
+        return f"/posts/{name}/"
+
+    def listing(self, page: int, article_paths: list[str], extra: str = "") -> None:
+        links = "\n".join(
+            f'<h3 class="td-module-title"><a href="{p}">{p}</a></h3>' for p in article_paths
+        )
+        url_path = "/category/" if page == 1 else f"/category/page/{page}/"
+        self.write(url_path, LISTING.format(links=links + extra))
+
+    def requested(self, prefix: str = "") -> list[str]:
+        return [path for _, path, _ in self.server.requests if path.startswith(prefix)]
+
+
+@pytest.fixture
+def site(tmp_path):
+    site = Site(tmp_path / "site")
+    site.root.mkdir()
+    handler = functools.partial(RecordingHandler, directory=str(site.root))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.delay = 0.01
+    site.server = server
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield site
+    server.shutdown()
+    server.server_close()
+
+
+class NoBrowser:
+    """LazyBrowser stand-in for crawls that must stay on plain HTTP."""
+
+    async def new_page(self):
+        raise AssertionError("the browser should not be needed")
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def no_browser(monkeypatch):
+    monkeypatch.setattr(scrapping, "LazyBrowser", NoBrowser)
+
+
+def _crawl(site, out_dir, **kwargs):
+    kwargs.setdefault("fetch_mode", "http")
+    kwargs.setdefault("rate_per_sec", 100.0)
+    return asyncio.run(scrapping.scrape_all_pages_to_markdown(site.url("/category/"), out_dir=str(out_dir), **kwargs))
+
+
+def _two_listing_pages(site):
+    pages = [[site.article(f"p{page}-{i}") for i in range(3)] for page in (1, 2)]
+    site.listing(1, pages[0])
+    site.listing(2, pages[1])  # /category/page/3/ is a 404: end of the listing
+    return pages[0] + pages[1]
+
+
+def test_crawl_saves_every_article_within_concurrency_and_rate_bounds(site, tmp_path, no_browser):
+    articles = _two_listing_pages(site)
+    out_dir = tmp_path / "data"
+    site.server.delay = 0.25  # slower than the rate limit, so fetches pile up
+
+    stats = _crawl(site, out_dir, concurrency=2, rate_per_sec=10.0)
+
+    assert stats["articles_saved"] == stats["articles_http"] == len(articles)
+    assert stats["list_pages_http"] == 3  # two listings plus the 404 past the end
+    assert stats["article_failures"] == stats["list_page_failures"] == 0
+
+    files = sorted(out_dir.glob("*.md"))
+    assert len(files) == len(articles)
+    texts = "\n".join(f.read_text(encoding="utf-8") for f in files)
+    for path in articles:
+        assert f'source_url: "{site.url(path)}"' in texts
+    assert "tracker()" not in texts
+
+    # Fetches overlap, but the pooled client never has more than `concurrency` open
+    assert site.server.max_in_flight == 2
+    # One host: requests are released 1 / rate_per_sec apart (arrival times jitter a little)
+    starts = [t for t, _, _ in site.server.requests]
+    assert starts[-1] - starts[0] >= (len(starts) - 1) * 0.1 * 0.9
+    assert min(b - a for a, b in zip(starts, starts[1:])) >= 0.1 * 0.5
+
+
+def test_rate_limiter_spaces_each_host_separately():
+    async def run():
+        limiter = scrapping.HostRateLimiter(rate_per_sec=10.0)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        times = {}
+
+        async def hit(url):
+            await limiter.wait(url)
+            times.setdefault(url.split("/")[2], []).append(loop.time() - start)
+
+        await asyncio.gather(*[hit(f"http://{host}/x") for host in ("a", "b") for _ in range(3)])
+        return times
+
+    times = asyncio.run(run())
+    for host_times in times.values():
+        host_times.sort()
+        assert host_times[0] < 0.05  # hosts do not wait for each other
+        assert host_times[2] - host_times[0] >= 0.2 * 0.9
+
+
+def test_incremental_crawl_skips_known_urls_and_stops_at_known_listings(site, tmp_path, no_browser):
+    articles = _two_listing_pages(site)
+    out_dir = tmp_path / "data"
+    _crawl(site, out_dir)
+    site.server.requests.clear()
+
+    stats = _crawl(site, out_dir, incremental=True)
+
+    assert stats["articles_up_to_date"] == 3
+    assert stats["articles_saved"] == 0
+    assert site.requested("/posts/") == []
+    assert site.requested("/category/") == ["/category/"]  # page 1 is all known: stop
+
+    # A new article pushes the listing along: page 1 now has one unknown link, page 2 none
+    new = site.article("fresh")
+    site.listing(1, [new] + articles[:2])
+    site.listing(2, articles[2:5])
+    site.server.requests.clear()
+
+    stats = _crawl(site, out_dir, incremental=True)
+
+    assert stats["articles_saved"] == 1
+    assert site.requested("/posts/") == [new]
+    assert site.requested("/category/") == ["/category/", "/category/page/2/"]
+    assert len(list(out_dir.glob("*.md"))) == len(articles) + 1
+
+
+def test_stale_articles_are_revalidated_with_if_modified_since(site, tmp_path, no_browser):
+    articles = _two_listing_pages(site)
+    out_dir = tmp_path / "data"
+    _crawl(site, out_dir)
+    before = {f.name: f.read_text(encoding="utf-8") for f in out_dir.glob("*.md")}
+
+    # One article changed on the server after it was scraped
+    changed = articles[0]
+    site.write(changed, ARTICLE.format(title="p1-0", body="Updated body."), mtime=time.time() + 60)
+    site.server.requests.clear()
+
+    stats = _crawl(site, out_dir, incremental=True, refresh_after_days=0)
+
+    # Only page 1 is walked (all known); each of its articles gets a conditional GET
+    assert all(ims for _, path, ims in site.server.requests if path.startswith("/posts/"))
+    assert sorted(site.requested("/posts/")) == sorted(articles[:3])
+    assert stats["articles_not_modified"] == 2
+    assert stats["articles_saved"] == 1
+
+    after = {f.name: f.read_text(encoding="utf-8") for f in out_dir.glob("*.md")}
+    assert after.keys() == before.keys()
+    for name, text in after.items():
+        if "p1-0" in name:
+            assert "Updated body." in text
+        elif name.startswith("p1-"):
+            # 304: same article, only scraped_at moves forward
+            assert text != before[name]
+            assert text.split("---", 2)[2] == before[name].split("---", 2)[2]
+        else:
+            assert text == before[name]
+
+
+class FakePage:
+    """Playwright page stand-in: "renders" a URL as the test's `rendered` HTML or the server's."""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.url = None
+
+    async def goto(self, url, **kwargs):
+        self.browser.visits.append(url)
+        self.url = url
+
+    async def evaluate(self, script):
+        pass
+
+    async def wait_for_timeout(self, ms):
+        pass
+
+    async def content(self):
+        if self.url in self.browser.rendered:
+            return self.browser.rendered[self.url]
+        async with scrapping.make_http_client(1) as client:
+            return (await client.get(self.url)).text
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def browser(monkeypatch):
+    class FakeBrowser:
+        rendered: dict = {}
+        visits: list = []
+
+        async def new_page(self):
+            return FakePage(self)
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr(scrapping, "LazyBrowser", FakeBrowser)
+    return FakeBrowser
+
+
+def test_client_rendered_articles_fall_back_to_the_browser(site, tmp_path, browser):
+    static = site.article("static")
+    rendered = site.article("rendered", html="<html><body><div id='app'></div></body></html>")
+    site.listing(1, [static, rendered])
+    browser.rendered[site.url(rendered)] = ARTICLE.format(title="Rendered", body="Filled in by JavaScript.")
+
+    stats = _crawl(site, tmp_path / "data")
+
+    assert stats["articles_http"] == 1
+    assert stats["articles_browser"] == 1
+    assert browser.visits == [site.url(rendered)]  # the static article never touched the browser
+    texts = "\n".join(f.read_text(encoding="utf-8") for f in (tmp_path / "data").glob("*.md"))
+    assert "Body of static." in texts
+    assert "Filled in by JavaScript." in texts
+
+
+def test_load_more_listings_are_walked_in_the_browser(site, tmp_path, browser):
+    first, more = site.article("first"), site.article("more")
+    site.listing(1, [first], extra='<div class="td-load-more-wrap"><a href="#">Load more</a></div>')
+    # What the listing looks like after the browser scrolled it
+    browser.rendered[site.url("/category/")] = LISTING.format(
+        links=f'<h3 class="td-module-title"><a href="{first}">1</a></h3>'
+        f'<h3 class="td-module-title"><a href="{more}">2</a></h3>'
+    )
+
+    stats = _crawl(site, tmp_path / "data")
+
+    assert stats["list_pages_browser"] == 1
+    assert stats["articles_saved"] == stats["articles_http"] == 2
+    assert browser.visits == [site.url("/category/")]
+
+
+def test_fetch_mode_browser_renders_every_page(site, tmp_path, browser):
+    articles = [site.article(f"a{i}") for i in range(2)]
+    site.listing(1, articles)
+
+    stats = _crawl(site, tmp_path / "data", fetch_mode="browser")
+
+    assert stats["articles_browser"] == 2
+    assert stats["list_pages_browser"] == 2  # the listing and the empty page past it
+    assert stats["articles_http"] == stats["list_pages_http"] == 0
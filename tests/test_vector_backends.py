@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import vector_backends
+from vector_backends import NumpyFlatBackend, export_numpy_index
+
+
+class FakeCollection:
+    """Just enough of a Chroma collection for export_numpy_index."""
+
+    metadata = {"embed_fingerprint": "fake|pooling=cls|dim=32|l2norm"}
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.ids = [f"doc-{i}_0" for i in range(len(matrix))]
+
+    def get(self, include, limit, offset):
+        rows = range(offset, min(offset + limit, len(self.ids)))
+        return {
+            "ids": [self.ids[i] for i in rows],
+            "documents": [f"text {i}" for i in rows],
+            "metadatas": [{"title": f"T{i}"} for i in rows],
+            "embeddings": self.matrix[list(rows)],
+        }
+
+
+def _anisotropic(n=400, dim=32, seed=0):
+    """Vectors sharing a large common direction, like real sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(size=(n, dim)) * np.linspace(1.0, 0.2, dim) + 3.0
+    return (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype("float32")
+
+
+def test_pca_export_requires_rescoring(tmp_path):
+    with pytest.raises(ValueError):
+        export_numpy_index(FakeCollection(_anisotropic()), str(tmp_path), pca_dim=8, rescore=False)
+
+
+def test_rescored_pca_export_returns_cosine_scores(tmp_path):
+    matrix = _anisotropic()
+    report = export_numpy_index(
+        FakeCollection(matrix), str(tmp_path), dtype="float16", pca_dim=8, rescore=True
+    )
+    assert report["n_chunks"] == len(matrix)
+
+    backend = NumpyFlatBackend(str(tmp_path))
+    assert backend.exact_scores
+    ids, scores, _ = backend.search(matrix[:1], 3)
+    assert ids[0][0] == "doc-0_0"
+    cosine = matrix[[int(i.split("-")[1].split("_")[0]) for i in ids[0]]] @ matrix[0]
+    np.testing.assert_allclose(1.0 - np.array(scores[0]), cosine, atol=1e-5)
+
+
+def test_low_recall_is_flagged(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_backends, "NUMPY_MIN_RECALL", 1.01)
+    report = export_numpy_index(FakeCollection(_anisotropic()), str(tmp_path), dtype="int8")
+    assert not report["recall_ok"]
+
+    backend = NumpyFlatBackend(str(tmp_path))
+    assert not backend.exact_scores  # int8 without rescoring
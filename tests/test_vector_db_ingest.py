@@ -0,0 +1,199 @@
+import pytest
+
+pytest.importorskip("chromadb")
+
+import vector_db_ingest as ingest  # noqa: E402
+
+
+class FakeCollection:
+    """
+    In-memory stand-in for a Chroma collection: rejects duplicate IDs per
+    call and, like Chroma, upsert / update keep metadata keys they do not set.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.calls = []
+
+    def _check(self, ids):
+        if len(set(ids)) != len(ids):
+            raise ValueError("DuplicateIDError")
+
+    def add(self, ids, documents, embeddings, metadatas):
+        self.calls.append("write")
+        self._check(ids)
+        for chunk_id, doc, meta in zip(ids, documents, metadatas):
+            old_meta = self.records.get(chunk_id, ("", {}))[1]
+            self.records[chunk_id] = (doc, {**old_meta, **meta})
+
+    upsert = add
+
+    def get(self, ids, include):
+        self.calls.append("get")
+        found = [i for i in ids if i in self.records]
+        return {
+            "ids": found,
+            "documents": [self.records[i][0] for i in found],
+            "embeddings": [[0.0] for _ in found],
+        }
+
+    def update(self, ids, metadatas):
+        for chunk_id, meta in zip(ids, metadatas):
+            doc, old_meta = self.records[chunk_id]
+            self.records[chunk_id] = (doc, {**old_meta, **meta})
+
+    def delete(self, ids):
+        self.calls.append("delete")
+        for chunk_id in ids:
+            self.records.pop(chunk_id, None)
+
+
+@pytest.fixture(autouse=True)
+def _no_model(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest, "embed_documents", lambda texts, batch_size=0: [[0.0]] * len(texts))
+    monkeypatch.setattr(ingest, "iter_chunked", lambda items, get_text: ((p, [get_text(p)]) for p in items))
+    monkeypatch.setattr(ingest, "chunk_texts", lambda texts: [[t] for t in texts])
+    monkeypatch.setattr(ingest, "write_index_version", lambda: None)
+    monkeypatch.setattr(ingest, "DEDUP_ENABLED", False)
+
+
+def _pub(path, title, content):
+    return {"title": title, "path": path, "content": content, "source_url": None, "scraped_at": None}
+
+
+def test_same_title_publications_get_distinct_chunk_ids(tmp_path):
+    pubs = [
+        _pub("data/iqama-renewal.md", "Iqama Renewal", "first article"),
+        _pub("data/iqama-renewal-2.md", "Iqama Renewal", "second article"),
+        _pub("data/urdu-1.md", "اقامہ کی تجدید", "urdu one"),
+        _pub("data/urdu-2.md", "اقامہ کی تجدید", "urdu two"),
+    ]
+    collection = FakeCollection()
+    manifest_path = str(tmp_path / "manifest.json")
+
+    stats = ingest.sync_publications(collection, pubs, manifest_path=manifest_path)
+
+    assert stats["added"] == 4
+    assert sorted(doc for doc, _ in collection.records.values()) == sorted(p["content"] for p in pubs)
+    manifest = ingest.load_manifest(manifest_path)
+    ingest.check_manifest(manifest)
+
+    # Deleting one of the same-title files leaves the other's chunks alone
+    stats = ingest.sync_publications(collection, pubs[1:], manifest_path=manifest_path)
+    assert stats["deleted"] == 1
+    assert sorted(doc for doc, _ in collection.records.values()) == sorted(p["content"] for p in pubs[1:])
+
+
+def test_bumped_scraped_at_does_not_re_embed(tmp_path):
+    pub = _pub("data/iqama-renewal.md", "Iqama Renewal", "article")
+    collection = FakeCollection()
+    manifest_path = str(tmp_path / "manifest.json")
+    ingest.sync_publications(collection, [dict(pub, scraped_at="2026-01-01T00:00:00+00:00")], manifest_path)
+
+    # What the crawler writes after a 304
+    stats = ingest.sync_publications(
+        collection, [dict(pub, scraped_at="2026-02-01T00:00:00+00:00")], manifest_path
+    )
+    assert stats["skipped"] == 1
+    assert stats["updated"] == 0
+
+
+def test_chunk_writer_drops_duplicate_ids_within_a_batch():
+    collection = FakeCollection()
+    writer = ingest.ChunkWriter(collection, upsert=True)
+    writer.add(["a_0", "b_0"], ["old a", "b"], [{}, {}])
+    writer.add(["a_0"], ["new a"], [{}])
+    writer.flush()
+
+    assert writer.n_written == 2
+    assert collection.records["a_0"][0] == "new a"
+
+
+def test_check_manifest_rejects_shared_chunk_ids():
+    with pytest.raises(RuntimeError):
+        ingest.check_manifest({
+            "a": {"hash": "1", "chunk_ids": ["x_0", "x_1"]},
+            "b": {"hash": "2", "chunk_ids": ["x_0"]},
+        })
+
+
+def test_streaming_indexer_stages_off_the_event_loop(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+
+    stage_threads, saves = [], []
+    stage = ingest._stage_publication
+
+    def recording_stage(*args, **kwargs):
+        stage_threads.append(threading.current_thread())
+        return stage(*args, **kwargs)
+
+    save = ingest.save_manifest
+    monkeypatch.setattr(ingest, "_stage_publication", recording_stage)
+    monkeypatch.setattr(ingest, "save_manifest", lambda m, p: saves.append(len(m)) or save(m, p))
+
+    collection = FakeCollection()
+    indexer = ingest.StreamingIndexer(collection, manifest_path=str(tmp_path / "manifest.json"))
+
+    async def main():
+        queue = asyncio.Queue()
+        for i in range(3):
+            queue.put_nowait({"title": f"Post {i}", "path": f"data/post-{i}.md", "body": f"body {i}"})
+        queue.put_nowait(None)
+        return await indexer.run(queue), threading.current_thread()
+
+    stats, loop_thread = asyncio.run(main())
+
+    assert stats["publications"] == 3
+    assert len(collection.records) == 3
+    assert stage_threads and loop_thread not in stage_threads
+    # One manifest write per flushed batch, not per article
+    assert saves == [3]
+
+
+@pytest.fixture
+def dedup_on(monkeypatch, tmp_path):
+    from functools import partial
+
+    monkeypatch.setattr(ingest, "DEDUP_ENABLED", True)
+    monkeypatch.setattr(
+        ingest, "ChunkDeduplicator", partial(ingest.ChunkDeduplicator, index_path=str(tmp_path / "dedup.json"))
+    )
+
+
+BOILERPLATE = "Visit the nearest passport office with your original documents and the fee receipt to renew"
+
+
+def test_promotions_are_batched_on_flush(tmp_path, dedup_on):
+    pubs = [_pub(f"data/post-{i}.md", f"Post {i}", BOILERPLATE) for i in range(4)]
+    collection = FakeCollection()
+    manifest_path = str(tmp_path / "manifest.json")
+    ingest.sync_publications(collection, pubs, manifest_path=manifest_path)
+
+    assert len(collection.records) == 1
+    (stored_id,) = collection.records
+    assert collection.records[stored_id][1]["n_sources"] == 4
+
+    # The stored chunk moves twice (post-0 -> post-1 -> post-2) but is copied once
+    collection.calls.clear()
+    ingest.sync_publications(collection, pubs[2:], manifest_path=manifest_path)
+
+    assert collection.calls == ["get", "delete", "write"]
+    (new_id,) = collection.records
+    assert new_id == f"{ingest.publication_key(pubs[2])}_0"
+    assert collection.records[new_id][0] == BOILERPLATE
+    assert collection.records[new_id][1]["n_sources"] == 2
+
+
+def test_disabling_dedup_strips_source_lists(tmp_path, dedup_on, monkeypatch):
+    pubs = [_pub(f"data/post-{i}.md", f"Post {i}", BOILERPLATE) for i in range(2)]
+    collection = FakeCollection()
+    manifest_path = str(tmp_path / "manifest.json")
+    ingest.sync_publications(collection, pubs, manifest_path=manifest_path)
+    assert any("sources" in meta for _, meta in collection.records.values())
+
+    monkeypatch.setattr(ingest, "DEDUP_ENABLED", False)
+    ingest.sync_publications(collection, pubs, manifest_path=manifest_path)
+
+    assert len(collection.records) == 2
+    assert not any("sources" in meta or "n_sources" in meta for _, meta in collection.records.values())
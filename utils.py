@@ -1,8 +1,11 @@
+import multiprocessing
 import os
 import random
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator
 import numpy as np
-import torch as T
-from config import DATA_DIR
+from config import DATA_DIR, INDEX_VERSION_PATH
 from pathlib import Path
 import yaml
 import re
@@ -76,6 +79,16 @@ def load_publication(
     if not publication_fpath.exists():
         raise FileNotFoundError(f"Publication file not found: {publication_fpath}")
 
+    return _load_publication_file(str(publication_fpath))
+
+
+def _load_publication_file(publication_fpath: str) -> dict:
+    """
+    Read, parse and clean a single publication markdown file.
+    Top-level so it can run in a worker process.
+    """
+    publication_fpath = Path(publication_fpath)
+
     # Read and parse the file
     try:
         raw_text = publication_fpath.read_text(encoding="utf-8")
@@ -96,7 +109,7 @@ def load_publication(
             frontmatter = {}
             body = raw_text
 
-    title = frontmatter.get("title") or publication_external_id
+    title = frontmatter.get("title") or publication_fpath.stem
     source_url = frontmatter.get("source_url")
     scraped_at = frontmatter.get("scraped_at")
 
@@ -111,6 +124,56 @@ def load_publication(
     }
 
 
+def iter_publications(
+    publication_dir: str = DATA_DIR,
+    max_workers: int | None = None,
+) -> Iterator[dict]:
+    """
+    Stream publications from the given directory as they are parsed.
+
+    Files are parsed and cleaned in a process pool and yielded in completion
+    order (not directory order). At most a few files per worker are in
+    flight at once, so memory stays bounded regardless of corpus size.
+
+    Args:
+        publication_dir (str): Directory containing the .md files.
+        max_workers (int | None): Worker processes; None uses the CPU count,
+            1 parses in the current process.
+
+    Yields:
+        dict: publication dicts as returned by load_publication.
+    """
+    paths = [
+        os.path.join(publication_dir, filename)
+        for filename in sorted(os.listdir(publication_dir))
+        if filename.endswith(".md")
+    ]
+
+    if max_workers == 1 or len(paths) < 2:
+        for path in paths:
+            yield _load_publication_file(path)
+        return
+
+    max_workers = max_workers or os.cpu_count() or 1
+    remaining = iter(paths)
+
+    # spawn, not fork: the caller may already hold torch / tokenizers thread
+    # pools (e.g. the shared encoder), which deadlock in forked children
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as pool:
+        pending = {
+            pool.submit(_load_publication_file, path)
+            for _, path in zip(range(max_workers * 4), remaining)
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                next_path = next(remaining, None)
+                if next_path is not None:
+                    pending.add(pool.submit(_load_publication_file, next_path))
+                yield future.result()
+
+
 def load_all_publications(publication_dir: str = DATA_DIR) -> list[dict]:
     """
     Loads all publication markdown files in the given directory and returns
@@ -123,18 +186,30 @@ def load_all_publications(publication_dir: str = DATA_DIR) -> list[dict]:
         - path
         - content
     """
-    publications: list[dict] = []
-    for filename in os.listdir(publication_dir):
-        if not filename.endswith(".md"):
-            continue
+    return list(iter_publications(publication_dir))
 
-        external_id = filename[:-3]  # strip .md
-        pub = load_publication(external_id)
-        publications.append(pub)
-    return publications
+
+def read_index_version(version_path: str = INDEX_VERSION_PATH) -> str:
+    """
+    Return the current vector index version, or "0" if ingestion never wrote one.
+    """
+    try:
+        return Path(version_path).read_text(encoding="utf-8").strip() or "0"
+    except FileNotFoundError:
+        return "0"
+
+
+def write_index_version(version_path: str = INDEX_VERSION_PATH) -> str:
+    """
+    Stamp the vector index with a new random version (call after any change).
+    """
+    version = uuid.uuid4().hex
+    os.makedirs(os.path.dirname(version_path) or ".", exist_ok=True)
+    Path(version_path).write_text(version, encoding="utf-8")
+    return version
 
 
-def set_seeds(seed_value: int) -> None:
+def set_seeds(seed_value: int, seed_torch: bool = True) -> None:
     """
     Set the random seeds for Python, NumPy, etc. to ensure
     reproducibility of results.
@@ -142,6 +217,8 @@ def set_seeds(seed_value: int) -> None:
     Args:
         seed_value (int): The seed value to use for random
             number generation. Must be an integer.
+        seed_torch (bool): Also seed torch. Set to False where no torch
+            model runs, so torch is not imported at all.
 
     Returns:
         None
@@ -150,10 +227,13 @@ def set_seeds(seed_value: int) -> None:
         os.environ["PYTHONHASHSEED"] = str(seed_value)
         random.seed(seed_value)
         np.random.seed(seed_value)
-        T.manual_seed(seed_value)
-        T.cuda.manual_seed(seed_value)
-        T.cuda.manual_seed_all(seed_value)  # For multi-GPU setups
-        T.backends.cudnn.deterministic = True
-        T.backends.cudnn.benchmark = False
+        if seed_torch:
+            import torch as T  # imported lazily: torch is slow to import
+
+            T.manual_seed(seed_value)
+            T.cuda.manual_seed(seed_value)
+            T.cuda.manual_seed_all(seed_value)  # For multi-GPU setups
+            T.backends.cudnn.deterministic = True
+            T.backends.cudnn.benchmark = False
     else:
         raise ValueError(f"Invalid seed value: {seed_value}. Cannot set seeds.")
@@ -0,0 +1,554 @@
+# vector_backends.py
+"""
+Vector search backends behind one small interface.
+
+Every backend implements:
+    search(embeddings, k) -> (ids, scores, metadatas)
+        one list per query embedding; scores are cosine *distances*
+        (1 - similarity, like Chroma's "cosine" space) and each metadata
+        dict carries the chunk text under "document".
+    query(query_embeddings, n_results, include_embeddings=False)
+        -> Chroma-style result dict so rag_core.retrieve works unchanged
+        with any backend; with include_embeddings, "embeddings" holds one
+        (n_results, dim) array of the hits' stored vectors per query
+        (None where the backend cannot return them).
+    count() -> number of stored chunks
+    fingerprint() -> encoder fingerprint recorded at ingestion (or None)
+"""
+import json
+import os
+
+import numpy as np
+
+from config import (
+    CHROMA_COLLECTION_NAME,
+    CHUNKS_PATH,
+    FAISS_EF_CONSTRUCTION,
+    FAISS_EF_SEARCH,
+    FAISS_HNSW_M,
+    FAISS_INDEX_TYPE,
+    FAISS_NLIST,
+    FAISS_NPROBE,
+    INDEX_PATH,
+    META_PATH,
+    NUMPY_INDEX_DIR,
+    NUMPY_INDEX_DTYPE,
+    NUMPY_INDEX_PCA_DIM,
+    NUMPY_INDEX_RESCORE,
+    NUMPY_MIN_RECALL,
+    NUMPY_RESCORE_CANDIDATES,
+    VECTOR_BACKEND,
+    VECTOR_DB_DIR,
+)
+
+# Rows scored per block in the flat index (bounds temporary float32 memory)
+_SEARCH_BLOCK_ROWS = 16384
+
+
+class VectorBackend:
+    """Base class: subclasses implement search() and count()."""
+
+    def search(self, embeddings, k: int):
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def fingerprint(self) -> str | None:
+        return None
+
+    def embeddings_for(self, ids: list[str]) -> np.ndarray | None:
+        """Stored vectors of `ids` (L2-normalized rows), or None if unavailable."""
+        return None
+
+    def query(self, query_embeddings, n_results: int = 5, include_embeddings: bool = False) -> dict:
+        ids, scores, metadatas = self.search(query_embeddings, n_results)
+        documents = [[m.get("document", "") for m in metas] for metas in metadatas]
+        stripped = [
+            [{key: v for key, v in m.items() if key != "document"} for m in metas]
+            for metas in metadatas
+        ]
+        results = {
+            "ids": ids,
+            "documents": documents,
+            "metadatas": stripped,
+            "distances": scores,
+        }
+        if include_embeddings:
+            results["embeddings"] = [self.embeddings_for(row_ids) for row_ids in ids]
+        return results
+
+
+class ChromaBackend(VectorBackend):
+    """Chroma collection (HNSW + SQLite), the default backend."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    @classmethod
+    def load(
+        cls,
+        persist_directory: str = VECTOR_DB_DIR,
+        collection_name: str = CHROMA_COLLECTION_NAME,
+    ) -> "ChromaBackend":
+        import chromadb
+
+        client = chromadb.PersistentClient(path=persist_directory)
+        return cls(client.get_collection(name=collection_name))
+
+    def query(self, query_embeddings, n_results: int = 5, include_embeddings: bool = False) -> dict:
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        results = self.collection.query(
+            query_embeddings=np.asarray(query_embeddings, dtype="float32"),
+            n_results=n_results,
+            include=include,
+        )
+        if include_embeddings:
+            results["embeddings"] = [
+                np.asarray(vectors, dtype="float32") for vectors in results["embeddings"]
+            ]
+        return results
+
+    def search(self, embeddings, k: int):
+        results = self.query(embeddings, n_results=k)
+        metadatas = [
+            [{**(meta or {}), "document": doc} for meta, doc in zip(metas, docs)]
+            for metas, docs in zip(results["metadatas"], results["documents"])
+        ]
+        return results["ids"], results["distances"], metadatas
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def fingerprint(self) -> str | None:
+        return (self.collection.metadata or {}).get("embed_fingerprint")
+
+
+class NumpyFlatBackend(VectorBackend):
+    """
+    Exact (brute-force) cosine search over a memory-mapped embedding matrix.
+
+    Files in `index_dir`:
+        embeddings.npy      (n, dim) stored vectors: float32, float16 or int8 codes
+        records.json        {"ids": [...], "documents": [...], "metadatas": [...]}
+        transform.npz       optional: PCA projection and/or int8 scales that
+                            queries must go through (see compress_embeddings)
+        embeddings_f32.npy  optional: full float32 vectors for exact rescoring
+                            of the top candidates
+    """
+
+    def __init__(
+        self,
+        index_dir: str = NUMPY_INDEX_DIR,
+        rescore_candidates: int = NUMPY_RESCORE_CANDIDATES,
+    ):
+        self.index_dir = index_dir
+        self.rescore_candidates = rescore_candidates
+        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        with open(os.path.join(index_dir, "records.json"), encoding="utf-8") as f:
+            records = json.load(f)
+        self.ids = records["ids"]
+        self.documents = records["documents"]
+        self.metadatas = records["metadatas"]
+        self._fingerprint = records.get("embed_fingerprint")
+
+        transform_path = os.path.join(index_dir, "transform.npz")
+        self.transform = dict(np.load(transform_path)) if os.path.exists(transform_path) else {}
+
+        exact_path = os.path.join(index_dir, "embeddings_f32.npy")
+        self.exact = np.load(exact_path, mmap_mode="r") if os.path.exists(exact_path) else None
+        # Without rescoring, PCA / int8 scores are similarities in the
+        # compressed space, not the cosine the rest of the app assumes
+        self.exact_scores = self.exact is not None or not self.transform
+        if "pca_components" in self.transform and self.exact is None:
+            print(
+                f"Warning: NumPy index {index_dir} uses PCA without float32 rescoring; "
+                "similarity scores are not cosine. Re-export with --rescore."
+            )
+        self._rows = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+
+    @classmethod
+    def load(cls, index_dir: str = NUMPY_INDEX_DIR) -> "NumpyFlatBackend":
+        return cls(index_dir)
+
+    def similarities(self, embeddings) -> np.ndarray:
+        """(n_queries, n_chunks) cosine similarities, scored block by block."""
+        q = apply_query_transform(np.asarray(embeddings, dtype="float32"), self.transform)
+        sims = np.empty((q.shape[0], self.embeddings.shape[0]), dtype="float32")
+        for start in range(0, self.embeddings.shape[0], _SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.embeddings[start:start + _SEARCH_BLOCK_ROWS], dtype="float32")
+            sims[:, start:start + block.shape[0]] = q @ block.T
+        return sims
+
+    def search(self, embeddings, k: int):
+        embeddings = np.asarray(embeddings, dtype="float32").reshape(len(embeddings), -1)
+        sims = self.similarities(embeddings)
+        n_candidates = k * self.rescore_candidates if self.exact is not None else k
+        n_candidates = min(n_candidates, sims.shape[1])
+        k = min(k, sims.shape[1])
+
+        all_ids, all_scores, all_metas = [], [], []
+        for q, row in zip(embeddings, sims):
+            top = _top_k(row, n_candidates)
+            if self.exact is not None and len(top):
+                # Exact float32 rescoring of the approximate candidates
+                exact_sims = np.asarray(self.exact[np.sort(top)], dtype="float32") @ q
+                order = np.argsort(-exact_sims)[:k]
+                top, top_sims = np.sort(top)[order], exact_sims[order]
+            else:
+                top = top[:k]
+                top_sims = row[top]
+            all_ids.append([self.ids[i] for i in top])
+            all_scores.append([float(1.0 - sim) for sim in top_sims])
+            all_metas.append(
+                [{**self.metadatas[i], "document": self.documents[i]} for i in top]
+            )
+        return all_ids, all_scores, all_metas
+
+    def embeddings_for(self, ids: list[str]) -> np.ndarray | None:
+        rows = [self._rows[chunk_id] for chunk_id in ids]
+        if self.exact is not None:
+            return np.asarray(self.exact[rows], dtype="float32")
+        if "pca_components" in self.transform:
+            return None  # only projected vectors are stored
+        # Compressed rows: undo the int8 scaling (float16 is used as is)
+        vectors = np.asarray(self.embeddings[rows], dtype="float32")
+        if "int8_scale" in self.transform:
+            vectors = vectors * self.transform["int8_scale"]
+        return _normalize(vectors)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def fingerprint(self) -> str | None:
+        return self._fingerprint
+
+
+def _top_k(row: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest values of `row`, best first."""
+    if k <= 0:
+        return np.array([], dtype=int)
+    top = np.argpartition(-row, k - 1)[:k]
+    return top[np.argsort(-row[top])]
+
+
+def compress_embeddings(
+    matrix: np.ndarray,
+    dtype: str = NUMPY_INDEX_DTYPE,
+    pca_dim: int = NUMPY_INDEX_PCA_DIM,
+) -> tuple[np.ndarray, dict]:
+    """
+    Compress L2-normalized float32 vectors for storage.
+
+    pca_dim: if > 0 and smaller than the input dim, project onto the top
+        principal components fitted on `matrix` and re-normalize.
+    dtype: "float32", "float16" or "int8" (symmetric per-dimension scalar
+        quantization; scores are computed against scale-multiplied queries).
+
+    Returns:
+        (stored matrix, transform dict to save and apply to queries)
+    """
+    transform: dict = {}
+    vectors = matrix
+
+    if pca_dim and 0 < pca_dim < matrix.shape[1]:
+        mean = matrix.mean(axis=0)
+        # Rows of vt are principal directions, strongest first
+        _, _, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+        components = vt[:pca_dim].astype("float32")
+        transform["pca_mean"] = mean.astype("float32")
+        transform["pca_components"] = components
+        vectors = _normalize((matrix - mean) @ components.T)
+
+    if dtype == "int8":
+        scale = np.abs(vectors).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        transform["int8_scale"] = scale.astype("float32")
+        stored = np.clip(np.round(vectors / scale), -127, 127).astype("int8")
+    else:
+        stored = vectors.astype(dtype)
+
+    return stored, transform
+
+
+def apply_query_transform(q: np.ndarray, transform: dict) -> np.ndarray:
+    """Map float32 query vectors into the stored (compressed) space."""
+    if "pca_components" in transform:
+        q = _normalize((q - transform["pca_mean"]) @ transform["pca_components"].T)
+    if "int8_scale" in transform:
+        # <q, code * scale> == <q * scale, code>
+        q = q * transform["int8_scale"]
+    return q.astype("float32", copy=False)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+
+def measure_recall(
+    backend: "NumpyFlatBackend",
+    exact_matrix: np.ndarray,
+    k: int = 5,
+    n_queries: int = 200,
+    seed: int = 42,
+) -> float:
+    """
+    recall@k of `backend` against exact float32 search, using a random sample
+    of stored chunk vectors (slightly perturbed) as queries.
+    """
+    if len(exact_matrix) == 0:
+        return 1.0
+    rng = np.random.default_rng(seed)
+    idx = rng.choice(len(exact_matrix), size=min(n_queries, len(exact_matrix)), replace=False)
+    queries = exact_matrix[idx] + rng.normal(scale=0.01, size=(len(idx), exact_matrix.shape[1]))
+    queries = _normalize(queries).astype("float32")
+
+    truth = [set(_top_k(row, k)) for row in queries @ exact_matrix.T]
+    found, _, _ = backend.search(queries, k)
+    id_to_row = {chunk_id: i for i, chunk_id in enumerate(backend.ids)}
+    hits = sum(len(t & {id_to_row[c] for c in f}) for t, f in zip(truth, found))
+    return hits / sum(len(t) for t in truth)
+
+
+class FaissBackend(VectorBackend):
+    """
+    FAISS inner-product index over L2-normalized embeddings (flat, IVF or
+    HNSW, see build_faiss_index). Query-time recall/speed knobs: `nprobe`
+    for IVF, `ef_search` for HNSW.
+
+    Files:
+        INDEX_PATH   serialized FAISS index
+        CHUNKS_PATH  {"ids": [...], "documents": [...]}
+        META_PATH    [metadata dict per chunk]
+    """
+
+    def __init__(
+        self,
+        index_path: str = INDEX_PATH,
+        chunks_path: str = CHUNKS_PATH,
+        meta_path: str = META_PATH,
+        nprobe: int = FAISS_NPROBE,
+        ef_search: int = FAISS_EF_SEARCH,
+    ):
+        import faiss
+
+        self.index = faiss.read_index(index_path)
+        with open(chunks_path, encoding="utf-8") as f:
+            chunks = json.load(f)
+        with open(meta_path, encoding="utf-8") as f:
+            self.metadatas = json.load(f)
+        self.ids = chunks["ids"]
+        self.documents = chunks["documents"]
+        self._fingerprint = chunks.get("embed_fingerprint")
+        self._rows = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        self.set_search_params(nprobe=nprobe, ef_search=ef_search)
+
+    @classmethod
+    def load(cls) -> "FaissBackend":
+        return cls()
+
+    def set_search_params(self, nprobe: int | None = None, ef_search: int | None = None) -> None:
+        """Tune query-time search: IVF lists probed / HNSW candidate list size."""
+        import faiss
+
+        if nprobe is not None:
+            try:
+                faiss.extract_index_ivf(self.index).nprobe = nprobe
+            except RuntimeError:
+                pass  # not an IVF index
+        if ef_search is not None and hasattr(self.index, "hnsw"):
+            self.index.hnsw.efSearch = ef_search
+
+    def search(self, embeddings, k: int):
+        q = np.ascontiguousarray(np.asarray(embeddings, dtype="float32").reshape(-1, self.index.d))
+        sims, labels = self.index.search(q, k)
+
+        all_ids, all_scores, all_metas = [], [], []
+        for row_sims, row_labels in zip(sims, labels):
+            hits = [(int(i), float(sim)) for i, sim in zip(row_labels, row_sims) if i >= 0]
+            all_ids.append([self.ids[i] for i, _ in hits])
+            all_scores.append([1.0 - sim for _, sim in hits])
+            all_metas.append(
+                [{**self.metadatas[i], "document": self.documents[i]} for i, _ in hits]
+            )
+        return all_ids, all_scores, all_metas
+
+    def embeddings_for(self, ids: list[str]) -> np.ndarray | None:
+        rows = np.array([self._rows[chunk_id] for chunk_id in ids], dtype="int64")
+        try:
+            return np.asarray(self.index.reconstruct_batch(rows), dtype="float32")
+        except RuntimeError:
+            return None  # IVF index without a direct map
+
+    def count(self) -> int:
+        return int(self.index.ntotal)
+
+    def fingerprint(self) -> str | None:
+        return self._fingerprint
+
+
+def _read_collection(collection, page_size: int = 5000):
+    """
+    Read every chunk of a Chroma collection.
+
+    Returns:
+        (ids, documents, metadatas, embeddings) with embeddings as an
+        L2-normalized float32 matrix.
+    """
+    ids, documents, metadatas, vectors = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=page_size,
+            offset=offset,
+        )
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(m or {} for m in page["metadatas"])
+        vectors.append(np.asarray(page["embeddings"], dtype="float32"))
+        offset += len(page["ids"])
+
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype="float32")
+    if len(matrix):
+        matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+    return ids, documents, metadatas, matrix
+
+
+def export_numpy_index(
+    collection,
+    index_dir: str = NUMPY_INDEX_DIR,
+    dtype: str = NUMPY_INDEX_DTYPE,
+    pca_dim: int = NUMPY_INDEX_PCA_DIM,
+    rescore: bool = NUMPY_INDEX_RESCORE,
+    recall_k: int = 5,
+) -> dict:
+    """
+    Export all chunks (embeddings, documents, metadata) from a Chroma
+    collection into a NumpyFlatBackend index, optionally compressed
+    (see compress_embeddings) and with float32 copies for rescoring.
+
+    Returns:
+        dict report: n_chunks, index_bytes (vectors held in RAM at query
+        time), float32_bytes (uncompressed equivalent), recall@k of the
+        exported index against exact float32 search and recall_ok
+        (recall@k >= NUMPY_MIN_RECALL).
+    Raises:
+        ValueError: if pca_dim is set without rescore
+    """
+    if pca_dim and not rescore:
+        # PCA scores live in a mean-centered projected space: only the
+        # rescored float32 similarities are cosine (and usable as scores)
+        raise ValueError("PCA compression requires rescore=True (--rescore)")
+
+    ids, documents, metadatas, matrix = _read_collection(collection)
+    stored, transform = compress_embeddings(matrix, dtype=dtype, pca_dim=pca_dim)
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "embeddings.npy"), stored)
+    transform_path = os.path.join(index_dir, "transform.npz")
+    exact_path = os.path.join(index_dir, "embeddings_f32.npy")
+    for path in (transform_path, exact_path):
+        if os.path.exists(path):
+            os.remove(path)  # stale from a previous export
+    if transform:
+        np.savez(transform_path, **transform)
+    if rescore:
+        np.save(exact_path, matrix)
+    with open(os.path.join(index_dir, "records.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "ids": ids,
+                "documents": documents,
+                "metadatas": metadatas,
+                "embed_fingerprint": (collection.metadata or {}).get("embed_fingerprint"),
+            },
+            f,
+            ensure_ascii=False,
+        )
+
+    backend = NumpyFlatBackend(index_dir)
+    recall = measure_recall(backend, matrix, k=recall_k)
+    return {
+        "n_chunks": len(ids),
+        "index_bytes": int(stored.nbytes),
+        "float32_bytes": int(matrix.nbytes),
+        f"recall@{recall_k}": recall,
+        "recall_ok": recall >= NUMPY_MIN_RECALL,
+    }
+
+
+def build_faiss_index(
+    collection,
+    index_type: str = FAISS_INDEX_TYPE,
+    nlist: int = FAISS_NLIST,
+    hnsw_m: int = FAISS_HNSW_M,
+    ef_construction: int = FAISS_EF_CONSTRUCTION,
+    index_path: str = INDEX_PATH,
+    chunks_path: str = CHUNKS_PATH,
+    meta_path: str = META_PATH,
+) -> int:
+    """
+    Build and persist a FAISS index from the chunks in a Chroma collection.
+
+    index_type:
+        "flat" - exact inner product (IndexFlatIP)
+        "ivf"  - inverted lists (IndexIVFFlat), trained here on the corpus
+        "hnsw" - graph index (IndexHNSWFlat), no training needed
+
+    Returns the number of indexed chunks.
+    """
+    import faiss
+
+    ids, documents, metadatas, matrix = _read_collection(collection)
+    if not ids:
+        raise ValueError("Collection is empty; nothing to index")
+    dim = matrix.shape[1]
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif index_type == "ivf":
+        # FAISS wants roughly >= 39 training points per list
+        nlist = max(1, min(nlist, len(ids) // 39))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(matrix)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+    index.add(matrix)
+
+    for path in (index_path, chunks_path, meta_path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    faiss.write_index(index, index_path)
+    with open(chunks_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "ids": ids,
+                "documents": documents,
+                "embed_fingerprint": (collection.metadata or {}).get("embed_fingerprint"),
+            },
+            f,
+            ensure_ascii=False,
+        )
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(metadatas, f, ensure_ascii=False)
+    return len(ids)
+
+
+def load_backend(name: str = VECTOR_BACKEND) -> VectorBackend:
+    """Instantiate the configured backend ("chroma", "numpy" or "faiss")."""
+    if name == "chroma":
+        return ChromaBackend.load()
+    if name == "numpy":
+        return NumpyFlatBackend.load()
+    if name == "faiss":
+        return FaissBackend.load()
+    raise ValueError(f"Unknown vector backend: {name}")
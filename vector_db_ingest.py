@@ -1,13 +1,34 @@
+import argparse
+import asyncio
+import hashlib
+import json
 import os
-import torch
 import chromadb
 import shutil
-from config import VECTOR_DB_DIR, EMBED_MODEL_NAME
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from utils import load_all_publications, slugify
-
-_embedding_model = None
+import threading
+import time
+from pathlib import Path
+from typing import Iterable
+from config import (
+    VECTOR_DB_DIR,
+    INGEST_MANIFEST_PATH,
+    EMBED_BATCH_SIZE,
+    CHROMA_WRITE_BATCH_SIZE,
+    DEDUP_ENABLED,
+    DEDUP_INDEX_PATH,
+    DEDUP_THRESHOLD,
+    FAISS_INDEX_TYPE,
+    NUMPY_INDEX_DTYPE,
+    NUMPY_INDEX_PCA_DIM,
+    NUMPY_INDEX_RESCORE,
+    NUMPY_MIN_RECALL,
+)
+from chunking import chunk_texts, chunker_signature, iter_chunked
+from dedup import ChunkDeduplicator
+from embedding_cache import cached_encode, get_embedding_cache
+from encoders import encoder_fingerprint, get_shared_encoder
+from utils import _clean_markdown_body, iter_publications, slugify, write_index_version
+from vector_backends import build_faiss_index, export_numpy_index
 
 
 def initialize_db(
@@ -24,6 +45,8 @@ def initialize_db(
         delete_existing (bool): Whether to delete the existing database if it exists. Defaults to False
     Returns:
         chromadb.Collection: The ChromaDB collection instance
+    Raises:
+        RuntimeError: If an existing collection was built with a different encoder
     """
     if os.path.exists(persist_directory) and delete_existing:
         shutil.rmtree(persist_directory)
@@ -45,15 +68,37 @@ def initialize_db(
             metadata={
                 "hnsw:space": "cosine",
                 "hnsw:batch_size": 10000,
+                "embed_fingerprint": encoder_fingerprint(get_shared_encoder()),
             },  # Use cosine distance for semantic search
         )
         print(f"Created new collection: {collection_name}")
+    else:
+        _check_collection_fingerprint(collection)
 
     print(f"ChromaDB initialized with persistent storage at: {persist_directory}")
 
     return collection
 
 
+def _check_collection_fingerprint(collection) -> None:
+    """
+    Refuse to add vectors from a different encoder to an existing collection;
+    stamp collections created before fingerprints were recorded.
+    """
+    current = encoder_fingerprint(get_shared_encoder())
+    metadata = dict(collection.metadata or {})
+    stored = metadata.get("embed_fingerprint")
+    if stored is None:
+        # hnsw:* keys cannot be passed to modify(); they live in the collection config
+        metadata = {k: v for k, v in metadata.items() if not k.startswith("hnsw:")}
+        collection.modify(metadata={**metadata, "embed_fingerprint": current})
+    elif stored != current:
+        raise RuntimeError(
+            f"Collection was built with encoder '{stored}' but the current encoder "
+            f"is '{current}'. Re-run with --full to rebuild it."
+        )
+
+
 def get_db_collection(
     persist_directory: str = VECTOR_DB_DIR,
     collection_name: str = "publications",
@@ -76,16 +121,22 @@ def get_db_collection(
 def chunk_publication(
     content: str,
     title: str,
-    chunk_size: int = 1000,
-    chunk_overlap: int = 200,
+    chunks: list[str] | None = None,
+    key: str | None = None,
 ) -> list[dict]:
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-    )
-    chunks = text_splitter.split_text(content)
+    """
+    Chunk a publication with the configured CHUNKER (see chunking.py).
+    `chunks` may be passed in when the text was already split, e.g. by the
+    worker pool in sync_publications.
+
+    Chunk IDs are "{key}_{i}". Pass the publication_key so IDs are unique
+    per file; without it the title slug is used, which collides for equal
+    titles and for titles with no Latin characters (e.g. Urdu).
+    """
+    if chunks is None:
+        chunks = chunk_texts([content])[0]
 
-    title_slug = slugify(title)
+    id_prefix = key if key is not None else slugify(title)
 
     chunk_data = []
     for i, chunk in enumerate(chunks):
@@ -93,92 +144,586 @@ def chunk_publication(
             {
                 "content": chunk,
                 "title": title,
-                "chunk_id": f"{title_slug}_{i}",
+                "chunk_id": f"{id_prefix}_{i}",
             }
         )
 
     return chunk_data
 
-# Global embedding model instance (lazy-loaded)
-from langchain_huggingface import HuggingFaceEmbeddings
-import torch
-from config import EMBED_MODEL_NAME
+def embed_documents(
+    texts: list[str],
+    batch_size: int = EMBED_BATCH_SIZE,
+) -> list[list[float]]:
+    """
+    Embed texts, re-using vectors from the persistent embedding cache so
+    unchanged chunk text is never re-encoded.
+    """
+    encoder = get_shared_encoder()
+    embeddings = cached_encode(
+        texts,
+        # The encoder length-sorts each batch itself to cut padding
+        lambda miss_texts: encoder.encode(
+            miss_texts, normalize_embeddings=True, batch_size=batch_size
+        ),
+        get_embedding_cache(encoder),
+    )
+    return embeddings.tolist()
 
-_embedding_model = None
 
-def get_embedding_model() -> HuggingFaceEmbeddings:
-    global _embedding_model
-    if _embedding_model is None:
-        device = (
-            "cuda"
-            if torch.cuda.is_available()
-            else "mps" if torch.backends.mps.is_available() else "cpu"
+class ChunkWriter:
+    """
+    Buffers chunk records across publications, embeds them in large batches
+    and writes them to Chroma in bulk add/upsert calls.
+
+    Deletes and moves of stored records (see delete() / move()) are queued
+    too and applied on flush, right before the writes, so the index never
+    misses a chunk for longer than one flush.
+    """
+
+    def __init__(
+        self,
+        collection,
+        upsert: bool = False,
+        embed_batch_size: int = EMBED_BATCH_SIZE,
+        write_batch_size: int = CHROMA_WRITE_BATCH_SIZE,
+    ):
+        self.collection = collection
+        self.upsert = upsert
+        self.embed_batch_size = embed_batch_size
+        self.write_batch_size = write_batch_size
+        self._ids: list[str] = []
+        self._documents: list[str] = []
+        self._metadatas: list[dict] = []
+        # new id -> (id the record is stored under, new metadata)
+        self._moves: dict[str, tuple[str, dict]] = {}
+        self._deletes: set[str] = set()
+        # The streaming indexer queues deletes / moves while a flush runs
+        self._lock = threading.Lock()
+        self.n_written = 0
+        self.embed_seconds = 0.0
+        self._started = time.perf_counter()
+
+    def add(self, ids: list[str], documents: list[str], metadatas: list[dict]) -> None:
+        with self._lock:
+            self._ids.extend(ids)
+            self._documents.extend(documents)
+            self._metadatas.extend(metadatas)
+            full = len(self._ids) >= self.write_batch_size
+        if full:
+            self.flush()
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """Queue stored chunks for deletion."""
+        with self._lock:
+            for chunk_id in ids:
+                # A queued move to this ID is dropped; its source is deleted already
+                self._moves.pop(chunk_id, None)
+                self._deletes.add(chunk_id)
+
+    def move(self, old_id: str, new_id: str, metadata: dict) -> None:
+        """Queue re-storing the record of `old_id` (text and embedding) as `new_id`."""
+        with self._lock:
+            if old_id in self._ids:
+                # Not written yet: write it under the new ID instead
+                for i, chunk_id in enumerate(self._ids):
+                    if chunk_id == old_id:
+                        self._ids[i], self._metadatas[i] = new_id, metadata
+                return
+            source, _ = self._moves.pop(old_id, (old_id, None))
+            self._moves[new_id] = (source, metadata)
+            self._deletes.add(source)
+
+    def _apply_moves(self, moves: dict[str, tuple[str, dict]], deletes: set[str]) -> None:
+        """One get for all moved records, then the deletes, then one upsert."""
+        stored = {}
+        if moves:
+            record = self.collection.get(
+                ids=sorted({source for source, _ in moves.values()}),
+                include=["documents", "embeddings"],
+            )
+            stored = {
+                chunk_id: (doc, emb)
+                for chunk_id, doc, emb in zip(record["ids"], record["documents"], record["embeddings"])
+            }
+        if deletes:
+            self.collection.delete(ids=sorted(deletes))
+        targets = [new_id for new_id, (source, _) in moves.items() if source in stored]
+        if targets:
+            self.collection.upsert(
+                ids=targets,
+                documents=[stored[moves[t][0]][0] for t in targets],
+                embeddings=[stored[moves[t][0]][1] for t in targets],
+                metadatas=[moves[t][1] for t in targets],
+            )
+
+    def flush(self) -> None:
+        with self._lock:
+            ids, documents, metadatas = self._ids, self._documents, self._metadatas
+            moves, deletes = self._moves, self._deletes
+            self._ids, self._documents, self._metadatas = [], [], []
+            self._moves, self._deletes = {}, set()
+        if not ids:
+            self._apply_moves(moves, deletes)
+            return
+
+        if len(set(ids)) != len(ids):
+            # Chroma rejects the whole call on duplicate IDs; keep the last record per ID
+            last = {chunk_id: i for i, chunk_id in enumerate(ids)}
+            keep = sorted(last.values())
+            print(f"Dropping {len(ids) - len(keep)} duplicate chunk IDs from the write batch")
+            ids = [ids[i] for i in keep]
+            documents = [documents[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep]
+
+        t0 = time.perf_counter()
+        embeddings = embed_documents(documents, batch_size=self.embed_batch_size)
+        self.embed_seconds += time.perf_counter() - t0
+
+        self._apply_moves(moves, deletes)
+        write = self.collection.upsert if self.upsert else self.collection.add
+        write(
+            ids=ids,
+            documents=documents,
+            embeddings=embeddings,
+            metadatas=metadatas,
         )
-        _embedding_model = HuggingFaceEmbeddings(
-            model_name=EMBED_MODEL_NAME,
-            model_kwargs={"device": device},
+
+        self.n_written += len(ids)
+        print(
+            f"Embedded {self.n_written} chunks "
+            f"({self.chunks_per_sec():.1f} chunks/sec)"
         )
-    return _embedding_model
 
-def embed_documents(texts: list[str]) -> list[list[float]]:
-    model = get_embedding_model()
-    return model.embed_documents(texts)
+    def chunks_per_sec(self) -> float:
+        elapsed = time.perf_counter() - self._started
+        return self.n_written / elapsed if elapsed > 0 else 0.0
 
 
-def insert_publications(collection, publications: list[dict]):
+def _build_chunk_records(
+    pub: dict,
+    chunks: list[str] | None = None,
+) -> tuple[list[str], list[str], list[dict]]:
+    """
+    Chunk a publication and return (ids, documents, metadatas) ready for Chroma.
+    """
+    chunk_data = chunk_publication(
+        content=pub["content"], title=pub["title"], chunks=chunks, key=publication_key(pub)
+    )
+
+    documents = [c["content"] for c in chunk_data]   # <- strings
+    ids = [c["chunk_id"] for c in chunk_data]
+    metadatas = [
+        {
+            "title": c["title"],
+            "source_url": pub.get("source_url"),
+            "path": pub.get("path"),
+            "scraped_at": pub.get("scraped_at"),
+        }
+        for c in chunk_data
+    ]
+    return ids, documents, metadatas
+
+
+def insert_publications(collection, publications: Iterable[dict]):
     """
     Insert documents into a ChromaDB collection.
 
-    publications: list of dicts with at least:
+    publications: list (or stream) of dicts with at least:
       - title
       - content
       - (optionally) source_url, path, scraped_at
     """
+    writer = ChunkWriter(collection)
     for pub in publications:
-        title = pub["title"]
-        content = pub["content"]
+        # Chunk with metadata; embedding + writes happen in bulk batches
+        ids, documents, metadatas = _build_chunk_records(pub)
+        writer.add(ids, documents, metadatas)
+    writer.flush()
 
-        # 1) Chunk with metadata
-        chunk_data = chunk_publication(content=content, title=title)
 
-        # 2) Extract pieces for Chroma
-        documents = [c["content"] for c in chunk_data]   # <- strings
-        ids = [c["chunk_id"] for c in chunk_data]
-        metadatas = [
-            {
-                "title": c["title"],
-                "source_url": pub.get("source_url"),
-                "path": pub.get("path"),
-                "scraped_at": pub.get("scraped_at"),
-            }
-            for c in chunk_data
-        ]
+def publication_key(pub: dict) -> str:
+    """
+    Stable identifier for a publication in the manifest (markdown file stem).
+    """
+    return Path(pub["path"]).stem
 
-        # 3) Embed only the content strings
-        embeddings = embed_documents(documents)
 
-        # 4) Add to Chroma
-        collection.add(
-            ids=ids,
-            documents=documents,
-            embeddings=embeddings,
-            metadatas=metadatas,
+def publication_hash(pub: dict) -> str:
+    """
+    Content hash of everything that ends up in the stored chunks, including
+    the chunker settings, so changing them re-chunks the corpus.
+
+    scraped_at is left out: an incremental crawl bumps it whenever the
+    server answers 304, and that must not re-embed an unchanged article.
+    Stored chunks keep the scraped_at of their last content change.
+    """
+    h = hashlib.sha256()
+    h.update(chunker_signature().encode("utf-8"))
+    h.update(b"\x00")
+    # Chunk ID scheme: re-stage publications stored under title-slug IDs
+    h.update(b"ids=publication_key")
+    h.update(b"\x00")
+    if DEDUP_ENABLED:
+        # Re-stage everything once when dedup is switched on or retuned
+        h.update(f"dedup|{DEDUP_THRESHOLD}".encode("utf-8"))
+        h.update(b"\x00")
+    for field in ("title", "source_url", "content"):
+        h.update(str(pub.get(field) or "").encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def load_manifest(manifest_path: str = INGEST_MANIFEST_PATH) -> dict:
+    """
+    Load the ingest manifest: {publication_key: {"hash": str, "chunk_ids": [str]}}.
+    Returns an empty manifest if the file does not exist yet.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, manifest_path: str = INGEST_MANIFEST_PATH) -> None:
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def check_manifest(manifest: dict) -> None:
+    """
+    Raise if a chunk ID is claimed by more than one publication: deleting or
+    re-staging one of them would silently remove the other's chunks.
+    """
+    owners: dict[str, str] = {}
+    for key, entry in manifest.items():
+        for chunk_id in entry["chunk_ids"]:
+            other = owners.setdefault(chunk_id, key)
+            if other != key:
+                raise RuntimeError(
+                    f"Chunk ID '{chunk_id}' is claimed by publications '{other}' and "
+                    f"'{key}' in the ingest manifest. Re-run with --full to rebuild it."
+                )
+
+
+def _stage_publication(
+    writer: ChunkWriter,
+    pub: dict,
+    previous: dict | None,
+    stats: dict,
+    chunks: list[str] | None = None,
+    dedup: ChunkDeduplicator | None = None,
+) -> tuple[dict, tuple[list[str], list[str], list[dict]]] | None:
+    """
+    Chunk a new or changed publication and queue its previous chunks for
+    deletion on `writer`. Returns (manifest entry, chunk records to write),
+    or None if the manifest shows it unchanged. With `dedup`, near-duplicates
+    of stored chunks are left out of the records to write.
+    """
+    digest = publication_hash(pub)
+    if previous and previous["hash"] == digest:
+        stats["skipped"] += len(previous["chunk_ids"])
+        return None
+
+    ids, documents, metadatas = _build_chunk_records(pub, chunks)
+
+    # Chunks that existed before but are no longer produced
+    stale_ids = sorted(set(previous["chunk_ids"]) - set(ids)) if previous else []
+    if dedup is not None:
+        # Re-produced IDs may carry new text: re-register all of them
+        if previous:
+            dedup.remove(previous["chunk_ids"])
+        records = dedup.filter(ids, documents, metadatas)
+    else:
+        if previous:
+            # Re-produced IDs too: an upsert would keep metadata keys it does
+            # not set, e.g. "sources" from a run with dedup enabled
+            writer.delete(previous["chunk_ids"])
+        records = (ids, documents, metadatas)
+    stats["deleted"] += len(stale_ids)
+
+    stats["updated" if previous else "added"] += len(ids)
+    return {"hash": digest, "chunk_ids": ids}, records
+
+
+def sync_publications(
+    collection,
+    publications: Iterable[dict],
+    manifest_path: str = INGEST_MANIFEST_PATH,
+) -> dict:
+    """
+    Incrementally sync the collection with the given publications.
+
+    Only new or changed publications are chunked, embedded and upserted;
+    publications that disappeared from the corpus get their chunks deleted.
+
+    With DEDUP_ENABLED, near-duplicate chunks are collapsed into one stored
+    chunk (see dedup.py).
+
+    Returns:
+        dict: chunk counts {"added", "updated", "deleted", "skipped"},
+        the embedding throughput as "chunks_per_sec" and, with dedup,
+        "dedup_ratio" (fraction of all chunks not stored) and "collapsed"
+        (chunks collapsed in this run)
+    """
+    manifest = load_manifest(manifest_path)
+    stats = {"added": 0, "updated": 0, "deleted": 0, "skipped": 0}
+    writer = ChunkWriter(collection, upsert=True)
+    dedup = ChunkDeduplicator(collection, writer) if DEDUP_ENABLED else None
+
+    current_keys = set()
+
+    def changed_publications():
+        for pub in publications:
+            key = publication_key(pub)
+            current_keys.add(key)
+            previous = manifest.get(key)
+            if previous and previous["hash"] == publication_hash(pub):
+                stats["skipped"] += len(previous["chunk_ids"])
+                continue
+            yield pub
+
+    # Only new / changed publications are chunked, in a worker pool
+    for pub, chunks in iter_chunked(changed_publications(), lambda p: p["content"]):
+        key = publication_key(pub)
+        entry, (ids, documents, metadatas) = _stage_publication(
+            writer, pub, manifest.get(key), stats, chunks, dedup
         )
+        writer.add(ids, documents, metadatas)
+        manifest[key] = entry
+
+    # Publications removed from the corpus
+    for key in sorted(set(manifest) - current_keys):
+        removed_ids = manifest.pop(key)["chunk_ids"]
+        if removed_ids:
+            if dedup is not None:
+                dedup.remove(removed_ids)
+            else:
+                writer.delete(removed_ids)
+            stats["deleted"] += len(removed_ids)
+
+    writer.flush()
+    if dedup is not None:
+        dedup.finalize()
+        dedup_stats = dedup.stats()
+        stats["dedup_ratio"] = dedup_stats["dedup_ratio"]
+        stats["collapsed"] = dedup_stats["collapsed"]
+    check_manifest(manifest)
+    save_manifest(manifest, manifest_path)
+    if stats["added"] or stats["updated"] or stats["deleted"]:
+        # Invalidates answers cached against the previous index contents
+        write_index_version()
+    stats["chunks_per_sec"] = writer.chunks_per_sec()
+    return stats
+
+
+class StreamingIndexer:
+    """
+    Index publications as they are scraped, without the markdown round trip.
+
+    run() consumes an asyncio queue of scraped articles (dicts with title,
+    source_url, scraped_at, path and the raw markdown "body"), chunks them
+    in one worker thread and embeds + upserts in another, so the stages
+    overlap and the event loop stays free for the crawler. One write is in
+    flight at a time: meanwhile chunking continues up to `flush_size`
+    chunks, then waits, and the bounded queue pushes back on the crawler.
+    Whenever the queue runs dry the buffered chunks are written
+    immediately, so a new article becomes searchable as soon as its batch
+    is embedded.
+
+    The ingest manifest and the index version are written once per
+    flushed batch, so a later `vector_db_ingest.py` run skips everything
+    indexed here.
+    """
 
+    def __init__(
+        self,
+        collection,
+        manifest_path: str = INGEST_MANIFEST_PATH,
+        flush_size: int = EMBED_BATCH_SIZE,
+    ):
+        self.collection = collection
+        self.manifest_path = manifest_path
+        self.flush_size = flush_size
+        self.manifest = load_manifest(manifest_path)
+        self.writer = ChunkWriter(collection, upsert=True)
+        self.dedup = ChunkDeduplicator(collection, self.writer) if DEDUP_ENABLED else None
+        self.stats = {"added": 0, "updated": 0, "deleted": 0, "skipped": 0, "publications": 0}
+        self._latencies: list[float] = []
+
+    def _stage(self, article: dict) -> tuple[str, tuple | None]:
+        """Clean and chunk one scraped article (worker thread)."""
+        pub = {
+            "title": article["title"],
+            "source_url": article.get("source_url"),
+            "scraped_at": article.get("scraped_at"),
+            "path": article["path"],
+            "content": _clean_markdown_body(article["body"]),
+        }
+        key = publication_key(pub)
+        staged = _stage_publication(
+            self.writer, pub, self.manifest.get(key), self.stats, dedup=self.dedup
+        )
+        return key, staged
+
+    def _write(self, batch: list[tuple[str, dict, tuple, float]]) -> None:
+        """Embed + upsert one batch, then record it in the manifest (worker thread)."""
+        for _, _, (ids, documents, metadatas), _ in batch:
+            self.writer.add(ids, documents, metadatas)
+        self.writer.flush()
+        if self.dedup is not None:
+            self.dedup.finalize()
+
+        for key, entry, _, _ in batch:
+            self.manifest[key] = entry
+        check_manifest(self.manifest)
+        save_manifest(self.manifest, self.manifest_path)
+        # Invalidates answers cached against the previous index contents
+        write_index_version()
+
+        now = time.perf_counter()
+        self._latencies.extend(now - queued_at for *_, queued_at in batch)
+
+    async def run(self, queue: asyncio.Queue) -> dict:
+        """
+        Index articles from `queue` until a None sentinel arrives.
+
+        Returns:
+            dict: chunk counts {"added", "updated", "deleted", "skipped"},
+            "publications" indexed, "chunks_per_sec" and the scrape-to-
+            searchable latency in seconds ("mean_latency_s", "max_latency_s").
+        """
+        batch: list[tuple[str, dict, tuple, float]] = []
+        n_chunks = 0
+        in_flight: asyncio.Future | None = None
+
+        while True:
+            article = await queue.get()
+            if article is not None:
+                # Cleaning, tokenizing and MinHash block
+                key, staged = await asyncio.to_thread(self._stage, article)
+                if staged is not None:
+                    entry, records = staged
+                    batch.append((key, entry, records, article.get("queued_at", time.perf_counter())))
+                    n_chunks += len(records[0])
+                    self.stats["publications"] += 1
+
+            if batch and (article is None or n_chunks >= self.flush_size or queue.empty()):
+                if in_flight is not None:
+                    await in_flight
+                in_flight = asyncio.ensure_future(asyncio.to_thread(self._write, batch))
+                batch, n_chunks = [], 0
+
+            if article is None:
+                break
+
+        if in_flight is not None:
+            await in_flight
+
+        stats = dict(self.stats)
+        stats["chunks_per_sec"] = self.writer.chunks_per_sec()
+        stats["mean_latency_s"] = (
+            sum(self._latencies) / len(self._latencies) if self._latencies else 0.0
+        )
+        stats["max_latency_s"] = max(self._latencies, default=0.0)
+        if self.dedup is not None:
+            stats["dedup_ratio"] = self.dedup.stats()["dedup_ratio"]
+        return stats
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Build / update the Chroma vector DB.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Wipe the existing DB and re-embed every publication.",
+    )
+    parser.add_argument(
+        "--export",
+        choices=["chroma", "numpy", "faiss"],
+        default="chroma",
+        help="Query-time backend to produce. 'numpy' / 'faiss' also export "
+        "an index built from the Chroma collection.",
+    )
+    parser.add_argument(
+        "--faiss-index-type",
+        choices=["flat", "ivf", "hnsw"],
+        default=FAISS_INDEX_TYPE,
+        help="FAISS index type when exporting with --export faiss.",
+    )
+    parser.add_argument(
+        "--dtype",
+        choices=["float32", "float16", "int8"],
+        default=NUMPY_INDEX_DTYPE,
+        help="Vector storage precision for --export numpy.",
+    )
+    parser.add_argument(
+        "--pca-dim",
+        type=int,
+        default=NUMPY_INDEX_PCA_DIM,
+        help="Reduce vectors to this many PCA dimensions for --export numpy "
+        "(0 = off; requires --rescore).",
+    )
+    parser.add_argument(
+        "--rescore",
+        action="store_true",
+        default=NUMPY_INDEX_RESCORE,
+        help="Keep float32 vectors on disk and rescore top candidates exactly.",
+    )
+    args = parser.parse_args()
+    if args.export == "numpy" and args.pca_dim and not args.rescore:
+        parser.error("--pca-dim requires --rescore: PCA scores are not cosine similarities")
+
     print(VECTOR_DB_DIR)
     collection = initialize_db(
         persist_directory=VECTOR_DB_DIR,
         collection_name="publications",
-        delete_existing=True,
+        delete_existing=args.full,
+    )
+    if args.full:
+        # The manifest and dedup index describe the DB we just wiped
+        for path in (INGEST_MANIFEST_PATH, DEDUP_INDEX_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # Stream publications so chunking/embedding starts while files are parsed
+    stats = sync_publications(collection, iter_publications())
+    print(
+        f"Chunks added: {stats['added']}, updated: {stats['updated']}, "
+        f"deleted: {stats['deleted']}, skipped: {stats['skipped']} "
+        f"({stats['chunks_per_sec']:.1f} chunks/sec)"
     )
-    publications = load_all_publications()
-    insert_publications(collection, publications)
+    if "dedup_ratio" in stats:
+        print(
+            f"Near-duplicates collapsed this run: {stats['collapsed']}; "
+            f"dedup ratio {stats['dedup_ratio']:.1%} of all chunks"
+        )
 
     print(f"Total documents in collection: {collection.count()}")
 
+    if args.export == "numpy":
+        report = export_numpy_index(
+            collection, dtype=args.dtype, pca_dim=args.pca_dim, rescore=args.rescore
+        )
+        saved = 1 - report["index_bytes"] / max(report["float32_bytes"], 1)
+        print(
+            f"Exported {report['n_chunks']} chunks to the NumPy flat index: "
+            f"{report['index_bytes'] / 2**20:.1f} MiB vs "
+            f"{report['float32_bytes'] / 2**20:.1f} MiB float32 ({saved:.0%} saved), "
+            f"recall@5 {report['recall@5']:.3f}"
+        )
+        if not report["recall_ok"]:
+            print(
+                f"Warning: recall@5 is below NUMPY_MIN_RECALL ({NUMPY_MIN_RECALL}). "
+                "Use a larger --pca-dim, --dtype float16 or --rescore before "
+                "switching to VECTOR_BACKEND=numpy."
+            )
+    elif args.export == "faiss":
+        n_indexed = build_faiss_index(collection, index_type=args.faiss_index_type)
+        print(f"Built FAISS {args.faiss_index_type} index with {n_indexed} chunks")
+
 
 if __name__ == "__main__":
     main()